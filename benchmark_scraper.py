@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scraper's page walk over generated mock pages, without Chrome
+
+    python benchmark_scraper.py --pages 2000
+    python benchmark_scraper.py --pages 2000 --seek --start-date 2021-06-01 --end-date 2021-03-01
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, 'src')
+
+from generate_mock_pages import generate_pages
+from lims_etl.fake_driver import FakeDriver
+from lims_etl.scraper import LIMSConfig, Scraper
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraper walk over mock pages')
+    parser.add_argument('--pages', type=int, default=2000, help='Mock pages to generate')
+    parser.add_argument('--seek', action='store_true', help='Seek to the start date instead of walking from page 1')
+    parser.add_argument('--start-date', default='2024-01-01', help='Newer limit (YYYY-MM-DD)')
+    parser.add_argument('--end-date', default='2000-01-01', help='Older limit (YYYY-MM-DD)')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Background page parsers (0 = inline)')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    pages = generate_pages(args.pages, seed=1)
+    print(f'Generated {args.pages} pages in {time.perf_counter() - started:.2f}s')
+
+    config = LIMSConfig()
+    config.use_local_fixtures = True
+    config.sleep_time = 0
+    config.parse_workers = args.parse_workers
+    config.start_date = datetime.strptime(args.start_date, '%Y-%m-%d')
+    config.end_date = datetime.strptime(args.end_date, '%Y-%m-%d')
+    config.max_empty_pages = args.pages if not args.seek else config.max_empty_pages
+
+    scraper = Scraper(101, config)
+    scraper.driver = FakeDriver(pages)
+    with patch('lims_etl.scraper.sleep'):
+        started = time.perf_counter()
+        samples = scraper.scrape_client_data(seek=args.seek)
+        elapsed = time.perf_counter() - started
+
+    print(f'Walked to page {scraper.current_page} ({scraper.pages_read} pages read, {scraper.driver.loads} page loads) '
+          f'in {elapsed:.2f}s: {scraper.pages_read / elapsed:.0f} pages/s, {samples} samples')
+
+
+if __name__ == '__main__':
+    main()
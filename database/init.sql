@@ -32,5 +32,92 @@ GRANT ALL PRIVILEGES ON ALL SEQUENCES IN SCHEMA public TO lims_user;
 ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON TABLES TO lims_user;
 ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON SEQUENCES TO lims_user;
 
+-- Samples, partitioned by month of received_at
+-- Each partition gets its own unique (client_id, received_at, folio) key and
+-- BRIN indexes on the timestamps: samples arrive in roughly received_at order,
+-- so block ranges stay tight and the indexes stay tiny next to B-trees.
+CREATE TABLE IF NOT EXISTS samples (
+    client_id INTEGER NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    folio INTEGER NOT NULL,
+    created_at TIMESTAMP,
+    patient_id INTEGER,
+    exam_id INTEGER,
+    exam_name TEXT,
+    processed_at TIMESTAMP,
+    validated_at TIMESTAMP,
+    location TEXT,
+    outsourcer TEXT,
+    priority TEXT,
+    birth_date DATE,
+    synced_at TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (client_id, received_at, folio)
+) PARTITION BY RANGE (received_at);
+
+CREATE INDEX IF NOT EXISTS ix_samples_received_brin ON samples USING brin (received_at) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS ix_samples_processed_brin ON samples USING brin (processed_at) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS ix_samples_validated_brin ON samples USING brin (validated_at) WITH (pages_per_range = 32);
+
+ALTER TABLE samples OWNER TO lims_user;
+
+-- Create the partition for the month containing p_month (samples_yYYYYmMM); returns its name
+CREATE OR REPLACE FUNCTION ensure_samples_partition(p_month DATE) RETURNS TEXT AS $$
+DECLARE
+    v_start DATE := date_trunc('month', p_month)::DATE;
+    v_name TEXT := format('samples_y%sm%s', to_char(v_start, 'YYYY'), to_char(v_start, 'MM'));
+BEGIN
+    IF to_regclass(v_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF samples FOR VALUES FROM (%L) TO (%L)',
+            v_name, v_start, (v_start + INTERVAL '1 month')::DATE
+        );
+        EXECUTE format('ALTER TABLE %I OWNER TO lims_user', v_name);
+    END IF;
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure partitions exist from the current month through p_months_ahead months ahead;
+-- returns how many were missing. Run it from cron (or rely on the ETL, which calls it at start-up).
+CREATE OR REPLACE FUNCTION create_future_samples_partitions(p_months_ahead INTEGER DEFAULT 3) RETURNS INTEGER AS $$
+DECLARE
+    v_created INTEGER := 0;
+    v_month DATE;
+BEGIN
+    FOR i IN 0..p_months_ahead LOOP
+        v_month := (date_trunc('month', now()) + make_interval(months => i))::DATE;
+        IF to_regclass(format('samples_y%sm%s', to_char(v_month, 'YYYY'), to_char(v_month, 'MM'))) IS NULL THEN
+            PERFORM ensure_samples_partition(v_month);
+            v_created := v_created + 1;
+        END IF;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach every monthly partition that ends on or before p_cutoff.
+-- The detached tables are left in place to archive (pg_dump) or drop.
+CREATE OR REPLACE FUNCTION detach_samples_partitions_before(p_cutoff DATE) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_name TEXT;
+BEGIN
+    FOR v_name IN
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'samples' AND child.relname ~ '^samples_y[0-9]{4}m[0-9]{2}$'
+        ORDER BY child.relname
+    LOOP
+        IF (to_date(substr(v_name, 10, 4) || substr(v_name, 15, 2), 'YYYYMM') + INTERVAL '1 month')::DATE <= p_cutoff THEN
+            EXECUTE format('ALTER TABLE samples DETACH PARTITION %I', v_name);
+            RETURN NEXT v_name;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_future_samples_partitions(3);
+
 -- Success message
 SELECT 'Database lims_etl initialized successfully for user lims_user' AS result;
\ No newline at end of file
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 """
-Generate 25 paginated HTML mock pages for LIMS testing
+Generate paginated HTML mock pages for LIMS testing (25 by default)
 """
 from datetime import datetime, timedelta
+import argparse
 import random
 import os
 
@@ -103,7 +104,7 @@ def generate_pagination(current_page, total_pages=25):
 
     return '\n                                '.join(pagination_items)
 
-def generate_page_html(page_num, cliente=101):
+def generate_page_html(page_num, cliente=101, total_pages=25):
     """Generate complete HTML page"""
     # Base date: start from recent and go back in time
     base_date = datetime(2023, 3, 20) - timedelta(days=(page_num - 1) * 2)
@@ -115,7 +116,7 @@ def generate_page_html(page_num, cliente=101):
         row_date = base_date - timedelta(hours=(i-2) * 3)
         rows.append(generate_sample_row(i, folio_base, row_date))
 
-    pagination = generate_pagination(page_num)
+    pagination = generate_pagination(page_num, total_pages)
 
     html = f'''<!DOCTYPE html>
 <html>
@@ -123,7 +124,7 @@ def generate_page_html(page_num, cliente=101):
     <title>Mock Consulta Orden Trabajo - Page {page_num}</title>
 </head>
 <body>
-    <h1>Mock Consulta Orden Trabajo - Page {page_num}/25</h1>
+    <h1>Mock Consulta Orden Trabajo - Page {page_num}/{total_pages}</h1>
     <div>
         <label for="ctl00_ContentMasterPage_txtcliente">Cliente:</label>
         <input type="text" id="ctl00_ContentMasterPage_txtcliente" name="cliente" value="{cliente}">
@@ -169,25 +170,33 @@ def generate_page_html(page_num, cliente=101):
 '''
     return html
 
+def generate_pages(total_pages=25, cliente=101, seed=None):
+    """All pages by file name, consulta.html being page 1 (seed makes the rows reproducible)"""
+    if seed is not None:
+        random.seed(seed)
+    pages = {f"consulta_page_{page}.html": generate_page_html(page, cliente, total_pages)
+             for page in range(1, total_pages + 1)}
+    pages["consulta.html"] = pages["consulta_page_1.html"]
+    return pages
+
 def main():
-    """Generate all 25 pages"""
-    print("Generating 25 paginated HTML mock pages...")
-    for page in range(1, 26):
-        html = generate_page_html(page)
-        filename = f"consulta_page_{page}.html"
-        with open(filename, 'w', encoding='utf-8') as f:
+    """Generate the pages"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=25, help='Number of pages')
+    parser.add_argument('--output-dir', default='.', help='Directory to write the pages to')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible rows')
+    args = parser.parse_args()
+
+    print(f"Generating {args.pages} paginated HTML mock pages...")
+    os.makedirs(args.output_dir, exist_ok=True)
+    for filename, html in generate_pages(args.pages, seed=args.seed).items():
+        with open(os.path.join(args.output_dir, filename), 'w', encoding='utf-8') as f:
             f.write(html)
-        print(f"  Created: {filename}")
-
-    # Update consulta.html to point to first page
-    html = generate_page_html(1)
-    with open("consulta.html", 'w', encoding='utf-8') as f:
-        f.write(html)
-    print(f"  Updated: consulta.html (page 1)")
+    print(f"  Created: consulta_page_1.html .. consulta_page_{args.pages}.html, consulta.html (page 1)")
 
-    print(f"\nGenerated 25 pages with 250 total samples (10 per page)")
-    print(f"Date range: 2023-03-20 going back ~50 days")
-    print(f"Folio range: 100002-100251")
+    print(f"\nGenerated {args.pages} pages with {args.pages * 10} total samples (10 per page)")
+    print(f"Date range: 2023-03-20 going back ~{args.pages * 2} days")
+    print(f"Folio range: 100002-{100001 + args.pages * 10}")
 
 if __name__ == "__main__":
     main()
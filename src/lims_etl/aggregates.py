@@ -0,0 +1,265 @@
+"""
+Turnaround-time aggregates maintained incrementally as pages are scraped
+"""
+
+import json
+import logging
+import math
+import pathlib
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .samples import sample_key
+
+reg = logging.getLogger(__name__)
+
+# (metric, from column, to column); durations are in minutes
+METRICS = (
+    ('process', 'ReceivedAt', 'ProcessedAt'),
+    ('validate', 'ProcessedAt', 'ValidatedAt'),
+    ('total', 'ReceivedAt', 'ValidatedAt'),
+)
+DIMENSIONS = ('Location', 'Outsourcer', 'ExamName', 'Priority')
+# Every sample also counts towards this dimension, for overall figures
+ALL = 'all'
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class LogSketch:
+    """
+    Quantile sketch over logarithmic buckets (relative error `alpha`).
+    Bucket counts simply add up, so sketches merge across days and dimensions
+    and a retracted value can be subtracted back out.
+    """
+
+    def __init__(self, alpha: float = 0.01, buckets: Optional[Dict[int, int]] = None):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.buckets: Counter = Counter(buckets or {})
+
+    def _bucket(self, value: float) -> int:
+        # Bucket 0 holds everything under one minute
+        if value < 1:
+            return 0
+        return max(1, math.ceil(math.log(value) / math.log(self.gamma)))
+
+    def add(self, value: float, weight: int = 1):
+        bucket = self._bucket(value)
+        self.buckets[bucket] += weight
+        if self.buckets[bucket] == 0:
+            del self.buckets[bucket]
+
+    def merge(self, other: 'LogSketch'):
+        self.buckets.update(other.buckets)
+
+    @property
+    def count(self) -> int:
+        return sum(self.buckets.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return 0.0 if bucket == 0 else 2 * self.gamma ** bucket / (self.gamma + 1)
+        return None
+
+    def dumps(self) -> str:
+        return json.dumps(self.buckets, separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, text: str, alpha: float = 0.01) -> 'LogSketch':
+        return cls(alpha, {int(k): v for k, v in json.loads(text).items()})
+
+
+def _minutes(start, end) -> Optional[float]:
+    if start is None or end is None or pd.isna(start) or pd.isna(end):
+        return None
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start)
+    if isinstance(end, str):
+        end = datetime.fromisoformat(end)
+    return max((end - start).total_seconds() / 60, 0.0)
+
+
+def _dimension_values(sample: Dict) -> List[List[str]]:
+    values = [[ALL, ALL]]
+    for dimension in DIMENSIONS:
+        value = sample.get(dimension)
+        values.append([dimension, '' if value is None or pd.isna(value) else str(value)])
+    return values
+
+
+def contribution(sample: Dict) -> Optional[Dict]:
+    """What a sample adds to the aggregates (JSON-ready): its day, dimension values and durations"""
+    key = sample_key(sample)
+    if key[2] is None:
+        return None
+    return {
+        'day': key[2][:10],
+        'dimensions': _dimension_values(sample),
+        'durations': {metric: _minutes(sample.get(start), sample.get(end)) for metric, start, end in METRICS},
+    }
+
+
+class TurnaroundAggregates:
+    """
+    Per-day, per-dimension count, sum and LogSketch of each turnaround metric,
+    in SQLite. Each sample's last contribution is kept, so when a sample is seen
+    again (e.g. ValidatedAt filled in later) the old contribution is retracted
+    before the new one is added and nothing is counted twice.
+    """
+
+    def __init__(self, path: str, alpha: float = 0.01):
+        self.path = path
+        self.alpha = alpha
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS contributions (
+                    client_id INTEGER NOT NULL,
+                    received_at TEXT NOT NULL,
+                    folio INTEGER NOT NULL,
+                    contribution TEXT NOT NULL,
+                    PRIMARY KEY (client_id, received_at, folio)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS aggregates (
+                    day TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    sum REAL NOT NULL,
+                    sketch TEXT NOT NULL,
+                    PRIMARY KEY (day, dimension, value, metric)
+                ) WITHOUT ROWID;
+            ''')
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def observe(self, samples: Iterable[Dict]) -> int:
+        """Fold a page of samples into the aggregates; returns how many changed them"""
+        updates = []
+        for sample in samples:
+            new = contribution(sample)
+            if new is not None:
+                folio, client_id, received_at = sample_key(sample)
+                updates.append(((client_id, received_at, folio), new))
+        if not updates:
+            return 0
+
+        conn = self._connect()
+        try:
+            # One write transaction per page; concurrent scrapers serialize here
+            conn.execute('BEGIN IMMEDIATE')
+            deltas: Dict[Tuple[str, str, str, str], List] = {}
+            changed = 0
+            for key, new in updates:
+                row = conn.execute(
+                    'SELECT contribution FROM contributions WHERE client_id = ? AND received_at = ? AND folio = ?', key
+                ).fetchone()
+                old = json.loads(row[0]) if row else None
+                if old == new:
+                    continue
+                if old is not None:
+                    self._apply(deltas, old, -1)
+                self._apply(deltas, new, 1)
+                conn.execute('INSERT OR REPLACE INTO contributions VALUES (?, ?, ?, ?)', key + (json.dumps(new),))
+                changed += 1
+
+            for (day, dimension, value, metric), (count, total, sketch) in deltas.items():
+                row = conn.execute(
+                    'SELECT count, sum, sketch FROM aggregates WHERE day = ? AND dimension = ? AND value = ? AND metric = ?',
+                    (day, dimension, value, metric)
+                ).fetchone()
+                if row:
+                    count += row[0]
+                    total += row[1]
+                    sketch.merge(LogSketch.loads(row[2], self.alpha))
+                sketch.buckets = +sketch.buckets  # drop emptied buckets
+                if count <= 0:
+                    conn.execute('DELETE FROM aggregates WHERE day = ? AND dimension = ? AND value = ? AND metric = ?',
+                                 (day, dimension, value, metric))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO aggregates VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                 (day, dimension, value, metric, count, total, sketch.dumps()))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return changed
+
+    def _apply(self, deltas: Dict, item: Dict, sign: int):
+        for metric, minutes in item['durations'].items():
+            if minutes is None:
+                continue
+            for dimension, value in item['dimensions']:
+                key = (item['day'], dimension, value, metric)
+                if key not in deltas:
+                    deltas[key] = [0, 0.0, LogSketch(self.alpha)]
+                entry = deltas[key]
+                entry[0] += sign
+                entry[1] += sign * minutes
+                entry[2].add(minutes, sign)
+
+    def export(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               dimension: Optional[str] = None, by_day: bool = True) -> pd.DataFrame:
+        """
+        Compact table of count, mean and p50/p90/p99 minutes per (day,) dimension
+        value and metric for days in [since, until). With by_day=False the days
+        are merged into one row per dimension value.
+        """
+        query = 'SELECT day, dimension, value, metric, count, sum, sketch FROM aggregates WHERE 1 = 1'
+        params = []
+        if since is not None:
+            query += ' AND day >= ?'
+            params.append(since.date().isoformat())
+        if until is not None:
+            query += ' AND day < ?'
+            params.append(until.date().isoformat())
+        if dimension is not None:
+            query += ' AND dimension = ?'
+            params.append(dimension)
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+        groups: Dict[Tuple, List] = {}
+        for day, dim, value, metric, count, total, sketch in rows:
+            key = (day if by_day else '', dim, value, metric)
+            if key not in groups:
+                groups[key] = [0, 0.0, LogSketch(self.alpha)]
+            groups[key][0] += count
+            groups[key][1] += total
+            groups[key][2].merge(LogSketch.loads(sketch, self.alpha))
+
+        table = []
+        for (day, dim, value, metric), (count, total, sketch) in sorted(groups.items()):
+            entry = {'day': day, 'dimension': dim, 'value': value, 'metric': metric,
+                     'count': count, 'mean_minutes': round(total / count, 1)}
+            for q in QUANTILES:
+                entry[f'p{int(q * 100)}_minutes'] = round(sketch.quantile(q), 1)
+            table.append(entry)
+        frame = pd.DataFrame(table)
+        if not by_day and not frame.empty:
+            frame = frame.drop(columns='day')
+        return frame
@@ -4,8 +4,12 @@ API Client for QuimiOSHub cloud synchronization
 
 import requests
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
+from .freshness import FreshnessTracker
+from .outbox import CircuitBreaker, SyncOutbox
+from .samples import sample_key
+from .sync_cache import SyncCache, payload_digest
 
 reg = logging.getLogger(__name__)
 
@@ -13,10 +17,20 @@ reg = logging.getLogger(__name__)
 class QuimiOSHubClient:
     """Client for syncing data to QuimiOSHub cloud API"""
 
-    def __init__(self, base_url: str, api_key: Optional[str] = None):
+    def __init__(self, base_url: str, api_key: Optional[str] = None, cache: Optional[SyncCache] = None,
+                 outbox: Optional[SyncOutbox] = None, breaker: Optional[CircuitBreaker] = None,
+                 timeout: float = 10, freshness: Optional[FreshnessTracker] = None):
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
+        self.cache = cache
+        self.outbox = outbox
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+        self.freshness = freshness
+        # Set by the run loop: pending.PendingIndex of samples synced before they were validated
+        self.pending_index = None
         self.session = requests.Session()
+        self.stats = {'created': 0, 'duplicate': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
 
         if api_key:
             self.session.headers.update({'Authorization': f'Bearer {api_key}'})
@@ -35,44 +49,196 @@ class QuimiOSHubClient:
             reg.error(f"Health check failed: {e}")
             return False
 
+    def send_payload(self, api_sample: Dict, update: bool = False) -> Tuple[Optional[str], str]:
+        """
+        POST (or PUT when update) one sample, feeding the circuit breaker
+        A POST answered 409 (the hub already has the sample, possibly stale) is
+        retried as a PUT, so the hub ends up holding this payload either way.
+        Returns (outcome, error): outcome is None when the hub did not accept it
+        """
+        try:
+            if not update:
+                response = self.session.post(f'{self.base_url}/api/samples', json=api_sample, timeout=self.timeout)
+                outcome = {200: 'created', 201: 'created'}.get(response.status_code)
+            if update or response.status_code == 409:
+                response = self.session.put(f'{self.base_url}/api/samples', json=api_sample, timeout=self.timeout)
+                ok = response.status_code in [200, 201, 204]
+                outcome = ('updated' if update else 'duplicate') if ok else None
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            return None, str(e)
+
+        if outcome is None:
+            self.breaker.record_failure()
+            return None, f'HTTP {response.status_code}'
+        self.breaker.record_success()
+        return outcome, ''
+
     def sync_samples(self, samples: List[Dict]) -> int:
         """
         Sync samples to cloud API
-        Returns number of samples successfully synced
+        With a cache, samples the hub already holds unchanged are skipped and
+        changed ones are sent as updates instead of being rejected as duplicates.
+        With an outbox, rejected samples (and all samples while the circuit is
+        open) are parked there for flush_outbox instead of being dropped.
+        Returns number of samples the hub holds up to date after the call
         """
+        return len(self.send_samples(samples)[0])
+
+    def send_samples(self, samples: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """sync_samples, returning (samples the hub holds up to date, samples parked in the outbox)"""
         if not samples:
             reg.info("No samples to sync")
-            return 0
+            return [], []
 
         synced_count = 0
+        counts = dict.fromkeys(self.stats, 0)
+        accepted, delivered, parked = [], [], []
+        synced, parked_samples = [], []
+        created, updated = [], []
+        errors: Dict[str, int] = {}
 
         for sample in samples:
             try:
                 # Convert sample format to API format
                 api_sample = self._convert_sample_format(sample)
 
-                response = self.session.post(
-                    f'{self.base_url}/api/samples',
-                    json=api_sample,
-                    timeout=10
-                )
+                key = sample_key(sample) if self.cache is not None or self.outbox is not None else None
+                digest = cached = None
+                if self.cache is not None:
+                    digest = payload_digest(api_sample)
+                    cached = self.cache.get_digest(key)
+                    if cached == digest:
+                        counts['unchanged'] += 1
+                        synced_count += 1
+                        synced.append(sample)
+                        continue
 
-                if response.status_code in [200, 201]:
-                    synced_count += 1
-                    reg.debug(f"Synced sample {sample.get('Folio')}")
-                elif response.status_code == 409:
-                    # Duplicate - already exists
-                    reg.debug(f"Sample {sample.get('Folio')} already exists in cloud")
+                # Known to the hub with different content: update in place
+                update = cached is not None
+                if self.breaker.allow():
+                    outcome, error = self.send_payload(api_sample, update)
+                else:
+                    outcome, error = None, 'circuit open'
+
+                if outcome:
+                    counts[outcome] += 1
                     synced_count += 1
+                    synced.append(sample)
+                    reg.debug("Sample %s: %s", sample.get('Folio'), outcome)
+                    if outcome == 'created':
+                        created.append(sample)
+                    elif outcome in ('updated', 'duplicate'):
+                        updated.append(sample)
+                    if self.cache is not None:
+                        accepted.append((key, digest))
+                    if self.outbox is not None:
+                        delivered.append(key)
                 else:
-                    reg.warning(f"Failed to sync sample: HTTP {response.status_code}")
+                    counts['failed'] += 1
+                    errors[error] = errors.get(error, 0) + 1
+                    if self.outbox is not None:
+                        parked.append((key, api_sample, digest, update))
+                        parked_samples.append(sample)
 
             except Exception as e:
+                counts['failed'] += 1
                 reg.error(f"Error syncing sample: {e}")
                 continue
 
-        reg.info(f"Successfully synced {synced_count}/{len(samples)} samples to cloud")
-        return synced_count
+        if errors:
+            reg.warning(f"Failed to sync {counts['failed']} samples: "
+                        + ', '.join(f'{error} x{n}' for error, n in errors.items()))
+        if self.outbox is not None:
+            # A sample parked by an earlier run is settled once it gets through
+            self.outbox.remove(delivered)
+            if parked:
+                self.outbox.add(parked)
+                reg.info(f"Parked {len(parked)} samples in the outbox")
+
+        if self.cache is not None:
+            self.cache.mark_synced(accepted)
+        if self.freshness is not None:
+            self.freshness.observe(created)
+            self.freshness.observe(self.newly_validated(updated), status_update=True)
+
+        for outcome, count in counts.items():
+            self.stats[outcome] += count
+
+        reg.info(f"Successfully synced {synced_count}/{len(samples)} samples to cloud "
+                 f"({counts['created']} new, {counts['updated']} updated, {counts['duplicate']} duplicates, "
+                 f"{counts['unchanged']} unchanged)")
+        return synced, parked_samples
+
+    def update_samples(self, samples: List[Dict]) -> int:
+        """
+        Push status changes (ProcessedAt/ValidatedAt) for samples the hub already has
+        Returns number of samples successfully updated
+        """
+        return len(self.send_updates(samples))
+
+    def send_updates(self, samples: List[Dict]) -> List[Dict]:
+        """update_samples, returning the samples the hub accepted"""
+        updated_count = 0
+        parked, updated = [], []
+
+        for sample in samples:
+            try:
+                api_sample = self._convert_sample_format(sample)
+                if self.breaker.allow():
+                    outcome, error = self.send_payload(api_sample, update=True)
+                else:
+                    outcome, error = None, 'circuit open'
+
+                if outcome:
+                    updated_count += 1
+                    updated.append(sample)
+                    reg.debug("Updated sample %s", sample.get('Folio'))
+                else:
+                    reg.debug("Failed to update sample %s: %s", sample.get('Folio'), error)
+                    if self.outbox is not None:
+                        parked.append((sample_key(sample), api_sample, None, True))
+
+            except Exception as e:
+                reg.error(f"Error updating sample: {e}")
+                continue
+
+        if parked:
+            self.outbox.add(parked)
+            reg.info(f"Parked {len(parked)} updates in the outbox")
+        if self.freshness is not None:
+            self.freshness.observe(updated, status_update=True)
+        reg.info(f"Successfully updated {updated_count}/{len(samples)} samples in cloud")
+        return updated
+
+    def newly_validated(self, samples: List[Dict]) -> List[Dict]:
+        """
+        The resent samples whose ValidatedAt is news to the hub: those the pending
+        index holds as unvalidated. Others (content changes, 409s, resends after a
+        cache eviction) would count a validation made long ago as lag.
+        """
+        if self.pending_index is None:
+            return []
+        return [sample for sample in samples if self.pending_index.is_pending(sample_key(sample))]
+
+    def park(self, samples: List[Dict]):
+        """Put samples straight in the outbox, to be sent by flush_outbox"""
+        self.outbox.add([(sample_key(sample), self._convert_sample_format(sample), None, False) for sample in samples])
+        reg.info(f"Parked {len(samples)} samples in the outbox")
+
+    def get_daily_summary(self, client_id: int, start: datetime, end: datetime) -> List[Dict]:
+        """
+        Fetch per-day sample counts and digests for a client from the hub
+        Each item: {'date': 'YYYY-MM-DD', 'count': int, 'digest': str}, with digests
+        built as in reconcile.day_digest over the stored sample payloads
+        """
+        response = self.session.get(
+            f'{self.base_url}/api/samples/summary',
+            params={'clientId': client_id, 'from': end.strftime('%Y-%m-%d'), 'to': start.strftime('%Y-%m-%d')},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
 
     def _convert_sample_format(self, sample: Dict) -> Dict:
         """Convert ETL sample format to API format"""
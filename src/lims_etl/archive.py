@@ -0,0 +1,117 @@
+"""
+Record-and-replay archive of raw LIMS grid pages
+"""
+
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+reg = logging.getLogger(__name__)
+
+# Appends from scrapers sharing a process go through one segment file
+_segment_lock = threading.Lock()
+
+
+class PageArchive:
+    """
+    Append-only archive of grid page HTML.
+    Pages are zlib-compressed into per-process segment files; a SQLite index
+    records client, page number, fetch time and the byte range of each page.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.directory / 'index.db'), timeout=30, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_id INTEGER NOT NULL,
+                page_number INTEGER NOT NULL,
+                fetched_at TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_pages_client ON pages (client_id, fetched_at, page_number);
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _segment_name(self) -> str:
+        return f'{time.strftime("%Y%m%d")}-{os.getpid()}.seg'
+
+    def record(self, client_id: int, page_number: int, html: str, fetched_at: Optional[datetime] = None):
+        """Append one page"""
+        fetched_at = fetched_at or datetime.now()
+        blob = zlib.compress(html.encode('utf-8'), 6)
+        segment = self._segment_name()
+
+        with _segment_lock:
+            with open(self.directory / segment, 'ab') as f:
+                offset = f.tell()
+                f.write(blob)
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO pages (client_id, page_number, fetched_at, segment, offset, length) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (client_id, page_number, fetched_at.isoformat(), segment, offset, len(blob))
+                )
+
+    def _read(self, segment: str, offset: int, length: int) -> str:
+        with open(self.directory / segment, 'rb') as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode('utf-8')
+
+    def iter_pages(self, client_id: Optional[int] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None) -> Iterator[Tuple[int, int, str, str]]:
+        """Yield (client_id, page_number, fetched_at, html) in recording order"""
+        query = 'SELECT client_id, page_number, fetched_at, segment, offset, length FROM pages WHERE 1 = 1'
+        params = []
+        if client_id is not None:
+            query += ' AND client_id = ?'
+            params.append(client_id)
+        if since is not None:
+            query += ' AND fetched_at >= ?'
+            params.append(since.isoformat())
+        if until is not None:
+            query += ' AND fetched_at < ?'
+            params.append(until.isoformat())
+        query += ' ORDER BY id'
+
+        for client, page_number, fetched_at, segment, offset, length in self.conn.execute(query, params).fetchall():
+            yield client, page_number, fetched_at, self._read(segment, offset, length)
+
+
+def replay(archive: PageArchive, config, since: Optional[datetime] = None,
+           until: Optional[datetime] = None) -> Dict[int, List[Dict]]:
+    """
+    Run recorded pages through the live extraction stage (extract_page_samples)
+    with the configured date range and selectors.
+    Returns deduplicated samples per client; later recordings win.
+    """
+    from .samples import dedup_samples
+    from .scraper import extract_page_samples
+
+    row_base = config.selectors["GRID_ROW_BASE"]
+    results: Dict[int, List[Dict]] = {}
+    pages = 0
+    started = time.perf_counter()
+
+    for client_id in config.test_clients:
+        samples = []
+        for _, _, _, html in archive.iter_pages(client_id, since, until):
+            samples.extend(extract_page_samples(html, row_base, config.start_date, config.end_date).samples)
+            pages += 1
+        results[client_id] = dedup_samples(samples)
+
+    reg.info(f'Replayed {pages} pages in {time.perf_counter() - started:.2f}s')
+    return results
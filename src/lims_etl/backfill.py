@@ -0,0 +1,77 @@
+"""
+Parallel historical backfill over date windows
+"""
+
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from .config import LIMSConfig
+from .samples import dedup_samples
+from .scraper import Scraper, prepare_sample_data
+
+reg = logging.getLogger(__name__)
+
+Window = Tuple[datetime, datetime]
+
+
+def split_date_range(start_date: datetime, end_date: datetime, window_days: int) -> List[Window]:
+    """
+    Split the (newer, older) date range into (start, end) windows, newest first.
+    Each window reaches one second past its newer boundary so samples received
+    exactly on a boundary survive the exclusive filter in Scraper.scan_page.
+    """
+    if window_days <= 0:
+        raise ValueError("window_days must be a positive integer")
+
+    windows = []
+    window_start = start_date
+    while window_start > end_date:
+        window_end = max(window_start - timedelta(days=window_days), end_date)
+        upper = window_start if window_start == start_date else window_start + timedelta(seconds=1)
+        windows.append((upper, window_end))
+        window_start = window_end
+    return windows
+
+
+def scrape_window(config: LIMSConfig, client_id: int, window: Window) -> List[Dict]:
+    """Scrape one client over one date window, seeking to its first page"""
+    window_config = copy.copy(config)
+    window_config.start_date, window_config.end_date = window
+
+    with Scraper(client_id, window_config) as scraper:
+        scraper.scrape_client_data(seek=True)
+        return prepare_sample_data(scraper.data)
+
+
+def run_backfill(config: LIMSConfig, workers: int, window_days: int) -> Dict[int, List[Dict]]:
+    """
+    Scrape every (client, window) task across a pool of workers.
+    Returns deduplicated samples per client.
+    """
+    windows = split_date_range(config.start_date, config.end_date, window_days)
+    tasks = [(client_id, window) for client_id in config.test_clients for window in windows]
+    reg.info(f'Backfill: {len(tasks)} tasks ({len(windows)} windows x {len(config.test_clients)} clients) on {workers} workers')
+
+    results: Dict[int, List[Dict]] = {client_id: [] for client_id in config.test_clients}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(scrape_window, config, client_id, window): (client_id, window)
+            for client_id, window in tasks
+        }
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            client_id, (window_start, window_end) = futures[future]
+            try:
+                samples = future.result()
+                results[client_id].extend(samples)
+                reg.info(f'[{done}/{len(tasks)}] Client {client_id} window '
+                         f'{window_end.date()}..{window_start.date()}: {len(samples)} samples')
+            except Exception as e:
+                reg.error(f'[{done}/{len(tasks)}] Client {client_id} window '
+                          f'{window_end.date()}..{window_start.date()} failed: {e}')
+
+    return {client_id: dedup_samples(samples) for client_id, samples in results.items()}
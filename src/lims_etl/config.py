@@ -22,6 +22,11 @@ class LIMSConfig:
         self.hub_api_url = os.getenv('HUB_API_URL', '')
         self.hub_api_key = os.getenv('HUB_API_KEY', '')
 
+        # Logging: records are written by a background listener thread
+        self.log_level = os.getenv('LIMS_LOG_LEVEL', 'INFO')
+        self.log_file = os.getenv('LIMS_LOG_FILE', 'Registro.log')
+        self.log_json = os.getenv('LIMS_LOG_JSON', 'false').lower() == 'true'
+
         # Chrome options for WSL/headless operation
         self.chrome_options = webdriver.ChromeOptions()
         self.chrome_options.add_argument('--headless')
@@ -42,6 +47,108 @@ class LIMSConfig:
         self.sleep_time = int(os.getenv('LIMS_SLEEP_TIME', '2'))
         self.test_clients = [101, 102]
 
+        # Background page parsing: 0 parses inline on the driver thread
+        self.parse_workers = int(os.getenv('LIMS_PARSE_WORKERS', '1'))
+        self.parse_queue_size = int(os.getenv('LIMS_PARSE_QUEUE_SIZE', '4'))
+        self.parse_use_processes = os.getenv('LIMS_PARSE_USE_PROCESSES', 'false').lower() == 'true'
+
+        # Scheduling: client priority weights ("101:2,102:0.5") and a run deadline (0 = none)
+        self.client_priorities = {
+            int(client): float(weight)
+            for client, weight in (
+                item.split(':') for item in os.getenv('LIMS_CLIENT_PRIORITIES', '').split(',') if item.strip()
+            )
+        }
+        self.run_deadline_minutes = float(os.getenv('LIMS_RUN_DEADLINE_MINUTES', '0'))
+        # Clients scraped at once in tabs of one browser (1 = one client at a time)
+        self.browser_tabs = int(os.getenv('LIMS_BROWSER_TABS', '1'))
+        # One unfiltered grid scan for all clients, rows routed by ClientId (falls back to per-client)
+        self.scan_all_clients = os.getenv('LIMS_SCAN_ALL_CLIENTS', 'false').lower() == 'true'
+        # Typed into the client field for that scan ('' = no filter, or a wildcard the LIMS accepts)
+        self.all_clients_filter = os.getenv('LIMS_ALL_CLIENTS_FILTER', '')
+
+        # Backfill parameters - parallel date windows
+        self.backfill_workers = int(os.getenv('LIMS_BACKFILL_WORKERS', '4'))
+        self.backfill_window_days = int(os.getenv('LIMS_BACKFILL_WINDOW_DAYS', '7'))
+
+        # Run planner (lims-scraper plan): duration to fit the run in, unless a run deadline is set
+        self.plan_target_minutes = float(os.getenv('LIMS_PLAN_TARGET_MINUTES', '60'))
+        self.plan_max_workers = int(os.getenv('LIMS_PLAN_MAX_WORKERS', '8'))
+
+        # Local state (queues, indexes, caches) lives under this directory
+        self.state_dir = os.getenv('LIMS_STATE_DIR', '.lims_state')
+
+        # Shared work queue for multi-host workers
+        self.queue_url = os.getenv('LIMS_QUEUE_URL', f'sqlite:///{self.state_dir}/queue.db')
+        self.queue_lease_seconds = int(os.getenv('LIMS_QUEUE_LEASE_SECONDS', '600'))
+
+        # Per-client run history used by the scheduler
+        self.client_state_path = os.path.join(self.state_dir, 'clients.db')
+
+        # Index of synced samples still missing ValidatedAt
+        self.pending_index_path = os.path.join(self.state_dir, 'pending.db')
+
+        # Change-detection cache: skip re-uploading samples the hub already holds unchanged
+        self.sync_cache_enabled = os.getenv('LIMS_SYNC_CACHE', 'true').lower() == 'true'
+        self.sync_cache_path = os.path.join(self.state_dir, 'sync_cache.db')
+        self.sync_cache_max_entries = int(os.getenv('LIMS_SYNC_CACHE_MAX_ENTRIES', '500000'))
+        self.sync_cache_max_age_days = int(os.getenv('LIMS_SYNC_CACHE_MAX_AGE_DAYS', '400'))
+
+        # Record raw grid pages for offline re-extraction (lims-scraper replay)
+        self.record_pages = os.getenv('LIMS_RECORD_PAGES', 'false').lower() == 'true'
+        self.archive_dir = os.getenv('LIMS_ARCHIVE_DIR', os.path.join(self.state_dir, 'archive'))
+
+        # Local read replica of scraped samples (lims-scraper query)
+        self.replica_enabled = os.getenv('LIMS_REPLICA', 'true').lower() == 'true'
+        self.replica_path = os.getenv('LIMS_REPLICA_PATH', os.path.join(self.state_dir, 'replica.db'))
+
+        # Turnaround aggregates kept up to date as pages are scraped (lims-scraper aggregates)
+        self.aggregates_enabled = os.getenv('LIMS_AGGREGATES', 'true').lower() == 'true'
+        self.aggregates_path = os.getenv('LIMS_AGGREGATES_PATH', os.path.join(self.state_dir, 'aggregates.db'))
+
+        # Skip pages whose grid content is unchanged since the last synced run
+        self.skip_unchanged_pages = os.getenv('LIMS_SKIP_UNCHANGED_PAGES', 'true').lower() == 'true'
+        self.unchanged_pages_stop = int(os.getenv('LIMS_UNCHANGED_PAGES_STOP', '5'))
+        self.full_refresh = False
+        self.fingerprint_path = os.path.join(self.state_dir, 'fingerprints.db')
+
+        # Hub writes that fail are parked in an outbox and retried with backoff (lims-scraper flush)
+        self.outbox_enabled = os.getenv('LIMS_OUTBOX', 'true').lower() == 'true'
+        self.outbox_path = os.path.join(self.state_dir, 'outbox.db')
+        self.outbox_batch_size = int(os.getenv('LIMS_OUTBOX_BATCH_SIZE', '200'))
+        self.outbox_retry_base_seconds = float(os.getenv('LIMS_OUTBOX_RETRY_BASE_SECONDS', '30'))
+        self.outbox_retry_max_seconds = float(os.getenv('LIMS_OUTBOX_RETRY_MAX_SECONDS', '3600'))
+        self.outbox_max_attempts = int(os.getenv('LIMS_OUTBOX_MAX_ATTEMPTS', '20'))
+        self.hub_timeout_seconds = float(os.getenv('HUB_TIMEOUT_SECONDS', '10'))
+        # Circuit breaker: pause hub calls after this many consecutive failures
+        self.breaker_failures = int(os.getenv('LIMS_BREAKER_FAILURES', '5'))
+        self.breaker_reset_seconds = float(os.getenv('LIMS_BREAKER_RESET_SECONDS', '60'))
+
+        # Where scraped samples go, written concurrently: hub, postgres (DB_* settings), file (CSV staging)
+        self.sinks = [name.strip() for name in os.getenv('LIMS_SINKS', 'hub').split(',') if name.strip()]
+        self.file_sink_dir = os.getenv('LIMS_FILE_SINK_DIR', os.path.join(self.state_dir, 'staging'))
+        # Per sink: samples per batch, batches buffered, wait on a full buffer before shedding, retries
+        self.sink_batch_size = int(os.getenv('LIMS_SINK_BATCH_SIZE', '500'))
+        self.sink_queue_size = int(os.getenv('LIMS_SINK_QUEUE_SIZE', '8'))
+        self.sink_put_timeout_seconds = float(os.getenv('LIMS_SINK_PUT_TIMEOUT_SECONDS', '30'))
+        self.sink_retries = int(os.getenv('LIMS_SINK_RETRIES', '3'))
+        self.sink_retry_seconds = float(os.getenv('LIMS_SINK_RETRY_SECONDS', '2'))
+
+        # End-of-run summary (JSON)
+        self.run_summary_path = os.getenv('LIMS_RUN_SUMMARY_PATH', os.path.join(self.state_dir, 'run_summary.json'))
+        # Freshness SLO: flag clients whose quantile lag from ReceivedAt to the hub exceeds it (0 = off)
+        self.freshness_slo_minutes = float(os.getenv('LIMS_FRESHNESS_SLO_MINUTES', '0'))
+        self.freshness_slo_quantile = float(os.getenv('LIMS_FRESHNESS_SLO_QUANTILE', '0.95'))
+
+        # Memory tracking: Python heap (tracemalloc) and Chrome RSS, reported in the run summary
+        self.memory_tracking = os.getenv('LIMS_MEMORY_TRACKING', 'false').lower() == 'true'
+        self.memory_top = int(os.getenv('LIMS_MEMORY_TOP', '10'))
+        self.memory_page_interval = int(os.getenv('LIMS_MEMORY_PAGE_INTERVAL', '10'))
+        self.memory_python_warn_mb = float(os.getenv('LIMS_MEMORY_PYTHON_WARN_MB', '500'))
+        self.memory_chrome_warn_mb = float(os.getenv('LIMS_MEMORY_CHROME_WARN_MB', '1500'))
+        # Restart Chrome mid-walk above this RSS (0 = never)
+        self.memory_chrome_recycle_mb = float(os.getenv('LIMS_MEMORY_CHROME_RECYCLE_MB', '0'))
+
         # Load UI selectors from JSON file
         try:
             with open('selectors.json', 'r') as f:
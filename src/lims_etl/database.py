@@ -0,0 +1,209 @@
+"""
+PostgreSQL storage for samples, written in bulk straight into monthly partitions
+"""
+
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, Table, Text, create_engine, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+reg = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+# Rows per INSERT statement
+BATCH_SIZE = 1000
+
+
+class Sample(Base):
+    """
+    One LIMS sample. In PostgreSQL the table is partitioned by month of
+    received_at (see database/init.sql); (client_id, received_at, folio) is
+    unique within each partition.
+    """
+    __tablename__ = 'samples'
+
+    client_id = Column(Integer, primary_key=True)
+    received_at = Column(DateTime, primary_key=True, nullable=True)  # NOT NULL in PostgreSQL (partition key)
+    folio = Column(Integer, primary_key=True)
+    created_at = Column(DateTime)
+    patient_id = Column(Integer)
+    exam_id = Column(Integer)
+    exam_name = Column(Text)
+    processed_at = Column(DateTime)
+    validated_at = Column(DateTime)
+    location = Column(Text)
+    outsourcer = Column(Text)
+    priority = Column(Text)
+    birth_date = Column(Date)
+    synced_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+KEY_COLUMNS = ('client_id', 'received_at', 'folio')
+
+# Sample record column (as produced by prepare_sample_data) -> table column
+RECORD_TO_COLUMN = {
+    'Folio': 'folio',
+    'ClientId': 'client_id',
+    'ReceivedAt': 'received_at',
+    'CreatedAt': 'created_at',
+    'PatientId': 'patient_id',
+    'ExamId': 'exam_id',
+    'ExamName': 'exam_name',
+    'ProcessedAt': 'processed_at',
+    'ValidatedAt': 'validated_at',
+    'Location': 'location',
+    'Outsourcer': 'outsourcer',
+    'Priority': 'priority',
+    'BirthDate': 'birth_date',
+}
+
+_INTEGER_COLUMNS = {'folio', 'client_id', 'patient_id', 'exam_id'}
+
+
+def database_url_from_env() -> str:
+    return (f"postgresql://{os.getenv('DB_USER', 'lims_user')}:{os.getenv('DB_PASSWORD', '')}"
+            f"@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'lims_etl')}")
+
+
+def partition_name(received_at: datetime) -> str:
+    """Name of the monthly partition holding received_at (matches ensure_samples_partition)"""
+    return f'samples_y{received_at.year:04d}m{received_at.month:02d}'
+
+
+def _to_row(record: Dict) -> Dict:
+    if any(key.startswith('_') for key in record):
+        # Raw grid records keyed by LIMS element ID
+        from .scraper import SELECTOR_TO_COLUMN
+        record = {SELECTOR_TO_COLUMN.get(key, key): value for key, value in record.items()}
+
+    row = {}
+    for source, column in RECORD_TO_COLUMN.items():
+        value = record.get(source)
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            row[column] = None
+        elif column in _INTEGER_COLUMNS:
+            try:
+                row[column] = int(value)
+            except (TypeError, ValueError):
+                row[column] = None
+        elif column == 'birth_date':
+            row[column] = value.date() if isinstance(value, datetime) else value
+        elif isinstance(value, pd.Timestamp):
+            row[column] = value.to_pydatetime()
+        elif isinstance(value, (datetime, date)):
+            row[column] = value
+        else:
+            row[column] = str(value)
+    return row
+
+
+class DatabaseManager:
+    """
+    Bulk upserts of sample records. On PostgreSQL, rows are grouped by month and
+    each group is inserted straight into its partition (created on first use),
+    so a batch takes one partition's locks and skips per-row tuple routing.
+    """
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url or database_url_from_env()
+        self.engine = create_engine(self.database_url, pool_pre_ping=True)
+        self.Session = sessionmaker(bind=self.engine)
+        self.is_postgres = self.engine.dialect.name == 'postgresql'
+        self._partitions: Set[str] = set()
+        self._tables: Dict[str, Table] = {}
+
+    def get_session(self):
+        return self.Session()
+
+    def create_tables(self, months_ahead: int = 3):
+        """
+        SQLite (tests, local runs): create the flat table.
+        PostgreSQL: the partitioned table comes from database/init.sql; make sure
+        the next months' partitions exist.
+        """
+        if not self.is_postgres:
+            Base.metadata.create_all(self.engine)
+            return
+        with self.engine.begin() as conn:
+            created = conn.execute(text('SELECT create_future_samples_partitions(:months)'),
+                                   {'months': months_ahead}).scalar()
+        reg.info(f'Samples partitions ready ({created} created)')
+
+    def _partition_table(self, name: str) -> Table:
+        if name not in self._tables:
+            columns = [Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+                       for c in Sample.__table__.columns]
+            self._tables[name] = Table(name, MetaData(), *columns)
+        return self._tables[name]
+
+    def _ensure_partition(self, conn, month_start: datetime) -> str:
+        name = partition_name(month_start)
+        if name not in self._partitions:
+            conn.execute(text('SELECT ensure_samples_partition(:month)'), {'month': month_start.date()})
+            self._partitions.add(name)
+        return name
+
+    def _upsert(self, conn, table, insert, rows: List[Dict]):
+        for start in range(0, len(rows), BATCH_SIZE):
+            stmt = insert(table).values(rows[start:start + BATCH_SIZE])
+            updates = {c: stmt.excluded[c] for c in RECORD_TO_COLUMN.values() if c not in KEY_COLUMNS}
+            updates['synced_at'] = func.now()
+            conn.execute(stmt.on_conflict_do_update(index_elements=list(KEY_COLUMNS), set_=updates))
+
+    def save_samples(self, records: Iterable[Dict]) -> int:
+        """
+        Insert or update samples on (client_id, received_at, folio); returns rows written.
+        Samples missing any of those are skipped on SQLite and PostgreSQL alike.
+        """
+        rows = []
+        skipped = 0
+        for row in map(_to_row, records):
+            if row['received_at'] is None or row['folio'] is None or row['client_id'] is None:
+                skipped += 1
+            else:
+                rows.append(row)
+        if skipped:
+            reg.warning(f'Skipped {skipped} samples without folio, client or reception date')
+        if not rows:
+            return 0
+
+        with self.engine.begin() as conn:
+            if not self.is_postgres:
+                self._upsert(conn, Sample.__table__, sqlite_insert, rows)
+                return len(rows)
+
+            by_month: Dict[datetime, List[Dict]] = {}
+            for row in rows:
+                month = row['received_at'].replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                by_month.setdefault(month, []).append(row)
+
+            for month, month_rows in sorted(by_month.items()):
+                name = self._ensure_partition(conn, month)
+                self._upsert(conn, self._partition_table(name), pg_insert, month_rows)
+                reg.debug('Wrote %d samples to %s', len(month_rows), name)
+
+        return len(rows)
+
+    def get_sample_count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(Sample.__table__)).scalar()
+
+    def detach_partitions_before(self, cutoff: datetime) -> List[str]:
+        """Detach monthly partitions that end on or before cutoff; the tables are kept for archiving"""
+        if not self.is_postgres:
+            return []
+        with self.engine.begin() as conn:
+            detached = [row[0] for row in conn.execute(
+                text('SELECT detach_samples_partitions_before(:cutoff)'), {'cutoff': cutoff.date()}
+            )]
+        self._partitions.difference_update(detached)
+        for name in detached:
+            reg.info(f'Detached partition {name}')
+        return detached
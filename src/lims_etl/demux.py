@@ -0,0 +1,106 @@
+"""
+One grid scan for every tracked client, with rows routed by their ClientId
+"""
+
+import copy
+import logging
+import pathlib
+from time import sleep
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from selenium.webdriver.common.by import By
+
+from .samples import sample_key
+from .scraper import PageExtract, Scraper, parse_grid_cells, prepare_sample_data
+
+reg = logging.getLogger(__name__)
+
+# Client ID the scan is logged, archived and fingerprinted under
+ALL_CLIENTS = 0
+
+
+class UnfilteredScanRefused(Exception):
+    """The LIMS did not list the grid for a search without a client filter"""
+
+
+def demux_samples(samples: Iterable[Dict]) -> Dict[int, List[Dict]]:
+    """Group samples by their ClientId"""
+    routed: Dict[int, List[Dict]] = {}
+    for sample in samples:
+        routed.setdefault(sample_key(sample)[1], []).append(sample)
+    return routed
+
+
+def plan_scan(scheduler, clients: List[int], config) -> Tuple[object, bool, Optional[object]]:
+    """
+    Config, seek flag and next leg (see ClientScheduler.prepare) for a scan
+    covering every client's walk. Unless every client resumes, the scan walks
+    the whole range. Otherwise it walks the fresh samples down to the oldest
+    client's newest_received, then resumes at the newest resume point.
+    """
+    prepared = [scheduler.prepare(client_id, config) for client_id in clients]
+    if not all(seek for _, seek, _ in prepared):
+        return config, False, None
+
+    # Where each client's backlog starts, and how far its fresh head reaches
+    backlogs = [next_leg or client_config for client_config, _, next_leg in prepared]
+    backlog = max(backlogs, key=lambda c: c.start_date)
+    heads = [client_config for client_config, _, next_leg in prepared if next_leg is not None]
+    if not heads:
+        return backlog, True, None
+
+    head = copy.copy(min(heads, key=lambda c: c.end_date))
+    if head.end_date <= backlog.start_date:
+        # The legs meet: one walk from the top covers both
+        head.end_date = config.end_date
+        return head, True, None
+    return head, True, backlog
+
+
+class AllClientsScraper(Scraper):
+    """
+    Walks the consultation grid searched with config.all_clients_filter (empty by
+    default) instead of a client ID, keeping only rows of the tracked clients.
+    """
+
+    def __init__(self, clients: List[int], config):
+        super().__init__(min(clients), config)
+        self.client = ALL_CLIENTS
+        self.clients = set(clients)
+        self.untracked_rows = 0
+
+    def navigate_to_client(self) -> bool:
+        """Search without a client filter; raises UnfilteredScanRefused if no grid comes back"""
+        reg.info(f'Searching all clients (filter {self.config.all_clients_filter!r})')
+        try:
+            self.driver.get(f'file://{pathlib.Path("consulta.html").resolve()}')
+            client_input = self.driver.find_element(By.ID, self.config.selectors["CLIENT_INPUT_FIELD"])
+            client_input.clear()
+            if self.config.all_clients_filter:
+                client_input.send_keys(self.config.all_clients_filter)
+            self.driver.find_element(By.ID, self.config.selectors["CLIENT_SEARCH_BUTTON"]).click()
+            sleep(self.config.sleep_time * 2)
+            cells = parse_grid_cells(self.driver.page_source, self.config.selectors["GRID_ROW_BASE"])
+        except Exception as e:
+            raise UnfilteredScanRefused(f'search without a client failed: {e}') from e
+
+        if not any(element_id.endswith('_lblFechaRecep') and text for element_id, text in cells.items()):
+            raise UnfilteredScanRefused('search without a client returned no grid rows')
+        return True
+
+    def store_page(self, page: PageExtract) -> int:
+        """
+        Store only the tracked clients' samples, but return every in-range row:
+        a page holding only other clients' rows is not an empty page
+        """
+        tracked = [sample for sample in page.samples if sample_key(sample)[1] in self.clients]
+        self.untracked_rows += len(page.samples) - len(tracked)
+        super().store_page(page._replace(samples=tracked))
+        return len(page.samples)
+
+    def routed_samples(self) -> Dict[int, List[Dict]]:
+        """The walk's samples per tracked client (clients without samples map to [])"""
+        routed = demux_samples(prepare_sample_data(self.data))
+        if self.untracked_rows:
+            reg.info(f'Ignored {self.untracked_rows} in-range rows of untracked clients')
+        return {client_id: routed.get(client_id, []) for client_id in sorted(self.clients)}
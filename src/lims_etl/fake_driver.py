@@ -0,0 +1,208 @@
+"""
+In-process stand-in for the Chrome driver: serves mock LIMS pages (as written
+by generate_mock_pages.py) from memory or a directory, with the subset of the
+WebDriver API the scraper uses. For tests and benchmarks without a browser.
+"""
+
+import os
+import re
+from collections import OrderedDict
+from html import unescape
+from typing import Dict, List, Mapping, Optional
+from urllib.parse import urljoin, urlparse
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'}
+
+# //*[@id="..."] followed by child steps such as /tbody/tr[12]/td
+_XPATH_ROOT = re.compile(r'''^//\*\[@id=(['"])(.+?)\1\]''')
+_XPATH_STEP = re.compile(r'^([\w*]+)(?:\[(\d+)\])?$')
+
+
+class FakeElement:
+    """A parsed element; supports text, click, send_keys, clear and get_attribute"""
+
+    def __init__(self, tag: str, attrs: Dict[str, str], parent: Optional['FakeElement'], driver: 'FakeDriver'):
+        self.tag_name = tag
+        self.attrs = attrs
+        self.parent = parent
+        self.children: List['FakeElement'] = []
+        self.parts: List = []  # text and child elements in document order
+        self.driver = driver
+
+    @property
+    def text(self) -> str:
+        return ' '.join(self._raw_text().split())
+
+    def _raw_text(self) -> str:
+        return ''.join(part if isinstance(part, str) else part._raw_text() for part in self.parts)
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self.attrs.get(name)
+
+    def send_keys(self, value: str):
+        self.attrs['value'] = self.attrs.get('value', '') + str(value)
+
+    def clear(self):
+        self.attrs['value'] = ''
+
+    def click(self):
+        """Links navigate to their href; submit buttons to their form's action, or reload the page"""
+        if self.tag_name == 'a' and self.attrs.get('href'):
+            self.driver.get(urljoin(self.driver.current_url, self.attrs['href']))
+            return
+        if self.tag_name == 'input' and self.attrs.get('type') == 'submit':
+            form = self.parent
+            while form is not None and form.tag_name != 'form':
+                form = form.parent
+            action = form.attrs.get('action') if form is not None else None
+            self.driver.get(urljoin(self.driver.current_url, action) if action else self.driver.current_url)
+
+
+# Tags, comments/doctypes and text runs; the mock pages are well-formed, so no full HTML parser is needed
+_TOKEN = re.compile(r'<!--.*?-->|<![^>]*>|<(/?)([a-zA-Z][\w-]*)([^>]*?)(/?)>|([^<]+)', re.S)
+_ATTR = re.compile(r'''([\w:-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+
+def _parse(html: str, driver: 'FakeDriver'):
+    """Build the element tree; returns (root, elements by id)"""
+    root = FakeElement('#document', {}, None, driver)
+    current = root
+    by_id: Dict[str, FakeElement] = {}
+    for closing, tag, attr_text, self_closing, text in _TOKEN.findall(html):
+        if text:
+            current.parts.append(unescape(text) if '&' in text else text)
+        elif not tag:
+            continue  # comment or doctype
+        elif closing:
+            # Close up to the matching open element, tolerating unclosed children
+            node = current
+            tag = tag.lower()
+            while node is not root and node.tag_name != tag:
+                node = node.parent
+            if node is not root:
+                current = node.parent
+        else:
+            tag = tag.lower()
+            attrs = {name.lower(): unescape(a or b or c) for name, a, b, c in _ATTR.findall(attr_text)}
+            element = FakeElement(tag, attrs, current, driver)
+            current.children.append(element)
+            current.parts.append(element)
+            if 'id' in attrs:
+                by_id.setdefault(attrs['id'], element)
+            if tag not in VOID_TAGS and not self_closing:
+                current = element
+    return root, by_id
+
+
+class FakeDocument:
+    def __init__(self, html: str, driver: 'FakeDriver'):
+        self.html = html
+        self.root, self.by_id = _parse(html, driver)
+        # Input values as served, restored when the page is loaded again
+        self.defaults = [(element, element.attrs.get('value')) for element in self._elements(self.root)
+                         if element.tag_name in ('input', 'textarea')]
+
+    def _elements(self, node: FakeElement):
+        for child in node.children:
+            yield child
+            yield from self._elements(child)
+
+    def reset(self):
+        """Undo send_keys/clear, as a real reload would"""
+        for element, value in self.defaults:
+            if value is None:
+                element.attrs.pop('value', None)
+            else:
+                element.attrs['value'] = value
+
+    def xpath(self, expression: str) -> List[FakeElement]:
+        """Evaluate //*[@id="..."]/step/step[n]... (child steps with optional 1-based index)"""
+        match = _XPATH_ROOT.match(expression)
+        if not match:
+            raise ValueError(f'Unsupported XPath: {expression}')
+        nodes = [self.by_id[match.group(2)]] if match.group(2) in self.by_id else []
+        for step in filter(None, expression[match.end():].split('/')):
+            step_match = _XPATH_STEP.match(step)
+            if not step_match:
+                raise ValueError(f'Unsupported XPath step {step!r} in {expression}')
+            tag, index = step_match.group(1), step_match.group(2)
+            matched = []
+            for node in nodes:
+                children = [child for child in node.children if tag == '*' or child.tag_name == tag]
+                matched.extend(children[int(index) - 1:int(index)] if index else children)
+            nodes = matched
+        return nodes
+
+
+class FakeDriver:
+    """
+    Serves pages by file name: `pages` maps names such as 'consulta_page_3.html'
+    to HTML, and pages_dir is searched next. Any other file:// URL is read from
+    disk (e.g. the repo's login.html). The last cache_size parsed pages are
+    kept, so revisits during a seek cost only the lookup; their inputs are reset
+    to the served values, as a reload would.
+    """
+
+    def __init__(self, pages: Optional[Mapping[str, str]] = None, pages_dir: Optional[str] = None,
+                 cache_size: int = 64):
+        self.pages = pages or {}
+        self.pages_dir = pages_dir
+        self.cache_size = max(1, cache_size)
+        self.current_url = 'about:blank'
+        self.current_window_handle = 'fake'
+        self.loads = 0
+        self._documents: 'OrderedDict[str, FakeDocument]' = OrderedDict()
+        self._document: Optional[FakeDocument] = None
+
+    def _read(self, url: str) -> str:
+        path = urlparse(url).path
+        name = os.path.basename(path)
+        if name in self.pages:
+            return self.pages[name]
+        if self.pages_dir and name and os.path.exists(os.path.join(self.pages_dir, name)):
+            with open(os.path.join(self.pages_dir, name), encoding='utf-8') as f:
+                return f.read()
+        if urlparse(url).scheme == 'file' and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return f.read()
+        return '<html><body></body></html>'
+
+    def get(self, url: str):
+        self.loads += 1
+        self.current_url = url
+        name = os.path.basename(urlparse(url).path) or url
+        if name in self._documents:
+            self._documents.move_to_end(name)
+            self._documents[name].reset()
+        else:
+            self._documents[name] = FakeDocument(self._read(url), self)
+            if len(self._documents) > self.cache_size:
+                self._documents.popitem(last=False)
+        self._document = self._documents[name]
+
+    @property
+    def page_source(self) -> str:
+        return self._document.html if self._document is not None else '<html><body></body></html>'
+
+    def find_elements(self, by: str, value: str) -> List[FakeElement]:
+        if self._document is None:
+            return []
+        if by == By.ID:
+            element = self._document.by_id.get(value)
+            return [element] if element is not None else []
+        if by == By.XPATH:
+            return self._document.xpath(value)
+        raise ValueError(f'Unsupported locator strategy: {by}')
+
+    def find_element(self, by: str, value: str) -> FakeElement:
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f'No element for {by}={value}')
+        return elements[0]
+
+    def quit(self):
+        self._documents.clear()
+        self._document = None
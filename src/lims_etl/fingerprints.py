@@ -0,0 +1,104 @@
+"""
+Content fingerprints of grid pages, to skip pages that have not changed since the last run
+"""
+
+import hashlib
+import logging
+import pathlib
+import re
+import sqlite3
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+reg = logging.getLogger(__name__)
+
+
+class PageFingerprint(NamedTuple):
+    """(row key, row digest) for each grid row of a page, and the page's reception date bounds"""
+    rows: Tuple[Tuple[str, str], ...]
+    newest: datetime
+    oldest: datetime
+
+
+@lru_cache(maxsize=8)
+def _cell_pattern(row_base: str):
+    # Leaf cells only: <span id="...ctlNN_lblX">text<
+    return re.compile(r'id="' + re.escape(row_base) + r'(\d+)_(\w+)"[^>]*>([^<]*)<')
+
+
+def page_fingerprint(html: str, row_base: str) -> Optional[PageFingerprint]:
+    """
+    Fingerprint a page row by row from its grid cells alone, so ViewState, pager
+    markup and other postback noise do not change it. Each row is keyed by its
+    folio and client and digested without its ctlNN position, so a row keeps its
+    fingerprint when new samples push it down the grid. A regex pass is enough
+    here and keeps the check cheap on the driver thread. None for a page
+    without grid rows.
+    """
+    from .scraper import parse_lims_datetime
+
+    rows: Dict[str, Dict[str, str]] = {}
+    for row_number, name, text in _cell_pattern(row_base).findall(html):
+        rows.setdefault(row_number, {})[name] = ' '.join(text.split())
+
+    fingerprints, dates = [], []
+    for cells in rows.values():
+        if not cells.get('lblFolioGrd'):
+            continue
+        key = f"{cells['lblFolioGrd']}/{cells.get('lblClienteGrd', '')}"
+        digest = hashlib.sha256('\n'.join(f'{name}={text}' for name, text in sorted(cells.items())).encode('utf-8'))
+        fingerprints.append((key, digest.hexdigest()[:32]))
+        received = parse_lims_datetime(cells.get('lblFechaRecep', ''))
+        if not pd.isna(received):
+            dates.append(received)
+    if not fingerprints:
+        return None
+    return PageFingerprint(tuple(fingerprints), max(dates, default=pd.NaT), min(dates, default=pd.NaT))
+
+
+class FingerprintStore:
+    """
+    SQLite record of the grid rows whose samples were synced, keyed by client
+    and row (folio and client cell). A page matches when every one of its rows
+    was stored with the same digest, wherever on the grid it was seen, so pages
+    shifted by newly received samples still match.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS row_fingerprints (
+                client_id INTEGER NOT NULL,
+                row_key TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                seen_at TEXT NOT NULL,
+                PRIMARY KEY (client_id, row_key)
+            ) WITHOUT ROWID
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def matches(self, client_id: int, fingerprint: PageFingerprint) -> bool:
+        rows = dict(fingerprint.rows)
+        stored = dict(self.conn.execute(
+            f'SELECT row_key, digest FROM row_fingerprints WHERE client_id = ? '
+            f'AND row_key IN ({",".join("?" * len(rows))})',
+            (client_id, *rows)
+        ).fetchall())
+        return stored == rows
+
+    def save(self, client_id: int, pages: List[Tuple[int, PageFingerprint]]):
+        """Store the rows of (page_number, fingerprint) pairs once their samples are synced"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO row_fingerprints VALUES (?, ?, ?, ?)',
+                [(client_id, key, digest, now) for _, fp in pages for key, digest in fp.rows]
+            )
@@ -0,0 +1,140 @@
+"""
+Freshness lag: time from a sample's ReceivedAt (or ValidatedAt, for status
+changes) in the LIMS to its delivery to QuimiOSHub, histogrammed per client
+"""
+
+import bisect
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .samples import sample_key
+
+reg = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in minutes; the last bucket is open-ended
+BUCKET_MINUTES = [5, 15, 30, 60, 120, 240, 480, 1440, 2880, 10080]
+
+KINDS = ('received', 'validated')
+
+
+def _bucket_label(index: int) -> str:
+    if index == len(BUCKET_MINUTES):
+        return f'>{BUCKET_MINUTES[-1]}m'
+    return f'<={BUCKET_MINUTES[index]}m'
+
+
+def _round(minutes: Optional[float]) -> Optional[float]:
+    return round(minutes, 1) if minutes is not None else None
+
+
+class LagHistogram:
+    """Counts of lags (in minutes) per bucket, with the exact total and maximum"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_MINUTES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, minutes: float):
+        minutes = max(minutes, 0.0)
+        self.counts[bisect.bisect_left(BUCKET_MINUTES, minutes)] += 1
+        self.count += 1
+        self.total += minutes
+        self.max = max(self.max, minutes)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (the maximum for the open bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKET_MINUTES[index], self.max) if index < len(BUCKET_MINUTES) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_minutes': round(self.total / self.count, 1) if self.count else None,
+            'p50_minutes': _round(self.quantile(0.5)),
+            'p95_minutes': _round(self.quantile(0.95)),
+            'max_minutes': round(self.max, 1),
+            'buckets': {_bucket_label(i): n for i, n in enumerate(self.counts) if n},
+        }
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return pd.Timestamp(value).to_pydatetime()
+
+
+class FreshnessTracker:
+    """
+    Lag histograms per client and kind ('received' for new samples, 'validated'
+    for samples delivered with a ValidatedAt). With slo_minutes, a client whose
+    slo_quantile received lag exceeds it is flagged as behind.
+    """
+
+    def __init__(self, slo_minutes: float = 0, slo_quantile: float = 0.95):
+        self.slo_minutes = slo_minutes
+        self.slo_quantile = slo_quantile
+        self.histograms: Dict[int, Dict[str, LagHistogram]] = {}
+
+    def _record(self, client_id: int, kind: str, since: Optional[datetime], synced_at: datetime):
+        if since is None:
+            return
+        histograms = self.histograms.setdefault(client_id, {k: LagHistogram() for k in KINDS})
+        histograms[kind].add((synced_at - since).total_seconds() / 60)
+
+    def observe(self, samples: Iterable[Dict], status_update: bool = False,
+                synced_at: Optional[datetime] = None):
+        """Record samples just delivered; status updates only count toward the validated lag"""
+        synced_at = synced_at or datetime.now()
+        for sample in samples:
+            client_id = sample_key(sample)[1]
+            if not status_update:
+                self._record(client_id, 'received', _as_datetime(sample.get('ReceivedAt')), synced_at)
+            self._record(client_id, 'validated', _as_datetime(sample.get('ValidatedAt')), synced_at)
+
+    def observe_payloads(self, payloads: Iterable[Dict], status_update: bool = False,
+                         synced_at: Optional[datetime] = None):
+        """observe() for hub-format payloads (as parked in the outbox)"""
+        self.observe(({'ClientId': p.get('clientId'), 'ReceivedAt': p.get('receivedAt'),
+                       'ValidatedAt': p.get('validatedAt')} for p in payloads), status_update, synced_at)
+
+    def behind(self) -> List[int]:
+        """Clients whose received lag quantile is over the SLO"""
+        if not self.slo_minutes:
+            return []
+        return sorted(
+            client_id for client_id, histograms in self.histograms.items()
+            if (histograms['received'].quantile(self.slo_quantile) or 0) > self.slo_minutes
+        )
+
+    def summary(self) -> Dict:
+        behind = self.behind()
+        for client_id in behind:
+            lag = self.histograms[client_id]['received'].quantile(self.slo_quantile)
+            reg.warning(f'Client {client_id} is behind: p{self.slo_quantile * 100:g} freshness lag '
+                        f'{lag:.0f} min > SLO {self.slo_minutes:g} min')
+        return {
+            'slo_minutes': self.slo_minutes or None,
+            'slo_quantile': self.slo_quantile,
+            'clients_behind': behind,
+            'clients': {
+                str(client_id): {kind: histogram.to_dict() for kind, histogram in histograms.items()}
+                for client_id, histograms in sorted(self.histograms.items())
+            },
+        }
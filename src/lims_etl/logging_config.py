@@ -0,0 +1,103 @@
+"""
+Logging setup built for the scraping hot path
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from collections import Counter
+from typing import Optional
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues records untouched. The stock handler formats the
+    message on the calling thread; here the listener thread does all formatting.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(level: str = 'INFO', log_file: Optional[str] = 'Registro.log',
+                      json_format: bool = False) -> logging.handlers.QueueListener:
+    """
+    Route all records through a QueueHandler so the scraping threads never
+    block on disk I/O; a QueueListener thread formats and writes them.
+    Safe to call more than once: the previous listener is stopped first.
+    """
+    global _listener
+    stop_logging()
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class ErrorSampler:
+    """
+    Counts repeated per-cell failures instead of logging each one.
+    The first `sample` occurrences of each kind are logged at DEBUG (when enabled);
+    the rest only bump a counter, reported once by log_summary().
+    """
+
+    def __init__(self, logger: logging.Logger, sample: int = 3):
+        self.logger = logger
+        self.sample = sample
+        self.counts: Counter = Counter()
+
+    def record(self, kind: str, detail: str, error: Exception):
+        self.counts[kind] += 1
+        if self.counts[kind] <= self.sample and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s (%s): %s', kind, detail, error)
+
+    def log_summary(self, context: str):
+        if self.counts:
+            self.logger.info('%s: %s', context, ', '.join(f'{k} x{n}' for k, n in self.counts.most_common()))
+        self.counts.clear()
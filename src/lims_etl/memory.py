@@ -0,0 +1,188 @@
+"""
+Optional memory tracking: Python heap (tracemalloc) and chromedriver/Chrome RSS
+"""
+
+import logging
+import os
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import psutil
+except ImportError:  # /proc is read directly instead (Linux only)
+    psutil = None
+
+reg = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; ppid follows the closing parenthesis
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """Resident memory of a process and all its descendants, in bytes; None if unavailable"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    if not os.path.isdir('/proc'):
+        return None
+    children = _proc_children()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _proc_rss(current)
+        stack.extend(children.get(current, []))
+    return total or None
+
+
+def driver_pid(driver) -> Optional[int]:
+    """PID of the chromedriver process behind a Selenium driver (Chrome runs under it)"""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+class MemorySample(NamedTuple):
+    label: str
+    python_current: int
+    python_peak: int
+    chrome_rss: Optional[int]
+
+
+class MemoryTracker:
+    """
+    Samples the traced Python heap and the browser's RSS every `page_interval`
+    pages and at each client boundary, where the top allocators are also kept.
+    check_page() returns 'recycle' when Chrome grows past recycle_mb.
+    """
+
+    def __init__(self, top: int = 10, page_interval: int = 10, python_warn_mb: float = 500,
+                 chrome_warn_mb: float = 1500, chrome_recycle_mb: float = 0, frames: int = 1):
+        self.top = top
+        self.page_interval = max(1, page_interval)
+        self.python_warn = python_warn_mb * MB
+        self.chrome_warn = chrome_warn_mb * MB
+        self.chrome_recycle = chrome_recycle_mb * MB
+        self.frames = frames
+        self.pages = 0
+        self.samples: List[MemorySample] = []
+        self.clients: Dict[int, Dict] = {}
+        self.peak_chrome = 0
+        self.recycles = 0
+        self.warnings: List[str] = []
+        self._client_start: Dict[int, int] = {}
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def browser_rss(self, driver) -> Optional[int]:
+        """RSS of the driver's chromedriver/Chrome tree, None when it cannot be read"""
+        pid = driver_pid(driver) if driver is not None else None
+        chrome = process_tree_rss(pid) if pid else None
+        if chrome:
+            self.peak_chrome = max(self.peak_chrome, chrome)
+        return chrome
+
+    def sample(self, label: str, driver=None, chrome_rss: Optional[int] = None) -> MemorySample:
+        """Heap now; the browser measured through driver, unless chrome_rss was taken earlier"""
+        current, peak = tracemalloc.get_traced_memory()
+        chrome = chrome_rss if chrome_rss is not None else self.browser_rss(driver)
+        sample = MemorySample(label, current, peak, chrome)
+        self.samples.append(sample)
+        return sample
+
+    def _warn(self, message: str):
+        reg.warning(message)
+        self.warnings.append(message)
+
+    def check_page(self, client_id: int, page: int, driver=None) -> Optional[str]:
+        """Sample on every page_interval-th page; 'recycle' if the browser is over its limit"""
+        self.pages += 1
+        if self.pages % self.page_interval:
+            return None
+
+        sample = self.sample(f'{client_id}:page{page}', driver)
+        if sample.python_current > self.python_warn:
+            self._warn(f'Client {client_id} page {page}: Python heap at {sample.python_current / MB:.0f} MB')
+        if sample.chrome_rss:
+            if self.chrome_recycle and sample.chrome_rss > self.chrome_recycle:
+                self.recycles += 1
+                reg.warning(f'Client {client_id} page {page}: Chrome at {sample.chrome_rss / MB:.0f} MB, recycling')
+                return 'recycle'
+            if sample.chrome_rss > self.chrome_warn:
+                self._warn(f'Client {client_id} page {page}: Chrome at {sample.chrome_rss / MB:.0f} MB')
+        return None
+
+    def client_started(self, client_id: int):
+        self._client_start[client_id] = tracemalloc.get_traced_memory()[0]
+
+    def client_finished(self, client_id: int, driver=None, chrome_rss: Optional[int] = None):
+        """
+        Heap growth over the client and the top allocators still alive at its end.
+        The browser is usually gone by now: pass the chrome_rss the scraper
+        measured (browser_rss) at the end of its walk.
+        """
+        sample = self.sample(f'{client_id}:end', driver, chrome_rss)
+        top = []
+        if tracemalloc.is_tracing() and self.top:
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:self.top]:
+                frame = stat.traceback[0]
+                top.append({'where': f'{frame.filename}:{frame.lineno}', 'kb': round(stat.size / 1024, 1),
+                            'blocks': stat.count})
+        self.clients[client_id] = {
+            'python_mb': round(sample.python_current / MB, 1),
+            'python_growth_mb': round((sample.python_current - self._client_start.get(client_id, 0)) / MB, 1),
+            'chrome_mb': round(sample.chrome_rss / MB, 1) if sample.chrome_rss else None,
+            'top_allocators': top,
+        }
+
+    def summary(self) -> Dict:
+        _, peak = tracemalloc.get_traced_memory()
+        return {
+            'python_peak_mb': round(peak / MB, 1),
+            'chrome_peak_mb': round(self.peak_chrome / MB, 1) if self.peak_chrome else None,
+            'browser_recycles': self.recycles,
+            'warnings': self.warnings,
+            'clients': {str(client_id): stats for client_id, stats in self.clients.items()},
+        }
@@ -0,0 +1,161 @@
+"""
+Several clients scraped in tabs of one logged-in Chrome, interleaved page by page
+"""
+
+import logging
+import threading
+from collections import deque
+from time import sleep, time
+from typing import Callable, Deque, List, Optional
+
+from .browser import Browser
+
+reg = logging.getLogger(__name__)
+
+
+class TabSwitcher:
+    """
+    Serialises access to a shared driver and switches windows only when the
+    target tab is not already active. Every driver call for a tab goes through
+    `with switcher.use(handle):` so no command can land in the wrong window.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        self.current: Optional[str] = driver.current_window_handle
+
+    def use(self, handle: str) -> 'TabSwitcher':
+        self.lock.acquire()
+        try:
+            if self.current != handle:
+                self.driver.switch_to.window(handle)
+                self.current = handle
+        except Exception:
+            self.current = None
+            self.lock.release()
+            raise
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.lock.release()
+
+    def open_tab(self) -> str:
+        with self.lock:
+            self.driver.switch_to.new_window('tab')
+            self.current = self.driver.current_window_handle
+            return self.current
+
+    def close_tab(self, handle: str):
+        """Close a window; the next use() switches to whichever tab it needs"""
+        with self.lock:
+            try:
+                if self.current != handle:
+                    self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception as e:
+                reg.warning(f'Could not close tab {handle}: {e}')
+            self.current = None
+
+
+class Tab:
+    """A window handle and the scraper walking one client in it (its own pager state)"""
+
+    def __init__(self, handle: str):
+        self.handle = handle
+        self.scraper = None
+
+
+def run_tabs(config, clients: List[int], tabs: int, make_scraper: Callable,
+             on_done: Callable, stop: Optional[Callable[[], bool]] = None) -> int:
+    """
+    Walk `clients` in up to `tabs` tabs of a single Chrome, round-robin: after a
+    tab clicks through to its next page the driver moves on to another tab, so
+    one tab's postback loads while another is read. A tab is revisited only once
+    config.sleep_time has passed since its click.
+
+    make_scraper(client_id) builds a Scraper (not entered) for a client;
+    on_done(client_id, scraper, error) is called when its walk ends, with the
+    exception if it failed. stop() is checked before starting each client.
+    Returns the number of clients walked.
+    """
+    queue: Deque[int] = deque(clients)
+    finished = 0
+
+    with Browser(config) as driver:
+        switcher = TabSwitcher(driver)
+        logged_in = False
+        active: List[Tab] = []
+
+        def start(tab: Tab) -> bool:
+            nonlocal logged_in
+            while queue and not (stop and stop()):
+                client_id = queue.popleft()
+                scraper = make_scraper(client_id)
+                scraper.driver = driver
+                scraper.wait_after_click = False
+                try:
+                    with switcher.use(tab.handle):
+                        ready = scraper.begin_walk(scraper.seek, login=not logged_in)
+                    logged_in = True
+                except Exception as e:
+                    scraper.close()
+                    on_done(client_id, scraper, e)
+                    continue
+                if not ready:
+                    finish(tab, scraper)
+                    continue
+                tab.scraper = scraper
+                return True
+            return False
+
+        def finish(tab: Tab, scraper, error: Optional[Exception] = None):
+            nonlocal finished
+            try:
+                scraper.close_pipeline()
+                scraper.finish_walk()
+            except Exception as e:
+                error = error or e
+            finally:
+                scraper.close()
+            finished += 1
+            tab.scraper = None
+            on_done(scraper.client, scraper, error)
+
+        handles = [switcher.current] + [switcher.open_tab() for _ in range(max(1, tabs) - 1)]
+        for handle in handles:
+            tab = Tab(handle)
+            if start(tab):
+                active.append(tab)
+        reg.info(f'Scraping {len(active)} clients in {len(handles)} tabs of one browser')
+
+        while active:
+            for tab in list(active):
+                scraper = tab.scraper
+                wait = scraper.clicked_at + config.sleep_time - time()
+                if wait > 0:
+                    sleep(wait)
+                try:
+                    with switcher.use(tab.handle):
+                        more = scraper.walk_step()
+                except Exception as e:
+                    # The window may be unusable: retire it and give the next client a fresh tab
+                    reg.error(f'Tab for client {scraper.client} failed: {e}')
+                    finish(tab, scraper, e)
+                    active.remove(tab)
+                    replacement = Tab(switcher.open_tab()) if queue and not (stop and stop()) else None
+                    # Closing the last window would end the browser session, so open the replacement first
+                    if active or replacement is not None:
+                        switcher.close_tab(tab.handle)
+                    if replacement is not None and start(replacement):
+                        active.append(replacement)
+                    continue
+                if not more:
+                    finish(tab, scraper)
+                    if not start(tab):
+                        active.remove(tab)
+
+    return finished
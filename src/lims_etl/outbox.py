@@ -0,0 +1,213 @@
+"""
+Durable outbox for hub writes that failed, drained with backoff behind a circuit breaker
+"""
+
+import json
+import logging
+import pathlib
+import random
+import sqlite3
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+reg = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling the hub after `failure_threshold` consecutive failures.
+    Once `reset_seconds` have passed a single trial request is let through
+    (half-open): success closes the breaker, failure opens it again. Until the
+    trial reports back, allow() refuses everyone else; a trial that never
+    reports is replaced after another `reset_seconds`.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_started_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    @property
+    def blocked(self) -> bool:
+        """Whether allow() would refuse a call now (without claiming the half-open trial)"""
+        state = self.state
+        if state == 'half-open':
+            return self.trial_started_at is not None \
+                and time.monotonic() - self.trial_started_at < self.reset_seconds
+        return state == 'open'
+
+    def allow(self) -> bool:
+        """Permission for one call; in the half-open state only the trial gets it"""
+        if self.blocked:
+            return False
+        if self.state == 'half-open':
+            self.trial_started_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            reg.info('Hub responding again, circuit closed')
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_started_at = None
+        if self.state == 'half-open' or self.failures >= self.failure_threshold:
+            if self.state != 'open':
+                reg.warning(f'Circuit opened after {self.failures} failures; '
+                            f'hub calls paused for {self.reset_seconds:.0f}s')
+            self.opened_at = time.monotonic()
+
+    def trip(self):
+        """Open immediately, e.g. when the health check fails"""
+        self.failures = max(self.failures, self.failure_threshold)
+        self.opened_at = time.monotonic()
+        self.trial_started_at = None
+
+
+class OutboxEntry(NamedTuple):
+    """A hub write waiting to be sent: sample key, API payload, cache digest, PUT or POST"""
+    key: Tuple[int, int, str]
+    payload: dict
+    digest: Optional[str]
+    update: bool
+    attempts: int
+
+
+class SyncOutbox:
+    """
+    SQLite outbox of sample writes the hub has not accepted yet, one row per
+    sample key (a newer payload replaces an older one). Each failed attempt
+    pushes the row back by base_delay * 2^attempts (with jitter, capped at
+    max_delay); after max_attempts it is left as dead for inspection.
+    """
+
+    def __init__(self, path: str, base_delay: float = 30, max_delay: float = 3600, max_attempts: int = 20):
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                folio INTEGER NOT NULL,
+                client_id INTEGER NOT NULL,
+                received_at TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                digest TEXT,
+                is_update INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                last_error TEXT,
+                PRIMARY KEY (client_id, received_at, folio)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (next_attempt);
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def add(self, entries: List[Tuple[Tuple[int, int, str], dict, Optional[str], bool]], error: str = ''):
+        """Park (key, payload, digest, update) writes; due immediately on the next flush"""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO outbox VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)',
+                [(key[0], key[1], key[2], json.dumps(payload), digest, int(update), now, error)
+                 for key, payload, digest, update in entries if key[2] is not None]
+            )
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[OutboxEntry]:
+        rows = self.conn.execute(
+            'SELECT folio, client_id, received_at, payload, digest, is_update, attempts FROM outbox '
+            'WHERE next_attempt <= ? AND attempts < ? ORDER BY next_attempt LIMIT ?',
+            (now or time.time(), self.max_attempts, limit)
+        ).fetchall()
+        return [OutboxEntry((folio, client, received), json.loads(payload), digest, bool(update), attempts)
+                for folio, client, received, payload, digest, update, attempts in rows]
+
+    def remove(self, keys: List[Tuple[int, int, str]]):
+        with self.conn:
+            self.conn.executemany(
+                'DELETE FROM outbox WHERE folio = ? AND client_id = ? AND received_at = ?', keys
+            )
+
+    def retry_later(self, entries: List[OutboxEntry], error: str):
+        now = time.time()
+        rows = []
+        for entry in entries:
+            delay = min(self.max_delay, self.base_delay * 2 ** entry.attempts)
+            rows.append((now + delay * random.uniform(0.8, 1.2), error) + entry.key)
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ? '
+                'WHERE folio = ? AND client_id = ? AND received_at = ?', rows
+            )
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM outbox WHERE attempts < ?', (self.max_attempts,)).fetchone()[0]
+
+    def dead_count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM outbox WHERE attempts >= ?', (self.max_attempts,)).fetchone()[0]
+
+
+def flush_outbox(hub_client, outbox: SyncOutbox, batch_size: int = 200) -> Tuple[int, int]:
+    """
+    Send due outbox rows in batches until none are due or the circuit opens.
+    Returns (sent, still queued).
+    """
+    sent = 0
+    while not hub_client.breaker.blocked:
+        batch = outbox.due(batch_size)
+        if not batch:
+            break
+
+        delivered, failed, accepted, sent_entries = [], [], [], []
+        error = ''
+        for entry in batch:
+            if not hub_client.breaker.allow():
+                failed.append(entry)
+                continue
+            outcome, error = hub_client.send_payload(entry.payload, entry.update)
+            if outcome:
+                delivered.append(entry.key)
+                sent_entries.append(entry)
+                if entry.digest is not None:
+                    accepted.append((entry.key, entry.digest))
+            else:
+                failed.append(entry)
+
+        outbox.remove(delivered)
+        if failed:
+            outbox.retry_later(failed, error or 'circuit open')
+        if hub_client.cache is not None and accepted:
+            hub_client.cache.mark_synced(accepted)
+        freshness = getattr(hub_client, 'freshness', None)
+        if freshness is not None:
+            freshness.observe_payloads([e.payload for e in sent_entries if not e.update])
+            # Only updates that deliver a new validation count toward the validated lag
+            pending = getattr(hub_client, 'pending_index', None)
+            freshness.observe_payloads([e.payload for e in sent_entries
+                                        if e.update and pending is not None and pending.is_pending(e.key)],
+                                       status_update=True)
+        sent += len(delivered)
+        reg.info(f'Outbox batch: {len(delivered)} sent, {len(failed)} rescheduled')
+
+    remaining = outbox.count()
+    if remaining and hub_client.breaker.blocked:
+        reg.warning(f'Circuit open; {remaining} samples stay in the outbox')
+    return sent, remaining
@@ -0,0 +1,157 @@
+"""
+Index of synced samples still waiting for ValidatedAt, and the targeted re-check
+"""
+
+import copy
+import logging
+import pathlib
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .samples import sample_key
+from .scraper import Scraper, prepare_sample_data
+
+reg = logging.getLogger(__name__)
+
+
+def _timestamp(value) -> Optional[str]:
+    if value is None or pd.isna(value):
+        return None
+    return value if isinstance(value, str) else value.isoformat()
+
+
+class PendingIndex:
+    """SQLite index of unvalidated samples keyed by (ClientId, ReceivedAt, Folio)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pending (
+                client_id INTEGER NOT NULL,
+                received_at TEXT NOT NULL,
+                folio INTEGER NOT NULL,
+                processed_at TEXT,
+                PRIMARY KEY (client_id, received_at, folio)
+            )
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def track(self, samples: List[Dict]) -> int:
+        """
+        Record synced samples: unvalidated ones are (re)indexed, validated ones dropped.
+        Returns number of samples now pending.
+        """
+        pending, validated = [], []
+        for sample in samples:
+            folio, client_id, received_at = sample_key(sample)
+            if received_at is None:
+                continue
+            if _timestamp(sample.get('ValidatedAt')) is None:
+                pending.append((client_id, received_at, folio, _timestamp(sample.get('ProcessedAt'))))
+            else:
+                validated.append((client_id, received_at, folio))
+
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?)', pending)
+            self.conn.executemany(
+                'DELETE FROM pending WHERE client_id = ? AND received_at = ? AND folio = ?', validated
+            )
+        return len(pending)
+
+    def is_pending(self, key: Tuple[int, int, Optional[str]]) -> bool:
+        """Whether a sample (by sample_key) was synced without ValidatedAt and not since validated"""
+        folio, client_id, received_at = key
+        return self.conn.execute(
+            'SELECT 1 FROM pending WHERE client_id = ? AND received_at = ? AND folio = ?',
+            (client_id, received_at, folio)
+        ).fetchone() is not None
+
+    def pending_for(self, client_id: int) -> List[Tuple[int, datetime, Optional[str]]]:
+        """Pending (folio, received_at, processed_at) for a client, newest first"""
+        rows = self.conn.execute(
+            'SELECT folio, received_at, processed_at FROM pending WHERE client_id = ? ORDER BY received_at DESC',
+            (client_id,)
+        ).fetchall()
+        return [(folio, datetime.fromisoformat(received), processed) for folio, received, processed in rows]
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+
+
+def changed_samples(pending: List[Tuple[int, datetime, Optional[str]]], samples: List[Dict]) -> List[Dict]:
+    """Pick the re-scraped samples whose ProcessedAt/ValidatedAt moved since indexing"""
+    known = {(folio, received.isoformat()): processed for folio, received, processed in pending}
+    changed = []
+    for sample in samples:
+        folio, _, received_at = sample_key(sample)
+        if (folio, received_at) not in known:
+            continue
+        if (_timestamp(sample.get('ValidatedAt')) is not None
+                or _timestamp(sample.get('ProcessedAt')) != known[(folio, received_at)]):
+            changed.append(sample)
+    return changed
+
+
+def recheck_client(config, client_id: int, pending: List[Tuple[int, datetime, Optional[str]]]) -> List[Dict]:
+    """
+    Visit only the pages holding the pending samples of one client.
+    The grid lists samples newest first, so pending dates are sought in that order
+    and pages already scanned are not revisited.
+    """
+    window_config = copy.copy(config)
+    window_config.start_date = pending[0][1] + timedelta(seconds=1)
+    window_config.end_date = pending[-1][1] - timedelta(seconds=1)
+
+    with Scraper(client_id, window_config) as scraper:
+        if not scraper.login():
+            raise Exception("Login failed")
+        if not scraper.navigate_to_client():
+            raise Exception(f"Could not navigate to client {client_id}")
+
+        pages_visited = 0
+        for _, received_at, _ in pending:
+            if not pd.isna(scraper.page_oldest_date) and received_at >= scraper.page_oldest_date:
+                continue  # Already on a scanned page
+            if not scraper.seek_to_date(received_at + timedelta(seconds=1)):
+                break
+            scraper.scan_page()
+            pages_visited += 1
+
+        reg.info(f'Client {client_id}: re-checked {len(pending)} pending samples on {pages_visited} pages')
+        return prepare_sample_data(scraper.data)
+
+
+def refresh_pending(config, hub_client, index: PendingIndex) -> int:
+    """
+    Re-check pending samples of every configured client and push only status changes.
+    Returns number of samples updated in QuimiOSHub.
+    """
+    total_updated = 0
+    for client_id in config.test_clients:
+        pending = index.pending_for(client_id)
+        if not pending:
+            reg.info(f'No pending samples for client {client_id}')
+            continue
+
+        try:
+            changed = changed_samples(pending, recheck_client(config, client_id, pending))
+        except Exception as e:
+            reg.error(f'Error re-checking client {client_id}: {e}')
+            continue
+
+        if changed:
+            # A failed update stays pending so the next refresh retries it
+            updated = hub_client.send_updates(changed)
+            total_updated += len(updated)
+            index.track(updated)
+        reg.info(f'Client {client_id}: {len(changed)}/{len(pending)} pending samples changed status')
+
+    return total_updated
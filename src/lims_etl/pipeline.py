@@ -0,0 +1,85 @@
+"""
+Background parsing of fetched grid pages so the browser never waits on Python
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, List, NamedTuple, Optional, Tuple
+
+reg = logging.getLogger(__name__)
+
+
+class PageResult(NamedTuple):
+    """Outcome of parsing one page: an extract, or the error that stopped it"""
+    page_number: int
+    extract: Optional[Any]  # scraper.PageExtract
+    error: Optional[str]
+
+
+def _parse_page(html: str, row_base: str, start_date: datetime, end_date: datetime):
+    # Module-level so process pools can pickle it
+    from .scraper import extract_page_samples
+    return extract_page_samples(html, row_base, start_date, end_date)
+
+
+class PagePipeline:
+    """
+    Hands raw page HTML to a parse/transform worker while the driver fetches the next page.
+    At most max_pending pages are in flight: submit() waits on the oldest one when
+    the queue is full. Results are always returned in page order.
+    """
+
+    def __init__(self, row_base: str, start_date: datetime, end_date: datetime,
+                 workers: int = 1, max_pending: int = 4, use_processes: bool = False):
+        self.row_base = row_base
+        self.start_date = start_date
+        self.end_date = end_date
+        self.max_pending = max(1, max_pending)
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=workers)
+        self.pending: Deque[Tuple[int, Future]] = deque()
+        self._finished: List[PageResult] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, page_number: int, html: str) -> List[PageResult]:
+        """Queue a page for parsing; returns the results that are ready, in order"""
+        while len(self.pending) >= self.max_pending:
+            # Bounded queue: block on the oldest page before taking a new one
+            self._finished.append(self._pop())
+
+        future = self.executor.submit(_parse_page, html, self.row_base, self.start_date, self.end_date)
+        self.pending.append((page_number, future))
+        return self.ready()
+
+    def _pop(self) -> PageResult:
+        # future.exception() waits for the page without raising
+        page_number, future = self.pending.popleft()
+        error = future.exception()
+        if error is not None:
+            reg.error(f'Failed to parse page {page_number}: {error}')
+            return PageResult(page_number, None, str(error))
+        return PageResult(page_number, future.result(), None)
+
+    def ready(self) -> List[PageResult]:
+        """Pop the finished results at the head of the queue"""
+        results, self._finished = self._finished, []
+        while self.pending and self.pending[0][1].done():
+            results.append(self._pop())
+        return results
+
+    def drain(self) -> List[PageResult]:
+        """Wait for every queued page"""
+        results, self._finished = self._finished, []
+        while self.pending:
+            results.append(self._pop())
+        return results
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
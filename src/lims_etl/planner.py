@@ -0,0 +1,146 @@
+"""
+Run planning: probe each client's pager to estimate pages, rows and duration
+before a long scrape, and pack clients onto workers
+"""
+
+import heapq
+import logging
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from .scraper import Scraper, extract_page_samples
+
+reg = logging.getLogger(__name__)
+
+# Grid rows per page (rows 2-11)
+GRID_ROWS = 10
+
+# Seconds per page on top of sleep_time for clients never timed
+DEFAULT_PAGE_OVERHEAD = 1.0
+
+
+class ClientEstimate(NamedTuple):
+    client_id: int
+    first_page: int
+    last_page: int
+    pages: int
+    rows: int
+    seconds_per_page: float
+    seconds: float
+    timed: bool
+
+
+class RunPlan(NamedTuple):
+    estimates: List[ClientEstimate]
+    workers: int
+    assignment: List[Tuple[float, List[int]]]
+    target_seconds: float
+
+    def table(self) -> pd.DataFrame:
+        return pd.DataFrame([{
+            'ClientId': e.client_id, 'FirstPage': e.first_page, 'LastPage': e.last_page, 'Pages': e.pages,
+            'Rows': e.rows, 'SecondsPerPage': round(e.seconds_per_page, 2), 'Minutes': round(e.seconds / 60, 1),
+            'Timed': e.timed,
+        } for e in self.estimates])
+
+
+def rows_in_range(scraper: Scraper, start_date: datetime, end_date: datetime) -> int:
+    """In-range samples on the scraper's current page"""
+    page = extract_page_samples(scraper.driver.page_source, scraper.config.selectors["GRID_ROW_BASE"],
+                                start_date, end_date)
+    return len(page.samples)
+
+
+def probe_client(scraper: Scraper, start_date: datetime, end_date: datetime) -> Tuple[int, int, int]:
+    """
+    Locate the date range in an open client grid with the seek probes
+    (pager block ends, then a bisection), reading only the pages they land on.
+    Returns (first_page, last_page, rows); (0, 0, 0) when no page is in range.
+    """
+    if not scraper.seek_to_date(start_date):
+        return 0, 0, 0
+    first_page = scraper.current_page
+    first_rows = rows_in_range(scraper, start_date, end_date)
+
+    # False means the grid ran out first: the last page is the current one either way
+    scraper.seek_to_date(end_date)
+    last_page = scraper.current_page
+    if last_page == first_page:
+        return first_page, last_page, first_rows
+
+    # Pages strictly inside the range are full
+    inner = last_page - first_page - 1
+    return first_page, last_page, first_rows + inner * GRID_ROWS + rows_in_range(scraper, start_date, end_date)
+
+
+def estimate_seconds(pages: int, seconds_per_page: float, config) -> float:
+    """A client's walk: login and search, then one page visit per page"""
+    return config.sleep_time * 4 + pages * seconds_per_page if pages else 0.0
+
+
+def lpt_assign(durations: Dict[int, float], workers: int) -> List[Tuple[float, List[int]]]:
+    """
+    Longest-processing-time packing: each client, longest first, goes to the
+    least loaded worker. Returns (load, clients) per worker, heaviest first.
+    """
+    heap = [(0.0, worker, []) for worker in range(max(1, workers))]
+    for client_id, seconds in sorted(durations.items(), key=lambda item: item[1], reverse=True):
+        load, worker, clients = heapq.heappop(heap)
+        clients.append(client_id)
+        heapq.heappush(heap, (load + seconds, worker, clients))
+    return sorted(((load, clients) for load, _, clients in heap), key=lambda item: item[0], reverse=True)
+
+
+def recommend_workers(durations: Dict[int, float], target_seconds: float, max_workers: int) -> int:
+    """Fewest workers (up to max_workers) whose LPT makespan fits in target_seconds"""
+    useful = max(1, min(max_workers, sum(1 for seconds in durations.values() if seconds > 0)))
+    for workers in range(1, useful + 1):
+        if lpt_assign(durations, workers)[0][0] <= target_seconds:
+            return workers
+    return useful
+
+
+def plan_run(config, clients: List[int], store, target_minutes: Optional[float] = None,
+             workers: Optional[int] = None) -> RunPlan:
+    """
+    Probe every client (one browser each, sequentially) and plan the run against
+    target_minutes, recommending a worker count unless workers is given
+    """
+    default_spp = config.sleep_time + DEFAULT_PAGE_OVERHEAD
+    estimates = []
+    for client_id in clients:
+        try:
+            with Scraper(client_id, config) as scraper:
+                if not scraper.login() or not scraper.navigate_to_client():
+                    raise Exception('could not open the client grid')
+                first_page, last_page, rows = probe_client(scraper, config.start_date, config.end_date)
+        except Exception as e:
+            reg.error(f'Client {client_id}: probe failed: {e}')
+            continue
+
+        pages = last_page - first_page + 1 if first_page else 0
+        recorded = store.get_timing(client_id)
+        spp = recorded if recorded is not None else default_spp
+        estimate = ClientEstimate(client_id, first_page, last_page, pages, rows, spp,
+                                  estimate_seconds(pages, spp, config), recorded is not None)
+        reg.info(f'Client {client_id}: ~{pages} pages ({first_page}-{last_page}), ~{rows} rows, '
+                 f'~{estimate.seconds / 60:.1f} min at {spp:.1f}s/page')
+        estimates.append(estimate)
+
+    target_seconds = (target_minutes or config.plan_target_minutes) * 60
+    durations = {e.client_id: e.seconds for e in estimates}
+    workers = workers or recommend_workers(durations, target_seconds, config.plan_max_workers)
+    assignment = lpt_assign(durations, workers)
+
+    total = sum(durations.values())
+    reg.info(f'Plan: {sum(e.pages for e in estimates)} pages, {sum(e.rows for e in estimates)} rows, '
+             f'{total / 60:.1f} min of scraping; {workers} workers finish in ~{assignment[0][0] / 60:.1f} min '
+             f'(target {target_seconds / 60:.0f} min)')
+    for worker, (load, assigned) in enumerate(assignment, start=1):
+        reg.info(f'Worker {worker}: clients {assigned} (~{load / 60:.1f} min)')
+    if assignment[0][0] > target_seconds:
+        reg.warning(f'Even {workers} workers miss the target; the longest client alone takes '
+                    f'{max(durations.values(), default=0) / 60:.1f} min (split it with backfill windows)')
+    return RunPlan(estimates, workers, assignment, target_seconds)
@@ -0,0 +1,134 @@
+"""
+Hub reconciliation by per-day digests
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from .backfill import scrape_window
+from .sync_cache import SyncCache, payload_digest
+
+reg = logging.getLogger(__name__)
+
+# (count, digest) per 'YYYY-MM-DD'
+DayDigests = Dict[str, Tuple[int, str]]
+
+DIGEST_MODULUS = 2 ** 128
+
+
+def day_digest(digests: Iterable[str]) -> str:
+    """
+    Order-independent digest of a day's samples: the sum of their payload
+    digests modulo 2**128, as 32 hex characters
+    """
+    total = sum(int(digest, 16) for digest in digests) % DIGEST_MODULUS
+    return f'{total:032x}'
+
+
+def group_by_day(entries: Iterable[Tuple[str, str]]) -> DayDigests:
+    """Fold (received_at ISO timestamp, payload digest) pairs into per-day digests"""
+    days: Dict[str, List[str]] = {}
+    for received_at, digest in entries:
+        days.setdefault(received_at[:10], []).append(digest)
+    return {day: (len(digests), day_digest(digests)) for day, digests in days.items()}
+
+
+def local_day_digests(cache: SyncCache, client_id: int, start: datetime, end: datetime) -> DayDigests:
+    """Per-day digests of what this ETL has synced for a client, received in (end, start]"""
+    return group_by_day(cache.digests_between(client_id, end.isoformat(), start.isoformat()))
+
+
+def hub_day_digests(hub_client, client_id: int, start: datetime, end: datetime) -> DayDigests:
+    """Per-day digests reported by the QuimiOSHub summary endpoint, received in (end, start]"""
+    return {
+        item['date']: (int(item['count']), item['digest'])
+        for item in hub_client.get_daily_summary(client_id, start, end)
+    }
+
+
+class FileSummarySource:
+    """
+    Local stand-in for the hub summary endpoint: a JSON list of samples in API
+    format (as exported from QuimiOSHub), digested the same way the hub would
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'r') as f:
+            self.samples = json.load(f)
+
+    def get_daily_summary(self, client_id: int, start: datetime, end: datetime) -> List[Dict]:
+        entries = [
+            (sample['receivedAt'], payload_digest(sample))
+            for sample in self.samples
+            if sample.get('clientId') == client_id and sample.get('receivedAt')
+            and end.isoformat() < sample['receivedAt'] <= start.isoformat()
+        ]
+        return [
+            {'date': day, 'count': count, 'digest': digest}
+            for day, (count, digest) in group_by_day(entries).items()
+        ]
+
+
+def diff_days(local: DayDigests, remote: DayDigests) -> List[str]:
+    """Days whose count or digest disagree, newest first"""
+    return sorted((day for day in set(local) | set(remote) if local.get(day) != remote.get(day)), reverse=True)
+
+
+def resync_day(config, hub_client, cache: SyncCache, client_id: int, day: str) -> int:
+    """Re-scrape one client-day and push it again, bypassing the sync cache"""
+    day_start = datetime.strptime(day, '%Y-%m-%d')
+    day_end = day_start + timedelta(days=1)
+    cache.invalidate(client_id, day_start.isoformat(), day_end.isoformat())
+
+    samples = scrape_window(config, client_id, (day_end, day_start - timedelta(seconds=1)))
+    if not samples:
+        return 0
+    # One upsert per sample: POST creates what the hub is missing, and a 409
+    # is retried as a PUT that overwrites rows it holds with stale content
+    return hub_client.sync_samples(samples)
+
+
+def reconcile(config, hub_client, cache: SyncCache, summary_source=None, dry_run: bool = False) -> Dict[int, List[str]]:
+    """
+    Compare local and hub per-day digests for every client over the configured
+    date range and re-sync only the days that differ. Days up to the newest
+    sample the cache has evicted are left out: the cache no longer knows them
+    all, so they would always look different.
+    Returns the differing days per client.
+    """
+    summary_source = summary_source or hub_client
+    mismatches = {}
+    evicted_through = cache.evicted_through()
+    if evicted_through is not None:
+        reg.info(f'Sync cache evicted samples received up to {evicted_through}; '
+                 f'reconciling only the days after {evicted_through[:10]}')
+
+    for client_id in config.test_clients:
+        try:
+            local = local_day_digests(cache, client_id, config.start_date, config.end_date)
+            remote = hub_day_digests(summary_source, client_id, config.start_date, config.end_date)
+        except Exception as e:
+            reg.error(f'Could not compare digests for client {client_id}: {e}')
+            continue
+
+        if evicted_through is not None:
+            local = {day: digest for day, digest in local.items() if day > evicted_through[:10]}
+            remote = {day: digest for day, digest in remote.items() if day > evicted_through[:10]}
+        days = diff_days(local, remote)
+        mismatches[client_id] = days
+        reg.info(f'Client {client_id}: {len(days)} of {len(set(local) | set(remote))} days differ')
+
+        for day in days:
+            reg.info(f'Client {client_id} {day}: local {local.get(day, (0, "-"))[0]} '
+                     f'vs hub {remote.get(day, (0, "-"))[0]} samples')
+            if dry_run:
+                continue
+            try:
+                synced = resync_day(config, hub_client, cache, client_id, day)
+                reg.info(f'Client {client_id} {day}: re-synced {synced} samples')
+            except Exception as e:
+                reg.error(f'Error re-syncing client {client_id} {day}: {e}')
+
+    return mismatches
@@ -0,0 +1,123 @@
+"""
+Local read replica of scraped samples, for point lookups without touching the LIMS or the hub
+"""
+
+import logging
+import pathlib
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .samples import sample_key
+
+reg = logging.getLogger(__name__)
+
+REPLICA_COLUMNS = [
+    'Folio', 'ClientId', 'ReceivedAt', 'CreatedAt', 'PatientId', 'ExamId', 'ExamName',
+    'ProcessedAt', 'ValidatedAt', 'Location', 'Outsourcer', 'Priority', 'BirthDate',
+]
+
+_DATE_COLUMNS = {'ReceivedAt', 'CreatedAt', 'ProcessedAt', 'ValidatedAt', 'BirthDate'}
+
+
+def _value(column: str, value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if column in _DATE_COLUMNS:
+        return value if isinstance(value, str) else value.isoformat()
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class SampleReplica:
+    """
+    SQLite copy of samples. The (ClientId, ReceivedAt, Folio) primary key serves
+    client/date range filters; Folio lookups and the samples still missing
+    ValidatedAt have their own indexes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS samples (
+                Folio INTEGER NOT NULL,
+                ClientId INTEGER NOT NULL,
+                ReceivedAt TEXT NOT NULL,
+                CreatedAt TEXT,
+                PatientId INTEGER,
+                ExamId INTEGER,
+                ExamName TEXT,
+                ProcessedAt TEXT,
+                ValidatedAt TEXT,
+                Location TEXT,
+                Outsourcer TEXT,
+                Priority TEXT,
+                BirthDate TEXT,
+                UpdatedAt TEXT NOT NULL,
+                PRIMARY KEY (ClientId, ReceivedAt, Folio)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_samples_folio ON samples (Folio);
+            CREATE INDEX IF NOT EXISTS ix_samples_unvalidated ON samples (ReceivedAt)
+                WHERE ValidatedAt IS NULL;
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert(self, samples: List[Dict]) -> int:
+        """Write a batch of samples in one transaction; returns rows written"""
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = []
+        for sample in samples:
+            if sample_key(sample)[2] is None:
+                continue
+            rows.append([_value(col, sample.get(col)) for col in REPLICA_COLUMNS] + [now])
+        if not rows:
+            return 0
+
+        placeholders = ', '.join('?' * (len(REPLICA_COLUMNS) + 1))
+        with self.conn:
+            self.conn.executemany(
+                f'INSERT OR REPLACE INTO samples ({", ".join(REPLICA_COLUMNS)}, UpdatedAt) VALUES ({placeholders})',
+                rows
+            )
+        return len(rows)
+
+    def query(self, folio: Optional[int] = None, client_ids: Optional[List[int]] = None,
+              since: Optional[datetime] = None, until: Optional[datetime] = None,
+              pending_only: bool = False, limit: Optional[int] = None) -> List[Dict]:
+        """Samples matching every given filter, newest ReceivedAt first"""
+        query = f'SELECT {", ".join(REPLICA_COLUMNS)}, UpdatedAt FROM samples WHERE 1 = 1'
+        params = []
+        if folio is not None:
+            query += ' AND Folio = ?'
+            params.append(folio)
+        if client_ids:
+            query += f' AND ClientId IN ({", ".join("?" * len(client_ids))})'
+            params.extend(client_ids)
+        if since is not None:
+            query += ' AND ReceivedAt >= ?'
+            params.append(since.isoformat())
+        if until is not None:
+            query += ' AND ReceivedAt < ?'
+            params.append(until.isoformat())
+        if pending_only:
+            query += ' AND ValidatedAt IS NULL'
+        query += ' ORDER BY ReceivedAt DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        names = REPLICA_COLUMNS + ['UpdatedAt']
+        return [dict(zip(names, row)) for row in self.conn.execute(query, params).fetchall()]
+
+    def count(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM samples').fetchone()[0]
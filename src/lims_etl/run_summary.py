@@ -0,0 +1,51 @@
+"""
+End-of-run summary: per-client outcomes plus sections contributed by other stages
+"""
+
+import json
+import logging
+import pathlib
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+reg = logging.getLogger(__name__)
+
+
+class RunSummary:
+    """Collects what a run did and writes it as one JSON document"""
+
+    def __init__(self, command: str = 'run'):
+        self.command = command
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.clients: Dict[int, Dict[str, Any]] = {}
+        self.totals: Dict[str, int] = {}
+        self.sections: Dict[str, Any] = {}
+
+    def record_client(self, client_id: int, **fields):
+        self.clients.setdefault(client_id, {}).update(fields)
+
+    def add(self, name: str, count: int = 1):
+        self.totals[name] = self.totals.get(name, 0) + count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'command': self.command,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'duration_seconds': round(time.perf_counter() - self._started, 1),
+            'totals': self.totals,
+            'clients': {str(client_id): fields for client_id, fields in self.clients.items()},
+            **self.sections,
+        }
+
+    def write(self, path: Optional[str]) -> Dict[str, Any]:
+        """Log a one-line digest and, with a path, write the full summary there"""
+        summary = self.to_dict()
+        reg.info(f"Run summary: {summary['duration_seconds']}s, {len(self.clients)} clients, "
+                 + ', '.join(f'{name} {count}' for name, count in sorted(self.totals.items())))
+        if path:
+            pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2, default=str)
+        return summary
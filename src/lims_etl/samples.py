@@ -0,0 +1,41 @@
+"""
+Sample record helpers shared across ETL stages
+"""
+
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+# Columns that identify a sample in the LIMS (and in QuimiOSHub)
+KEY_COLUMNS = ('Folio', 'ClientId', 'ReceivedAt')
+
+
+def _as_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _as_timestamp(value) -> Optional[str]:
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def sample_key(sample: Dict) -> Tuple[int, int, Optional[str]]:
+    """Natural key of a sample: (Folio, ClientId, ReceivedAt)"""
+    return (
+        _as_int(sample.get('Folio')),
+        _as_int(sample.get('ClientId')),
+        _as_timestamp(sample.get('ReceivedAt')),
+    )
+
+
+def dedup_samples(samples: List[Dict]) -> List[Dict]:
+    """Drop repeated samples, keeping the last occurrence of each key"""
+    unique: Dict[Tuple, Dict] = {}
+    for sample in samples:
+        unique[sample_key(sample)] = sample
+    return list(unique.values())
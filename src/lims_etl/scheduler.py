@@ -0,0 +1,197 @@
+"""
+Deadline-aware client scheduling: stale, busy and high-priority clients go first
+"""
+
+import copy
+import logging
+import math
+import pathlib
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+reg = logging.getLogger(__name__)
+
+# Staleness assumed for clients that have never completed a run
+NEVER_RUN_HOURS = 24 * 365
+
+# Weight of the latest walk in a client's seconds-per-page average
+TIMING_WEIGHT = 0.3
+
+
+class ClientStateStore:
+    """SQLite record of each client's last completed run, volume, resume point and page timing"""
+
+    def __init__(self, path: str):
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS clients (
+                client_id INTEGER PRIMARY KEY,
+                last_success REAL,
+                newest_received TEXT,
+                last_volume INTEGER NOT NULL DEFAULT 0,
+                resume_before TEXT
+            )
+        ''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS page_timings (
+                client_id INTEGER PRIMARY KEY,
+                seconds_per_page REAL NOT NULL,
+                walks INTEGER NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, client_id: int) -> Dict:
+        row = self.conn.execute(
+            'SELECT last_success, newest_received, last_volume, resume_before FROM clients WHERE client_id = ?',
+            (client_id,)
+        ).fetchone()
+        if row is None:
+            return {'last_success': None, 'newest_received': None, 'last_volume': 0, 'resume_before': None}
+        return {
+            'last_success': row[0],
+            'newest_received': datetime.fromisoformat(row[1]) if row[1] else None,
+            'last_volume': row[2],
+            'resume_before': datetime.fromisoformat(row[3]) if row[3] else None,
+        }
+
+    def update(self, client_id: int, **fields):
+        state = self.get(client_id)
+        state.update(fields)
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO clients VALUES (?, ?, ?, ?, ?)',
+                (client_id, state['last_success'],
+                 state['newest_received'].isoformat() if state['newest_received'] else None,
+                 state['last_volume'],
+                 state['resume_before'].isoformat() if state['resume_before'] else None)
+            )
+
+
+    def record_timing(self, client_id: int, pages: int, seconds: float):
+        """Fold a walk's seconds per page into the client's moving average"""
+        if pages <= 0:
+            return
+        latest = seconds / pages
+        previous = self.get_timing(client_id)
+        average = latest if previous is None else previous + TIMING_WEIGHT * (latest - previous)
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO page_timings VALUES (?, ?, 1) ON CONFLICT (client_id) DO UPDATE '
+                'SET seconds_per_page = excluded.seconds_per_page, walks = walks + 1',
+                (client_id, average)
+            )
+
+    def get_timing(self, client_id: int) -> Optional[float]:
+        """Average seconds per page over the client's recorded walks, None if never timed"""
+        row = self.conn.execute(
+            'SELECT seconds_per_page FROM page_timings WHERE client_id = ?', (client_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+
+class ClientScheduler:
+    """
+    Orders clients by score = priority weight x hours since last completed run
+    x (1 + log(1 + samples in last run)), and splits the run deadline between
+    them in proportion to their scores.
+    """
+
+    def __init__(self, store: ClientStateStore, priorities: Optional[Dict[int, float]] = None):
+        self.store = store
+        self.priorities = priorities or {}
+
+    def score(self, client_id: int, now: Optional[float] = None) -> float:
+        now = now or time.time()
+        state = self.store.get(client_id)
+        if state['last_success'] is None:
+            staleness = NEVER_RUN_HOURS
+        else:
+            staleness = max((now - state['last_success']) / 3600, 0.01)
+        return self.priorities.get(client_id, 1.0) * staleness * (1 + math.log1p(state['last_volume']))
+
+    def order(self, clients: List[int]) -> List[int]:
+        now = time.time()
+        ordered = sorted(clients, key=lambda client_id: self.score(client_id, now), reverse=True)
+        reg.info(f'Client order: {ordered}')
+        return ordered
+
+    def client_deadline(self, client_id: int, remaining: List[int], run_deadline: Optional[float]) -> Optional[float]:
+        """Share of the time left before run_deadline for client_id among the remaining clients"""
+        if run_deadline is None:
+            return None
+        now = time.time()
+        scores = {c: self.score(c, now) for c in remaining}
+        share = scores[client_id] / sum(scores.values())
+        return now + max(run_deadline - now, 0) * share
+
+    def prepare(self, client_id: int, config) -> Tuple[object, bool, Optional[object]]:
+        """
+        Config for the client's walk, whether to seek, and the config of a leg
+        to walk after it. An interrupted walk first covers the samples received
+        since the newest one synced, then continues below its resume point.
+        """
+        state = self.store.get(client_id)
+        resume_before = state['resume_before']
+        if resume_before is None or resume_before <= config.end_date:
+            return config, False, None
+
+        backlog = copy.copy(config)
+        backlog.start_date = min(config.start_date, resume_before + timedelta(seconds=1))
+        newest = state['newest_received']
+        if newest is None or newest <= resume_before or newest >= config.start_date:
+            reg.info(f'Client {client_id}: resuming before {resume_before}')
+            return backlog, True, None
+
+        reg.info(f'Client {client_id}: samples received after {newest} first, then resuming before {resume_before}')
+        head = copy.copy(config)
+        head.end_date = newest
+        return head, True, backlog
+
+    def record(self, client_id: int, scraper, samples: List[Dict]):
+        """Save the outcome of a client's walk"""
+        self.apply(client_id, self.outcome(client_id, scraper, samples))
+
+    def outcome(self, client_id: int, scraper, samples: List[Dict]) -> Dict:
+        """
+        What record() saves for a walk, detached from the scraper and its samples
+        so it can be held until the sinks have delivered them
+        """
+        timing = None
+        # A shared all-clients scan says nothing about this client's own grid
+        if getattr(scraper, 'client', client_id) == client_id:
+            timing = (getattr(scraper, 'pages_read', 0), getattr(scraper, 'walk_seconds', 0))
+        newest = max((s['ReceivedAt'] for s in samples if not pd.isna(s.get('ReceivedAt'))), default=None)
+
+        fields = {'last_volume': len(samples)}
+        if scraper.hit_deadline and getattr(scraper, 'next_leg', None) is not None:
+            # Stopped before reaching the backlog: its resume point stands, and the
+            # head is walked again from the top (newest_received must not move past it)
+            pass
+        elif scraper.hit_deadline and not pd.isna(scraper.page_oldest_date):
+            fields.update(newest_received=newest, resume_before=scraper.page_oldest_date)
+        elif getattr(scraper, 'page_errors', None):
+            # Pages failed to parse: not a clean run, so the client stays as stale as before
+            fields.update(newest_received=newest, resume_before=None)
+        else:
+            fields.update(newest_received=newest, last_success=time.time(), resume_before=None)
+        return {'timing': timing, 'fields': fields}
+
+    def apply(self, client_id: int, outcome: Dict):
+        """Save an outcome(); newest_received only ever moves forward"""
+        if outcome['timing'] is not None:
+            self.store.record_timing(client_id, *outcome['timing'])
+        fields = dict(outcome['fields'])
+        if 'newest_received' in fields:
+            previous = self.store.get(client_id)['newest_received']
+            fields['newest_received'] = max(filter(None, (fields['newest_received'], previous)), default=None)
+        self.store.update(client_id, **fields)
@@ -5,26 +5,30 @@ LIMS Sample Tracker ETL Pipeline
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from time import sleep
+from time import sleep, time
 from datetime import datetime, timedelta
 import pandas as pd
 import logging
 import pathlib
 import argparse
-from typing import Dict, List, Optional
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, NamedTuple, Optional
 from .config import LIMSConfig
 from .browser import Browser
 from .api_client import QuimiOSHubClient
+from .archive import PageArchive
+from .replica import SampleReplica
+from .aggregates import TurnaroundAggregates
+from .fingerprints import FingerprintStore, page_fingerprint
+from .freshness import FreshnessTracker
+from .pipeline import PagePipeline, PageResult
+from .logging_config import ErrorSampler, configure_logging
+from .sync_cache import SyncCache
+from .outbox import CircuitBreaker, SyncOutbox, flush_outbox
+from .sinks import describe_sinks, open_fanout
+from .run_summary import RunSummary
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('Registro.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured by main() (see logging_config.configure_logging)
 reg = logging.getLogger(__name__)
 
 # Map LIMS HTML element IDs to database column names
@@ -64,6 +68,103 @@ dtypes = {
 cols = list(dtypes.keys())
 date_cols = ['CreatedAt', 'ReceivedAt', 'ProcessedAt', 'ValidatedAt', 'BirthDate']
 
+DATETIME_FORMAT = '%d/%m/%Y %I:%M:%S %p'
+BIRTH_DATE_FORMAT = '%d/%m/%Y'
+
+
+class GridCellParser(HTMLParser):
+    """Collects the text of grid cells (elements whose id starts with the grid row base)"""
+
+    def __init__(self, row_base: str):
+        super().__init__()
+        self.row_base = row_base
+        self.cells: Dict[str, str] = {}
+        self._current: Optional[str] = None
+        self._depth = 0
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._current is not None:
+            self._depth += 1
+            return
+        element_id = dict(attrs).get('id') or ''
+        if element_id.startswith(self.row_base):
+            self._current, self._depth, self._text = element_id, 0, []
+
+    def handle_endtag(self, tag):
+        if self._current is None:
+            return
+        if self._depth:
+            self._depth -= 1
+            return
+        self.cells[self._current] = ''.join(self._text).strip()
+        self._current = None
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._text.append(data)
+
+
+class PageExtract(NamedTuple):
+    """Samples extracted from one grid page and the page's reception date bounds"""
+    samples: List[Dict]
+    newest: datetime
+    oldest: datetime
+
+
+def parse_grid_cells(html: str, row_base: str) -> Dict[str, str]:
+    """Map grid cell element IDs to their text for a whole page in one pass"""
+    parser = GridCellParser(row_base)
+    parser.feed(html)
+    parser.close()
+    return parser.cells
+
+
+def parse_lims_datetime(text: str, fmt: str = DATETIME_FORMAT) -> datetime:
+    """Parse a LIMS date cell; NaT when empty or malformed"""
+    if not text:
+        return pd.NaT
+    try:
+        return datetime.strptime(text, fmt)
+    except ValueError:
+        return pd.NaT
+
+
+def extract_page_samples(html: str, row_base: str, start_date: datetime, end_date: datetime) -> PageExtract:
+    """Extract the samples received within (end_date, start_date) from a grid page's HTML"""
+    cells = parse_grid_cells(html, row_base)
+    column_to_selector = {v: k for k, v in SELECTOR_TO_COLUMN.items()}
+    samples = []
+    newest = oldest = pd.NaT
+
+    # Scan rows 2-11
+    for row in range(2, 12):
+        prefix = f'{row_base}{str(row).zfill(2)}'
+        reception_date = parse_lims_datetime(cells.get(f'{prefix}_lblFechaRecep', ''))
+        if pd.isna(reception_date):
+            continue
+        if pd.isna(newest) or reception_date > newest:
+            newest = reception_date
+        if pd.isna(oldest) or reception_date < oldest:
+            oldest = reception_date
+
+        # Check if within date range
+        if not start_date > reception_date > end_date:
+            continue
+
+        sample = {}
+        for db_col in cols:
+            text = cells.get(f'{prefix}{column_to_selector[db_col]}', '')
+            if db_col == 'BirthDate':
+                sample[db_col] = parse_lims_datetime(text, BIRTH_DATE_FORMAT)
+            elif db_col in date_cols:
+                sample[db_col] = parse_lims_datetime(text)
+            else:
+                sample[db_col] = text if text else 0
+        samples.append(sample)
+
+    return PageExtract(samples, newest, oldest)
+
 
 
 class Scraper:
@@ -79,6 +180,37 @@ class Scraper:
         self.data: Dict[str, List] = {col: [] for col in cols}
         self.empty_pages_count = 0
         self.current_page = 1
+        self.page_newest_date = pd.NaT
+        self.page_oldest_date = pd.NaT
+        self.archive = PageArchive(config.archive_dir) if config.record_pages else None
+        # Set by the run loop: local read replica fed page by page (see replica.SampleReplica)
+        self.replica: Optional[SampleReplica] = None
+        # Set by the run loop: turnaround aggregates fed page by page (see aggregates.TurnaroundAggregates)
+        self.aggregates: Optional[TurnaroundAggregates] = None
+        self.cell_errors = ErrorSampler(reg)
+        self.deadline: Optional[float] = None
+        self.hit_deadline = False
+        # Set by the run loop: pages unchanged since the last synced run are skipped
+        self.fingerprints: Optional[FingerprintStore] = None
+        self.skip_unchanged = False
+        self.page_fingerprints: List = []
+        self.unchanged_pages = 0
+        self.skipped_pages = 0
+        # Multi-tab mode clears this and services other tabs while a postback loads
+        self.wait_after_click = True
+        self.clicked_at = 0.0
+        self.seek = False
+        # Set by the run loop: config of a leg walked after this one (an interrupted walk's backlog)
+        self.next_leg: Optional[LIMSConfig] = None
+        self.pipeline: Optional[PagePipeline] = None
+        # Set by the run loop when memory tracking is on (see memory.MemoryTracker)
+        self.memory = None
+        # Browser RSS at the end of the walk, taken while the driver is still up
+        self.end_chrome_rss: Optional[int] = None
+        # Pages fetched and wall time of the last walk, for the run planner
+        self.pages_read = 0
+        self.walk_started = 0.0
+        self.walk_seconds = 0.0
         
     def __enter__(self):
         """Context manager entry"""
@@ -88,6 +220,12 @@ class Scraper:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit - ensures driver cleanup"""
         self.browser.__exit__(exc_type, exc_val, exc_tb)
+        self.close()
+
+    def close(self):
+        """Close the local stores (the browser is left to its owner)"""
+        if self.archive is not None:
+            self.archive.close()
     
     def login(self) -> bool:
         """Login to LIMS system with error handling"""
@@ -156,7 +294,7 @@ class Scraper:
             element = self.driver.find_element(By.ID, element_id)
             return element.text
         except Exception as e:
-            reg.debug(f"Could not extract data from row {row}, column {col}: {e}")
+            self.cell_errors.record('missing cell', col, e)
             return ""
     
     def parse_date(self, row: int, col: str) -> datetime:
@@ -168,7 +306,7 @@ class Scraper:
             
             return datetime.strptime(date_text, '%d/%m/%Y %I:%M:%S %p')
         except Exception as e:
-            reg.debug(f"Could not parse date from row {row}, column {col}: {e}")
+            self.cell_errors.record('unparsable date', col, e)
             return pd.NaT
     
     def parse_birth_date(self, row: int) -> datetime:
@@ -179,44 +317,40 @@ class Scraper:
                 return pd.NaT
             return datetime.strptime(date_text, '%d/%m/%Y')
         except Exception as e:
-            reg.debug(f"Could not parse birth date from row {row}: {e}")
+            self.cell_errors.record('unparsable birth date', '_lblFecNac', e)
             return pd.NaT
 
+    def fetch_page(self) -> str:
+        """Grab the current page's HTML, recording it when an archive is configured"""
+        html = self.driver.page_source
+        if self.archive is not None:
+            self.archive.record(self.client, self.current_page, html)
+        return html
+
     def scan_page(self) -> int:
         """Scan current page for sample data within date range"""
-        samples_found = 0
-        # Reverse mapping for getting selectors from database columns
-        column_to_selector = {v: k for k, v in SELECTOR_TO_COLUMN.items()}
-
-        # Scan rows 2-11
-        for row in range(2, 12):
-            try:
-                reception_date = self.parse_date(row, '_lblFechaRecep')
-
-                # Check if within date range
-                if self.config.start_date > reception_date > self.config.end_date:
-                    reg.debug(f'Extracting data from row {row-1}')
+        return self.scan_html(self.fetch_page())
 
-                    # Extract all columns using database column names
-                    for db_col in cols:
-                        selector = column_to_selector[db_col]
+    def scan_html(self, html: str) -> int:
+        """Extract in-range samples from a grid page's HTML into self.data"""
+        return self.store_page(extract_page_samples(
+            html, self.config.selectors["GRID_ROW_BASE"], self.config.start_date, self.config.end_date
+        ))
 
-                        if db_col in date_cols:
-                            if db_col == 'BirthDate':
-                                self.data[db_col].append(self.parse_birth_date(row))
-                            else:
-                                self.data[db_col].append(self.parse_date(row, selector))
-                        else:
-                            value = self.extract_cell_data(row, selector)
-                            self.data[db_col].append(value if value else 0)
+    def store_page(self, page: PageExtract) -> int:
+        """Append an extracted page's samples to self.data"""
+        self.page_newest_date, self.page_oldest_date = page.newest, page.oldest
 
-                    samples_found += 1
+        for sample in page.samples:
+            for db_col in cols:
+                self.data[db_col].append(sample[db_col])
+        if self.replica is not None and page.samples:
+            self.replica.upsert(page.samples)
+        if self.aggregates is not None and page.samples:
+            self.aggregates.observe(page.samples)
 
-            except Exception as e:
-                reg.debug(f"Error processing row {row}: {e}")
-
-        reg.info(f"Found {samples_found} samples on current page")
-        return samples_found
+        reg.info("Found %d samples on current page", len(page.samples))
+        return len(page.samples)
     
     def get_current_page_position(self) -> int:
         """Detect current page position by finding td without <a> tag"""
@@ -256,48 +390,340 @@ class Scraper:
             )
             next_page_link.click()
             self.current_page += 1
-            sleep(self.config.sleep_time)
-            reg.debug(f'Navigated to page {self.current_page}')
+            self.clicked_at = time()
+            if self.wait_after_click:
+                sleep(self.config.sleep_time)
+            reg.debug('Navigated to page %d', self.current_page)
             return True
         except Exception as e:
             reg.warning(f'Cannot navigate to next page: {e}')
             return False
     
-    def scrape_client_data(self) -> int:
-        """Main scraping method for a client"""
-        if not self.login():
+    def read_reception_dates(self) -> List[datetime]:
+        """Read the reception dates of the rows on the current page"""
+        dates = [self.parse_date(row, '_lblFechaRecep') for row in range(2, 12)]
+        return [d for d in dates if not pd.isna(d)]
+
+    def reaches_date(self, target: datetime) -> bool:
+        """Check if the current page holds samples received before target"""
+        dates = self.read_reception_dates()
+        return not dates or min(dates) < target
+
+    def get_pager_pages(self) -> Dict:
+        """Map page numbers in the visible pager block to their td position.
+
+        The trailing '...' link that opens the next block is returned under
+        the key 'next_block' when present.
+        """
+        pages = {}
+        try:
+            cells = self.driver.find_elements(By.XPATH, self.config.selectors["GRID_PAGINATION_BASE"])
+        except Exception:
+            return pages
+
+        for td_index, cell in enumerate(cells, start=1):
+            text = cell.text.strip()
+            if text.isdigit():
+                pages[int(text)] = td_index
+            elif pages and td_index == len(cells):
+                pages['next_block'] = td_index
+        return pages
+
+    def open_pager_position(self, td_index: int, page_number: int) -> bool:
+        """Click the pager link at td_index and record the page it leads to"""
+        try:
+            self.driver.find_element(
+                By.XPATH, f'{self.config.selectors["GRID_PAGINATION_BASE"]}[{td_index}]/a'
+            ).click()
+            self.current_page = page_number
+            sleep(self.config.sleep_time)
+            reg.debug('Jumped to page %d', self.current_page)
+            return True
+        except Exception as e:
+            reg.warning(f'Cannot open page {page_number}: {e}')
+            return False
+
+    def seek_to_date(self, target: datetime) -> bool:
+        """Move to the first page holding samples received before target.
+
+        Relies on the grid listing samples newest first. Gallops over pager
+        blocks by opening each block's last page, then bisects inside the
+        block, reading only reception dates along the way.
+        """
+        if self.reaches_date(target):
+            return True
+
+        newer_page = self.current_page
+        while True:
+            pages = self.get_pager_pages()
+            numbered = [p for p in pages if p != 'next_block']
+            if not numbered:
+                return False
+
+            block_last = max(numbered)
+            if block_last > self.current_page:
+                if not self.open_pager_position(pages[block_last], block_last):
+                    return False
+                if self.reaches_date(target):
+                    return self._bisect_block(newer_page, block_last, target)
+                newer_page = block_last
+                pages = self.get_pager_pages()
+
+            if 'next_block' not in pages:
+                reg.info(f'Reached the last page before finding {target}')
+                return False
+            if not self.open_pager_position(pages['next_block'], block_last + 1):
+                return False
+            if self.reaches_date(target):
+                return True
+            newer_page = self.current_page
+
+    def _bisect_block(self, newer_page: int, older_page: int, target: datetime) -> bool:
+        """Find the first page in (newer_page, older_page] that reaches target"""
+        while older_page - newer_page > 1:
+            middle = (newer_page + older_page) // 2
+            if not self.open_pager_position(self.get_pager_pages()[middle], middle):
+                return False
+            if self.reaches_date(target):
+                older_page = middle
+            else:
+                newer_page = middle
+
+        if self.current_page != older_page:
+            return self.open_pager_position(self.get_pager_pages()[older_page], older_page)
+        return True
+
+    def scrape_client_data(self, seek: bool = False) -> int:
+        """Main scraping method for a client
+
+        With seek, jump straight to the first page of the date range and stop
+        once a page is entirely older than it (the grid is sorted newest first).
+        """
+        if not self.begin_walk(seek):
+            return 0
+        try:
+            while self.walk_step():
+                pass
+        finally:
+            self.close_pipeline()
+        return self.finish_walk()
+
+    def begin_walk(self, seek: bool = False, login: bool = True) -> bool:
+        """Open the client's grid and reset the walk state; False if no page is in range"""
+        if login and not self.login():
             raise Exception("Login failed")
 
         if not self.navigate_to_client():
             raise Exception(f"Could not navigate to client {self.client}")
 
+        self.seek = seek
         self.empty_pages_count = 0
-        total_samples = 0
+        self.total_samples = 0
+        self.page_errors: Dict[int, str] = {}
+        self.past_range = False
+        self.hit_deadline = False
+        self.unchanged_pages = 0
+        self.skipped_pages = 0
+        self.pipeline = None
+        self.pages_read = 0
+        self.walk_started = time()
+
+        if seek and not self.seek_to_date(self.config.start_date):
+            reg.info(f'No pages in date range for client {self.client}')
+            return self.start_next_leg()
+
+        # A leg followed by another is short and parsed inline, so it stops on the exact page
+        if self.next_leg is None:
+            self.open_pipeline()
+        return True
+
+    def open_pipeline(self):
+        """Start the background parsers for the current date range (none with parse_workers = 0)"""
+        if self.config.parse_workers > 0:
+            self.pipeline = PagePipeline(
+                self.config.selectors["GRID_ROW_BASE"], self.config.start_date, self.config.end_date,
+                workers=self.config.parse_workers, max_pending=self.config.parse_queue_size,
+                use_processes=self.config.parse_use_processes
+            )
 
+    def start_next_leg(self) -> bool:
+        """
+        Switch to next_leg and seek to its start from the current page.
+        Returns False when there is no leg left to walk.
+        """
+        if self.next_leg is None or self.hit_deadline:
+            return False
+        self.close_pipeline()
+        self.config, self.next_leg = self.next_leg, None
+        self.seek = True
+        self.empty_pages_count = 0
+        self.unchanged_pages = 0
+        self.past_range = False
+
+        reg.info(f'Client {self.client}: resuming before {self.config.start_date}')
+        if not self.seek_to_date(self.config.start_date):
+            reg.info(f'No pages left in date range for client {self.client}')
+            return False
+        self.open_pipeline()
+        return True
+
+    def walk_step(self) -> bool:
+        """
+        Process the current page and click through to the next one.
+        Returns False once the walk is over.
+        """
+        seek = self.seek
         # Continue until max consecutive empty pages reached
-        while self.empty_pages_count < self.config.max_empty_pages:
-            samples_on_page = self.scan_page()
-            total_samples += samples_on_page
+        if self.empty_pages_count >= self.config.max_empty_pages or self.past_range:
+            return self.start_next_leg()
 
-            # Reset counter if we found samples, increment if page was empty
-            if samples_on_page > 0:
-                self.empty_pages_count = 0
-            else:
-                self.empty_pages_count += 1
-                reg.debug(f'Empty page {self.empty_pages_count}/{self.config.max_empty_pages}')
+        if self.memory is not None and self.memory.check_page(self.client, self.current_page, self.driver) == 'recycle':
+            self.recycle_browser()
 
-            if not self.has_next_page():
-                reg.info(f'No more pages available for client {self.client}')
-                break
+        html = self.fetch_page()
+        self.pages_read += 1
+        if self.page_unchanged(html, seek):
+            if self.unchanged_pages >= self.config.unchanged_pages_stop:
+                reg.info(f'Client {self.client}: {self.unchanged_pages} consecutive unchanged pages, stopping')
+                return self.start_next_leg()
+        elif self.pipeline is None:
+            self.account_page(self.scan_html(html), seek)
+        else:
+            # Parse in the background while the driver moves to the next page
+            for result in self.pipeline.submit(self.current_page, html):
+                self.apply_page_result(result, seek)
 
-            if not self.go_to_next_page():
-                break
+        # Stop between pages so the walk can resume from here next run
+        if self.deadline is not None and time() >= self.deadline:
+            reg.warning(f'Deadline reached for client {self.client} on page {self.current_page}')
+            self.hit_deadline = True
+            return False
 
+        if self.past_range and self.next_leg is not None:
+            # This page may already reach into the next leg, so seek from here
+            return self.start_next_leg()
+
+        if not self.has_next_page():
+            reg.info(f'No more pages available for client {self.client}')
+            return False
+
+        return self.go_to_next_page()
+
+    def recycle_browser(self) -> bool:
+        """
+        Restart Chrome mid-walk and seek back to the page about to be read.
+        Only for a scraper that owns its browser; shared (multi-tab) drivers are left alone.
+        """
+        if self.browser.driver is None or self.driver is not self.browser.driver:
+            reg.warning(f'Client {self.client}: browser is shared, not recycling')
+            return False
+
+        if self.pipeline is not None:
+            # page_oldest_date must reflect every page read so far
+            for result in self.pipeline.drain():
+                self.apply_page_result(result, self.seek)
+        resume = self.page_oldest_date
+
+        self.browser.quit_driver()
+        self.browser.start_driver()
+        self.driver = self.browser.driver
+        self.current_page = 1
+        if not self.login() or not self.navigate_to_client():
+            raise Exception(f'Could not reopen client {self.client} after recycling the browser')
+        if pd.isna(resume):
+            return True
+        # The grid is newest first: the first page older than what was read is the next one
+        return self.seek_to_date(resume)
+
+    def close_pipeline(self):
+        """Apply the pages still being parsed and stop the parse workers"""
+        pipeline, self.pipeline = self.pipeline, None
+        if pipeline is None:
+            return
+        try:
+            for result in pipeline.drain():
+                self.apply_page_result(result, self.seek)
+        finally:
+            pipeline.close()
+
+    def finish_walk(self) -> int:
+        """Log the walk's outcome; returns the samples collected"""
+        self.walk_seconds = time() - self.walk_started
+        if self.memory is not None:
+            self.end_chrome_rss = self.memory.browser_rss(self.driver)
         if self.empty_pages_count >= self.config.max_empty_pages:
             reg.info(f'Stopped after {self.empty_pages_count} consecutive empty pages')
+        if self.page_errors:
+            reg.warning(f'Client {self.client}: {len(self.page_errors)} pages failed to parse: {sorted(self.page_errors)}')
+            # Their samples were never stored, so they must not be skipped as unchanged next run
+            self.page_fingerprints = [(page, fingerprint) for page, fingerprint in self.page_fingerprints
+                                      if page not in self.page_errors]
+        if self.skipped_pages:
+            reg.info(f'Client {self.client}: skipped {self.skipped_pages} unchanged pages')
+
+        self.cell_errors.log_summary(f'Client {self.client} cell errors')
+        reg.info(f'Completed scraping client {self.client}. Total samples: {self.total_samples}')
+        return self.total_samples
+
+    def page_unchanged(self, html: str, seek: bool = False) -> bool:
+        """
+        Fingerprint the page and report whether it can be skipped: it matches a
+        page synced on an earlier run. Pages that lie wholly inside the date range
+        are remembered for commit_fingerprints().
+        """
+        if self.fingerprints is None:
+            return False
+        fingerprint = page_fingerprint(html, self.config.selectors["GRID_ROW_BASE"])
+        if fingerprint is None:
+            self.unchanged_pages = 0
+            return False
+
+        if self.skip_unchanged and self.fingerprints.matches(self.client, fingerprint):
+            self.page_newest_date, self.page_oldest_date = fingerprint.newest, fingerprint.oldest
+            self.unchanged_pages += 1
+            self.skipped_pages += 1
+            self.empty_pages_count = 0
+            if seek and not pd.isna(fingerprint.newest) and fingerprint.newest <= self.config.end_date:
+                self.past_range = True
+            reg.debug('Page %d unchanged since last run', self.current_page)
+            return True
+
+        self.unchanged_pages = 0
+        if not pd.isna(fingerprint.oldest) and self.config.start_date > fingerprint.newest \
+                and fingerprint.oldest > self.config.end_date:
+            self.page_fingerprints.append((self.current_page, fingerprint))
+        return False
 
-        reg.info(f'Completed scraping client {self.client}. Total samples: {total_samples}')
-        return total_samples
+    def commit_fingerprints(self):
+        """Remember this walk's pages (except those that failed to parse); call only once their samples are synced"""
+        pages = [(page, fingerprint) for page, fingerprint in self.page_fingerprints
+                 if page not in getattr(self, 'page_errors', {})]
+        if self.fingerprints is not None and pages:
+            self.fingerprints.save(self.client, pages)
+        self.page_fingerprints = []
+
+    def apply_page_result(self, result: PageResult, seek: bool = False):
+        """Store a background-parsed page, or record why it failed"""
+        if result.error is not None:
+            self.page_errors[result.page_number] = result.error
+            return
+        self.account_page(self.store_page(result.extract), seek)
+
+    def account_page(self, samples_on_page: int, seek: bool = False):
+        """Update the stop conditions after a page has been stored"""
+        self.total_samples += samples_on_page
+
+        # Reset counter if we found samples, increment if page was empty
+        if samples_on_page > 0:
+            self.empty_pages_count = 0
+        else:
+            self.empty_pages_count += 1
+            reg.debug('Empty page %d/%d', self.empty_pages_count, self.config.max_empty_pages)
+
+        if seek and not pd.isna(self.page_newest_date) and self.page_newest_date <= self.config.end_date:
+            if not self.past_range:
+                reg.info(f'Passed the end of the date range for client {self.client}')
+            self.past_range = True
 
 
 def prepare_sample_data(scraper_data: Dict[str, List]) -> List[Dict]:
@@ -315,6 +741,21 @@ def prepare_sample_data(scraper_data: Dict[str, List]) -> List[Dict]:
     return samples
 
 
+def store_locally(config: LIMSConfig, sample_lists: Iterable[List[Dict]]):
+    """Feed samples scraped outside the run loop (backfill, worker jobs, replay) to the replica and aggregates"""
+    replica = SampleReplica(config.replica_path) if config.replica_enabled else None
+    aggregates = TurnaroundAggregates(config.aggregates_path) if config.aggregates_enabled else None
+    try:
+        for sample_records in sample_lists:
+            if replica is not None:
+                replica.upsert(sample_records)
+            if aggregates is not None:
+                aggregates.observe(sample_records)
+    finally:
+        if replica is not None:
+            replica.close()
+
+
 def main():
     """Main execution function"""
     parser = argparse.ArgumentParser(description='LIMS ETL - Extract sample data from LIMS and sync to QuimiOSHub')
@@ -322,10 +763,44 @@ def main():
     parser.add_argument('--end-date', type=str, help='End date (YYYY-MM-DD) - older limit')
     parser.add_argument('--max-empty-pages', type=int, help='Max consecutive empty pages before stopping')
     parser.add_argument('--clients', type=str, help='Comma-separated client IDs')
+    parser.add_argument('command', nargs='?', default='run', choices=['run', 'backfill', 'enqueue', 'worker', 'refresh-pending', 'reconcile', 'replay', 'query', 'aggregates', 'flush', 'detach-partitions', 'plan'],
+                        help='run: walk each client once (default); backfill: split the date range into parallel windows; '
+                             'enqueue: queue the date windows as shared jobs; worker: process queued jobs; '
+                             'refresh-pending: re-check only samples still missing ValidatedAt; '
+                             'reconcile: compare per-day digests with the hub and re-sync differing days; '
+                             'replay: re-extract recorded pages from the archive and sync them; '
+                             'query: look samples up in the local replica; '
+                             'aggregates: export turnaround aggregates as CSV; '
+                             'flush: retry the samples parked in the sync outbox; '
+                             'detach-partitions: detach PostgreSQL sample partitions older than --end-date; '
+                             'plan: probe each client\'s pager and estimate pages, rows, duration and workers')
+    parser.add_argument('--workers', type=int, help='Parallel workers for backfill (plan: pack onto this many)')
+    parser.add_argument('--window-days', type=int, help='Days per backfill window')
+    parser.add_argument('--queue', type=str, help='Work queue URL (sqlite:///path or postgresql://...)')
+    parser.add_argument('--worker-id', type=str, help='Worker name used for job leases')
+    parser.add_argument('--summary-file', type=str, help='Reconcile against a JSON export of hub samples instead of the hub')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Reconcile/replay: report what would be synced without syncing')
+    parser.add_argument('--record', action='store_true', help='Save every fetched grid page to the archive')
+    parser.add_argument('--deadline-minutes', type=float, help='Stop the run at a page boundary after this many minutes')
+    parser.add_argument('--folio', type=int, help='Query: folio to look up')
+    parser.add_argument('--pending', action='store_true', help='Query: only samples still missing ValidatedAt')
+    parser.add_argument('--limit', type=int, default=100, help='Query: max rows to print')
+    parser.add_argument('--dimension', type=str, help='Aggregates: only this dimension (Location, Outsourcer, ExamName, Priority, all)')
+    parser.add_argument('--merge-days', action='store_true', help='Aggregates: one row per value over the whole range')
+    parser.add_argument('--output', type=str, help='Aggregates/plan: write the CSV here instead of stdout')
+    parser.add_argument('--track-memory', action='store_true',
+                        help='Record Python heap and Chrome RSS per page and client in the run summary')
+    parser.add_argument('--all-clients', action='store_true',
+                        help='Scan the grid once without a client filter and route rows by ClientId')
+    parser.add_argument('--tabs', type=int, help='Scrape this many clients at once in tabs of a single browser')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Re-extract and re-sync every page, even those unchanged since the last run')
     args = parser.parse_args()
 
     try:
         config = LIMSConfig()
+        configure_logging(config.log_level, config.log_file, config.log_json)
 
         # Override config with CLI arguments
         if args.start_date:
@@ -336,46 +811,348 @@ def main():
             config.max_empty_pages = args.max_empty_pages
         if args.clients:
             config.test_clients = [int(c.strip()) for c in args.clients.split(',')]
+        if args.workers:
+            config.backfill_workers = args.workers
+        if args.window_days:
+            config.backfill_window_days = args.window_days
+        if args.queue:
+            config.queue_url = args.queue
+        if args.record:
+            config.record_pages = True
+        if args.deadline_minutes:
+            config.run_deadline_minutes = args.deadline_minutes
+        if args.full_refresh:
+            config.full_refresh = True
+        if args.tabs:
+            config.browser_tabs = args.tabs
+        if args.all_clients:
+            config.scan_all_clients = True
+        if args.track_memory:
+            config.memory_tracking = True
 
         reg.info(f'Date range: {config.start_date.date()} (newer) > samples > {config.end_date.date()} (older)')
         reg.info(f'Max consecutive empty pages: {config.max_empty_pages}')
 
+        if args.command == 'detach-partitions':
+            from .database import DatabaseManager
+            if not args.end_date:
+                raise ValueError('detach-partitions needs --end-date (partitions ending on or before it are detached)')
+            detached = DatabaseManager().detach_partitions_before(config.end_date)
+            reg.info(f'Detached {len(detached)} partitions: {detached}')
+            return
+
+        if args.command == 'query':
+            # Answered from the replica alone: no browser, no hub
+            replica = SampleReplica(config.replica_path)
+            try:
+                rows = replica.query(
+                    folio=args.folio,
+                    client_ids=config.test_clients if args.clients else None,
+                    since=config.end_date if args.end_date else None,
+                    until=config.start_date if args.start_date else None,
+                    pending_only=args.pending,
+                    limit=args.limit,
+                )
+            finally:
+                replica.close()
+            print(pd.DataFrame(rows).to_csv(index=False) if rows else 'No matching samples')
+            return
+
+        if args.command == 'plan':
+            # Reads the LIMS only: no hub needed
+            from .planner import plan_run
+            from .scheduler import ClientStateStore
+
+            store = ClientStateStore(config.client_state_path)
+            try:
+                plan = plan_run(config, config.test_clients, store, config.run_deadline_minutes or None,
+                                args.workers)
+            finally:
+                store.close()
+            if args.output:
+                plan.table().to_csv(args.output, index=False)
+            else:
+                print(plan.table().to_csv(index=False) if plan.estimates else 'No clients could be probed')
+            return
+
+        if args.command == 'aggregates':
+            table = TurnaroundAggregates(config.aggregates_path).export(
+                since=config.end_date if args.end_date else None,
+                until=config.start_date if args.start_date else None,
+                dimension=args.dimension,
+                by_day=not args.merge_days,
+            )
+            if args.output:
+                table.to_csv(args.output, index=False)
+                reg.info(f'Wrote {len(table)} aggregate rows to {args.output}')
+            else:
+                print(table.to_csv(index=False) if not table.empty else 'No aggregates in range')
+            return
+
+        if args.command == 'enqueue':
+            from .backfill import split_date_range
+            from .work_queue import open_work_queue, enqueue_windows
+
+            windows = split_date_range(config.start_date, config.end_date, config.backfill_window_days)
+            queued = enqueue_windows(open_work_queue(config.queue_url), config.test_clients, windows)
+            reg.info(f'Queued {queued} new jobs on {config.queue_url}')
+            return
+
+        replayed = None
+        if args.command == 'replay':
+            from .archive import PageArchive, replay
+
+            archive = PageArchive(config.archive_dir)
+            try:
+                replayed = replay(archive, config)
+            finally:
+                archive.close()
+            reg.info(f'Replay extracted {sum(len(s) for s in replayed.values())} samples')
+            if args.dry_run:
+                return
+            store_locally(config, replayed.values())
+
         # Initialize QuimiOSHub API client (required)
         if not config.hub_api_url:
             raise ValueError("HUB_API_URL not configured in .env file")
 
         reg.info(f'Initializing QuimiOSHub API client: {config.hub_api_url}')
-        hub_client = QuimiOSHubClient(config.hub_api_url, config.hub_api_key)
+        sync_cache = None
+        if config.sync_cache_enabled:
+            sync_cache = SyncCache(config.sync_cache_path, config.sync_cache_max_entries,
+                                   config.sync_cache_max_age_days)
+            sync_cache.evict()
+        outbox = None
+        if config.outbox_enabled:
+            outbox = SyncOutbox(config.outbox_path, config.outbox_retry_base_seconds,
+                                config.outbox_retry_max_seconds, config.outbox_max_attempts)
+        breaker = CircuitBreaker(config.breaker_failures, config.breaker_reset_seconds)
+        freshness = FreshnessTracker(config.freshness_slo_minutes, config.freshness_slo_quantile)
+        hub_client = QuimiOSHubClient(config.hub_api_url, config.hub_api_key, sync_cache, outbox, breaker,
+                                      config.hub_timeout_seconds, freshness)
+
+        from .pending import PendingIndex, refresh_pending
+        pending_index = PendingIndex(config.pending_index_path)
+        hub_client.pending_index = pending_index
 
-        if not hub_client.health_check():
+        if hub_client.health_check():
+            reg.info('QuimiOSHub API connection successful')
+        elif outbox is not None and args.command != 'flush':
+            # Keep scraping; everything synced this run waits in the outbox
+            reg.warning('QuimiOSHub API is not accessible; samples will be parked in the outbox')
+            breaker.trip()
+        else:
             raise ConnectionError('QuimiOSHub API is not accessible. Please check the API is running.')
 
-        reg.info('QuimiOSHub API connection successful')
-        total_synced = 0
+        if args.command == 'flush':
+            if outbox is None:
+                raise ValueError('Sync outbox is disabled (LIMS_OUTBOX=false)')
+            sent, remaining = flush_outbox(hub_client, outbox, config.outbox_batch_size)
+            reg.info(f'Flush completed. Sent {sent} samples; {remaining} still queued, '
+                     f'{outbox.dead_count()} gave up after {config.outbox_max_attempts} attempts.')
+            return
+
+        if outbox is not None and not breaker.blocked and outbox.count():
+            # Older parked samples go first so they are not overtaken by newer scrapes
+            flush_outbox(hub_client, outbox, config.outbox_batch_size)
+
+        if args.command == 'reconcile':
+            from .reconcile import reconcile, FileSummarySource
+
+            cache = sync_cache or SyncCache(config.sync_cache_path, config.sync_cache_max_entries,
+                                            config.sync_cache_max_age_days)
+            hub_client.cache = cache
+            summary_source = FileSummarySource(args.summary_file) if args.summary_file else None
+            mismatches = reconcile(config, hub_client, cache, summary_source, args.dry_run)
+            reg.info(f'Reconcile completed. {sum(len(days) for days in mismatches.values())} client-days differed.')
+            return
+
+        if args.command == 'refresh-pending':
+            reg.info(f'Re-checking {pending_index.count()} pending samples')
+            updated = refresh_pending(config, hub_client, pending_index)
+            reg.info(f'Pending refresh completed. Updated {updated} samples.')
+            return
+
+        if args.command == 'worker':
+            from .work_queue import open_work_queue, run_worker, default_worker_id
 
-        for client_id in config.test_clients:
+            run_worker(open_work_queue(config.queue_url), config, hub_client,
+                       args.worker_id or default_worker_id(), config.queue_lease_seconds)
+            return
+
+        # Every client's samples go to all configured sinks at once, each behind its own buffer
+        fanout = open_fanout(config, hub_client, pending_index)
+
+        if args.command in ('backfill', 'replay'):
+            if replayed is not None:
+                results = replayed
+            else:
+                from .backfill import run_backfill
+                results = run_backfill(config, config.backfill_workers, config.backfill_window_days)
+                store_locally(config, results.values())
+
+            for client_id, sample_records in results.items():
+                if not sample_records:
+                    reg.warning(f'No data found for client {client_id}')
+                    continue
+                fanout.submit(client_id, sample_records)
+            fanout.close()
+
+            reg.info(f'{args.command.capitalize()} completed. {describe_sinks(fanout.summary())}')
+            return
+
+        from .scheduler import ClientScheduler, ClientStateStore
+        scheduler = ClientScheduler(ClientStateStore(config.client_state_path), config.client_priorities)
+        run_deadline = time() + config.run_deadline_minutes * 60 if config.run_deadline_minutes else None
+        remaining = scheduler.order(config.test_clients)
+        fingerprints = FingerprintStore(config.fingerprint_path) if config.skip_unchanged_pages else None
+        replica = SampleReplica(config.replica_path) if config.replica_enabled else None
+        aggregates = TurnaroundAggregates(config.aggregates_path) if config.aggregates_enabled else None
+        summary = RunSummary(args.command)
+
+        memory = None
+        if config.memory_tracking:
+            from .memory import MemoryTracker
+            memory = MemoryTracker(config.memory_top, config.memory_page_interval, config.memory_python_warn_mb,
+                                   config.memory_chrome_warn_mb, config.memory_chrome_recycle_mb)
+            memory.start()
+
+        def make_scraper(client_id: int) -> Scraper:
             reg.info(f'Starting scrape for client {client_id}')
+            client_config, resume, next_leg = scheduler.prepare(client_id, config)
+            scraper = Scraper(client_id, client_config)
+            scraper.seek = resume
+            scraper.next_leg = next_leg
+            scraper.deadline = scheduler.client_deadline(client_id, remaining, run_deadline)
+            scraper.fingerprints = fingerprints
+            scraper.skip_unchanged = not config.full_refresh
+            scraper.replica = replica
+            scraper.aggregates = aggregates
+            scraper.memory = memory
+            if memory is not None:
+                memory.client_started(client_id)
+            return scraper
 
-            try:
-                with Scraper(client_id, config) as scraper:
-                    samples_count = scraper.scrape_client_data()
+        # (client IDs, fingerprint key, pages): saved once the sinks have all of those clients' samples
+        held_fingerprints = []
+        # (client ID, scheduler outcome): likewise, so undelivered samples are walked again next run
+        held_outcomes = []
 
-                    if scraper.data and any(scraper.data.values()):
-                        # Convert scraper data to API format
-                        sample_records = prepare_sample_data(scraper.data)
+        def hold_fingerprints(client_ids: List[int], scraper: Scraper):
+            if scraper.fingerprints is not None and scraper.page_fingerprints:
+                held_fingerprints.append((client_ids, scraper.client, scraper.page_fingerprints))
+            scraper.page_fingerprints = []
 
-                        # Push directly to QuimiOSHub API
-                        synced_count = hub_client.sync_samples(sample_records)
-                        reg.info(f'Client {client_id}: {synced_count}/{len(sample_records)} samples synced to QuimiOSHub')
-                        total_synced += synced_count
-                    else:
-                        reg.warning(f'No data found for client {client_id}')
+        def finish_client(client_id: int, scraper: Scraper, error: Optional[Exception] = None,
+                          sample_records: Optional[List[Dict]] = None) -> bool:
+            """Hand a client's walk to the sinks and record it (by default everything the scraper collected)"""
+            try:
+                if error is not None:
+                    raise error
+                if sample_records is None:
+                    sample_records = prepare_sample_data(scraper.data)
+
+                if sample_records:
+                    fanout.submit(client_id, sample_records)
+                elif not scraper.skipped_pages:
+                    reg.warning(f'No data found for client {client_id}')
+                hold_fingerprints([client_id], scraper)
 
+                held_outcomes.append((client_id, scheduler.outcome(client_id, scraper, sample_records)))
+                summary.record_client(client_id, samples=len(sample_records),
+                                      pages=scraper.current_page, skipped_pages=scraper.skipped_pages,
+                                      page_errors=len(getattr(scraper, 'page_errors', {})),
+                                      hit_deadline=scraper.hit_deadline)
+                return True
             except Exception as e:
                 reg.error(f'Error processing client {client_id}: {e}')
-                continue
+                summary.record_client(client_id, error=str(e))
+                return False
+            finally:
+                remaining.remove(client_id)
+                if memory is not None:
+                    memory.client_finished(client_id, chrome_rss=scraper.end_chrome_rss)
+
+        def deadline_passed() -> bool:
+            return run_deadline is not None and time() >= run_deadline
+
+        if config.scan_all_clients and len(remaining) > 1 and not deadline_passed():
+            from .demux import AllClientsScraper, plan_scan
+
+            scan_config, seek, next_leg = plan_scan(scheduler, remaining, config)
+            scan = AllClientsScraper(list(remaining), scan_config)
+            scan.next_leg = next_leg
+            scan.deadline = run_deadline
+            scan.fingerprints = fingerprints
+            scan.skip_unchanged = not config.full_refresh
+            scan.replica = replica
+            scan.aggregates = aggregates
+            scan.memory = memory
+            if memory is not None:
+                for client_id in remaining:
+                    memory.client_started(client_id)
+            try:
+                with scan:
+                    scan.scrape_client_data(seek=seek)
+            except Exception as e:
+                # Typically UnfilteredScanRefused: the LIMS wants a client ID
+                reg.warning(f'All-clients scan failed ({e}); falling back to per-client searches')
+            else:
+                # The pages are shared, so they are remembered only once every client is synced
+                page_fingerprints, scan.page_fingerprints = scan.page_fingerprints, []
+                routed = scan.routed_samples()
+                outcomes = [finish_client(client_id, scan, sample_records=client_samples)
+                            for client_id, client_samples in routed.items()]
+                if all(outcomes):
+                    scan.page_fingerprints = page_fingerprints
+                    hold_fingerprints(list(routed), scan)
 
-        reg.info(f'ETL pipeline completed. Synced {total_synced} samples.')
+        if config.browser_tabs > 1 and remaining:
+            from .multitab import run_tabs
+            run_tabs(config, list(remaining), config.browser_tabs, make_scraper, finish_client, deadline_passed)
+
+        while remaining and config.browser_tabs <= 1:
+            client_id = remaining[0]
+            if deadline_passed():
+                break
+
+            scraper = make_scraper(client_id)
+            try:
+                with scraper:
+                    scraper.scrape_client_data(seek=scraper.seek)
+            except Exception as e:
+                finish_client(client_id, scraper, e)
+            else:
+                finish_client(client_id, scraper)
+
+        if remaining:
+            reg.warning(f'Run deadline reached; clients left for the next run: {remaining}')
+
+        # Wait for the sinks to catch up before trusting what they wrote
+        fanout.close()
+        if replica is not None:
+            replica.close()
+        for client_ids, key, pages in held_fingerprints:
+            if all(fanout.delivered(client_id) for client_id in client_ids):
+                fingerprints.save(key, pages)
+        for client_id, outcome in held_outcomes:
+            if fanout.delivered(client_id):
+                scheduler.apply(client_id, outcome)
+            else:
+                reg.warning(f'Client {client_id}: not every sink took its samples; its state is left for the next run')
+        for client_id in summary.clients:
+            summary.record_client(client_id, written=fanout.client_counts(client_id))
+        summary.sections['sinks'] = fanout.summary()
+        for outcome, count in hub_client.stats.items():
+            summary.add(outcome, count)
+        if outbox is not None:
+            summary.add('outbox', outbox.count())
+        summary.sections['freshness'] = freshness.summary()
+        if memory is not None:
+            summary.sections['memory'] = memory.summary()
+            memory.stop()
+        summary.write(config.run_summary_path)
+        reg.info(f'ETL pipeline completed. {describe_sinks(fanout.summary())}')
 
     except Exception as e:
         reg.error(f'Critical error in main execution: {e}')
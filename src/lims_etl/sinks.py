@@ -0,0 +1,253 @@
+"""
+Sample sinks (QuimiOSHub, PostgreSQL, CSV staging) fed concurrently, each from
+its own bounded buffer
+"""
+
+import logging
+import pathlib
+from abc import ABC, abstractmethod
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Set
+
+import pandas as pd
+
+reg = logging.getLogger(__name__)
+
+SINK_NAMES = ('hub', 'postgres', 'file')
+
+
+class Sink(ABC):
+    """A destination for sample batches; write() returns how many samples it accepted"""
+
+    name = 'sink'
+
+    @abstractmethod
+    def write(self, client_id: int, samples: List[Dict]) -> int:
+        ...
+
+    def shed(self, client_id: int, samples: List[Dict]) -> bool:
+        """Keep a batch the sink could not take; False if it is lost"""
+        return False
+
+    def failing(self) -> bool:
+        """True while the sink is known to be down, so batches are shed instead of queued"""
+        return False
+
+    def close(self):
+        pass
+
+
+class HubSink(Sink):
+    """
+    QuimiOSHub, through the hub client's cache, outbox and circuit breaker.
+    Only samples the hub took or the outbox will deliver join the pending index.
+    """
+
+    name = 'hub'
+
+    def __init__(self, hub_client, pending_index=None):
+        self.hub_client = hub_client
+        self.pending_index = pending_index
+
+    def write(self, client_id: int, samples: List[Dict]) -> int:
+        synced, parked = self.hub_client.send_samples(samples)
+        reg.info(f'Client {client_id}: {len(synced)}/{len(samples)} samples synced to QuimiOSHub')
+        if self.pending_index is not None:
+            self.pending_index.track(synced + parked)
+        return len(synced)
+
+    def shed(self, client_id: int, samples: List[Dict]) -> bool:
+        if self.hub_client.outbox is None:
+            return False
+        self.hub_client.park(samples)
+        if self.pending_index is not None:
+            self.pending_index.track(samples)
+        return True
+
+    def failing(self) -> bool:
+        return self.hub_client.breaker.blocked
+
+
+class PostgresSink(Sink):
+    """The partitioned samples table (see database.DatabaseManager)"""
+
+    name = 'postgres'
+
+    def __init__(self, database):
+        self.database = database
+
+    def write(self, client_id: int, samples: List[Dict]) -> int:
+        return self.database.save_samples(samples)
+
+
+class FileSink(Sink):
+    """One CSV per client under a per-run directory, appended batch by batch"""
+
+    name = 'file'
+
+    def __init__(self, directory: str):
+        self.directory = pathlib.Path(directory) / datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, client_id: int, samples: List[Dict]) -> int:
+        path = self.directory / f'client_{client_id}.csv'
+        pd.DataFrame(samples).to_csv(path, mode='a', header=not path.exists(), index=False)
+        return len(samples)
+
+
+class SinkWorker:
+    """
+    A thread draining one sink's bounded queue. A full queue blocks offer()
+    until the sink catches up, so a slow sink slows the scraper rather than
+    losing rows. Batches are shed to the sink (or dropped) only while it is
+    failing: its own failing() says so, its last batch failed every retry, or
+    the queue stayed full for put_timeout. The first batch it writes again
+    ends that.
+    """
+
+    def __init__(self, sink: Sink, queue_size: int = 8, put_timeout: float = 30,
+                 retries: int = 3, retry_seconds: float = 2):
+        self.sink = sink
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self.put_timeout = put_timeout
+        self.stalled = False
+        self.retries = max(1, retries)
+        self.retry_seconds = retry_seconds
+        self.counts = {'rows': 0, 'written': 0, 'rejected': 0, 'failed': 0, 'shed': 0, 'dropped': 0}
+        self.by_client: Dict[int, int] = {}
+        self.failed_clients: Set[int] = set()
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self.thread = threading.Thread(target=self._run, name=f'sink-{sink.name}', daemon=True)
+        self.thread.start()
+
+    def offer(self, client_id: int, samples: List[Dict]):
+        self.counts['rows'] += len(samples)
+        try:
+            if self.stalled or self.sink.failing():
+                self.queue.put_nowait((client_id, samples))
+            else:
+                self.queue.put((client_id, samples), timeout=self.put_timeout)
+        except queue.Full:
+            if not self.stalled:
+                reg.warning(f'Sink {self.sink.name} is stalled; shedding its batches until it recovers')
+            self.stalled = True
+            try:
+                kept = self.sink.shed(client_id, samples)
+            except Exception as e:
+                reg.error(f'Sink {self.sink.name}: could not shed a batch: {e}')
+                kept = False
+            self.counts['shed' if kept else 'dropped'] += len(samples)
+            if not kept:
+                self.failed_clients.add(client_id)
+            reg.warning(f'Sink {self.sink.name}: {len(samples)} samples of client {client_id} '
+                        f'{"shed" if kept else "dropped"}')
+            return
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self._deliver(*item)
+
+    def _deliver(self, client_id: int, samples: List[Dict]):
+        for attempt in range(1, self.retries + 1):
+            started = time.perf_counter()
+            try:
+                written = self.sink.write(client_id, samples)
+            except Exception as e:
+                self.busy_seconds += time.perf_counter() - started
+                if attempt == self.retries:
+                    reg.error(f'Sink {self.sink.name}: client {client_id} batch failed after {attempt} attempts: {e}')
+                    self.counts['failed'] += len(samples)
+                    self.failed_clients.add(client_id)
+                    self.stalled = True
+                    return
+                delay = self.retry_seconds * 2 ** (attempt - 1)
+                reg.warning(f'Sink {self.sink.name}: attempt {attempt} failed ({e}); retrying in {delay:.0f}s')
+                time.sleep(delay)
+                continue
+            self.busy_seconds += time.perf_counter() - started
+            self.stalled = False
+            self.counts['written'] += written
+            self.counts['rejected'] += len(samples) - written
+            self.by_client[client_id] = self.by_client.get(client_id, 0) + written
+            return
+
+    def close(self):
+        """Deliver what is queued, then stop"""
+        self.queue.put(None)
+        self.thread.join()
+        self.sink.close()
+
+    def summary(self) -> Dict:
+        return {**self.counts, 'busy_seconds': round(self.busy_seconds, 1), 'max_queue': self.max_depth}
+
+
+class SinkFanout:
+    """Sends every batch to all sinks at once, each through its own queue"""
+
+    def __init__(self, sinks: List[Sink], batch_size: int = 500, **worker_options):
+        self.batch_size = max(1, batch_size)
+        self.workers = [SinkWorker(sink, **worker_options) for sink in sinks]
+
+    def submit(self, client_id: int, samples: List[Dict]):
+        for start in range(0, len(samples), self.batch_size):
+            batch = samples[start:start + self.batch_size]
+            for worker in self.workers:
+                worker.offer(client_id, batch)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def delivered(self, client_id: int) -> bool:
+        """Every sink took all of the client's batches (sent, rejected into the outbox, or shed)"""
+        return all(client_id not in worker.failed_clients for worker in self.workers)
+
+    def client_counts(self, client_id: int) -> Dict[str, int]:
+        return {worker.sink.name: worker.by_client.get(client_id, 0) for worker in self.workers}
+
+    def summary(self) -> Dict[str, Dict]:
+        return {worker.sink.name: worker.summary() for worker in self.workers}
+
+
+def build_sinks(config, hub_client, pending_index=None) -> List[Sink]:
+    """The sinks named in config.sinks"""
+    unknown = set(config.sinks) - set(SINK_NAMES)
+    if unknown:
+        raise ValueError(f'Unknown sinks {sorted(unknown)}; expected some of {SINK_NAMES}')
+
+    sinks: List[Sink] = []
+    if 'hub' in config.sinks:
+        sinks.append(HubSink(hub_client, pending_index))
+    if 'postgres' in config.sinks:
+        from .database import DatabaseManager
+        database = DatabaseManager()
+        database.create_tables()
+        sinks.append(PostgresSink(database))
+    if 'file' in config.sinks:
+        sinks.append(FileSink(config.file_sink_dir))
+    return sinks
+
+
+def open_fanout(config, hub_client, pending_index=None) -> SinkFanout:
+    return SinkFanout(build_sinks(config, hub_client, pending_index), config.sink_batch_size,
+                      queue_size=config.sink_queue_size, put_timeout=config.sink_put_timeout_seconds,
+                      retries=config.sink_retries, retry_seconds=config.sink_retry_seconds)
+
+
+def describe_sinks(summary: Dict[str, Dict]) -> str:
+    """One-line digest of SinkFanout.summary()"""
+    if not summary:
+        return 'No sinks configured.'
+    return 'Written per sink: ' + ', '.join(
+        f"{name} {counts['written']}/{counts['rows']}"
+        + (f" ({counts['failed'] + counts['dropped']} lost)" if counts['failed'] + counts['dropped'] else '')
+        for name, counts in summary.items()
+    ) + '.'
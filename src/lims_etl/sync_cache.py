@@ -0,0 +1,131 @@
+"""
+Content-hash cache of samples QuimiOSHub already holds, to skip re-uploading them
+"""
+
+import hashlib
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+reg = logging.getLogger(__name__)
+
+Key = Tuple[int, int, Optional[str]]
+
+
+def payload_digest(payload: Dict) -> str:
+    """Stable hash of an API payload (as built by QuimiOSHubClient._convert_sample_format)"""
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+class SyncCache:
+    """
+    SQLite index of (Folio, ClientId, ReceivedAt) -> payload hash for synced samples.
+    Bounded by max_entries (oldest entries evicted first) and max_age_days.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500000, max_age_days: int = 400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS synced (
+                client_id INTEGER NOT NULL,
+                received_at TEXT NOT NULL,
+                folio INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (client_id, received_at, folio)
+            );
+            CREATE INDEX IF NOT EXISTS ix_synced_at ON synced (synced_at);
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        ''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get_digest(self, key: Key) -> Optional[str]:
+        """Hash last synced for a sample, or None if the hub has not seen it"""
+        folio, client_id, received_at = key
+        if received_at is None:
+            return None
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT digest FROM synced WHERE client_id = ? AND received_at = ? AND folio = ?',
+                (client_id, received_at, folio)
+            ).fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, entries: Iterable[Tuple[Key, str]]):
+        """Record the hashes the hub now holds"""
+        now = time.time()
+        rows = [(client_id, received_at, folio, digest, now)
+                for (folio, client_id, received_at), digest in entries if received_at is not None]
+        with self._lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO synced VALUES (?, ?, ?, ?, ?)', rows)
+
+    def invalidate(self, client_id: int, start: str, end: str) -> int:
+        """Forget a client's samples received in [start, end) so they are sent again"""
+        with self._lock, self.conn:
+            return self.conn.execute(
+                'DELETE FROM synced WHERE client_id = ? AND received_at >= ? AND received_at < ?',
+                (client_id, start, end)
+            ).rowcount
+
+    def digests_between(self, client_id: int, after: str, until: str) -> List[Tuple[str, str]]:
+        """(received_at, digest) of a client's samples received in (after, until]"""
+        with self._lock:
+            return self.conn.execute(
+                'SELECT received_at, digest FROM synced '
+                'WHERE client_id = ? AND received_at > ? AND received_at <= ?',
+                (client_id, after, until)
+            ).fetchall()
+
+    def evicted_through(self) -> Optional[str]:
+        """Newest received_at ever evicted: days up to it may be missing entries"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'evicted_through'").fetchone()
+        return row[0] if row else None
+
+    def _note_evicted(self, newest: Optional[str]):
+        if newest is not None:
+            self.conn.execute(
+                "INSERT INTO meta VALUES ('evicted_through', ?) ON CONFLICT (name) "
+                "DO UPDATE SET value = MAX(value, excluded.value)",
+                (newest,)
+            )
+
+    def evict(self) -> int:
+        """Drop entries older than max_age_days, then the oldest beyond max_entries"""
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock, self.conn:
+            self._note_evicted(self.conn.execute(
+                'SELECT MAX(received_at) FROM synced WHERE synced_at < ?', (cutoff,)
+            ).fetchone()[0])
+            removed = self.conn.execute('DELETE FROM synced WHERE synced_at < ?', (cutoff,)).rowcount
+            excess = self.conn.execute('SELECT COUNT(*) FROM synced').fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._note_evicted(self.conn.execute(
+                    'SELECT MAX(received_at) FROM (SELECT received_at FROM synced ORDER BY synced_at LIMIT ?)',
+                    (excess,)
+                ).fetchone()[0])
+                removed += self.conn.execute('''
+                    DELETE FROM synced WHERE rowid IN (
+                        SELECT rowid FROM synced ORDER BY synced_at LIMIT ?
+                    )
+                ''', (excess,)).rowcount
+
+        if removed:
+            reg.debug(f'Evicted {removed} sync cache entries')
+        return removed
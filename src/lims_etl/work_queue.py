@@ -0,0 +1,461 @@
+"""
+Shared work queue so several ETL hosts can split the (client, date-window) jobs
+"""
+
+import logging
+import os
+import pathlib
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+import pandas as pd
+
+reg = logging.getLogger(__name__)
+
+
+class Job(NamedTuple):
+    """A leased (client, date-window) job"""
+    id: int
+    client_id: int
+    window_start: datetime
+    window_end: datetime
+    attempts: int
+
+
+class WorkQueue(ABC):
+    """
+    Base class for lease-based job queues.
+    Backends implement the SQL plumbing; jobs are claimed with a lease that
+    must be renewed by heartbeats, otherwise another worker may reclaim it.
+    A job whose lease expires after max_attempts claims is marked failed
+    instead of being handed out again.
+    """
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def create_tables(self):
+        ...
+
+    @abstractmethod
+    def enqueue(self, client_id: int, window_start: datetime, window_end: datetime) -> bool:
+        """Add a job; returns False if the same job is already queued"""
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Job]:
+        """Lease the next pending job, or an expired one with attempts left, for worker_id"""
+
+    @abstractmethod
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+        """Extend the lease; returns False if the worker no longer holds it"""
+
+    @abstractmethod
+    def complete(self, job_id: int, worker_id: str, newest_received: Optional[datetime]) -> bool:
+        """
+        Mark a job done and advance the client watermark in one transaction.
+        Returns False (and leaves the watermark alone) if the lease was lost.
+        """
+
+    @abstractmethod
+    def fail(self, job_id: int, worker_id: str, error: str):
+        """Release a job so it can be retried, or park it after max_attempts"""
+
+    @abstractmethod
+    def outstanding(self) -> int:
+        """Number of jobs not yet done or failed"""
+
+    @abstractmethod
+    def get_watermark(self, client_id: int) -> Optional[datetime]:
+        ...
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """WorkQueue on a SQLite file; safe across processes on one host or a shared volume"""
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self.path = path
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.create_tables()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    @staticmethod
+    def _rollback(conn: sqlite3.Connection):
+        """Roll back after an error without masking it (BEGIN may itself have failed)"""
+        if conn.in_transaction:
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error as e:
+                reg.warning(f'Work queue rollback failed: {e}')
+
+    def create_tables(self):
+        conn = self._connect()
+        try:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    client_id INTEGER NOT NULL,
+                    window_start TEXT NOT NULL,
+                    window_end TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    UNIQUE (client_id, window_start, window_end)
+                );
+                CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, lease_expires);
+                CREATE TABLE IF NOT EXISTS watermarks (
+                    client_id INTEGER PRIMARY KEY,
+                    newest_received TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+            ''')
+        finally:
+            conn.close()
+
+    def enqueue(self, client_id: int, window_start: datetime, window_end: datetime) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (client_id, window_start, window_end) VALUES (?, ?, ?)',
+                (client_id, window_start.isoformat(), window_end.isoformat())
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Job]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front so two workers
+            # cannot select the same row
+            conn.execute('BEGIN IMMEDIATE')
+            # A job that kept losing its lease (crashed or hung worker) is not handed out again
+            conn.execute('''
+                UPDATE jobs SET status = 'failed', worker_id = NULL, lease_expires = NULL,
+                    last_error = 'lease expired after ' || attempts || ' attempts'
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            ''', (now, self.max_attempts))
+            row = conn.execute('''
+                SELECT id, client_id, window_start, window_end, attempts FROM jobs
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ? AND attempts < ?)
+                ORDER BY window_start DESC, id
+                LIMIT 1
+            ''', (now, self.max_attempts)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute('''
+                UPDATE jobs SET status = 'leased', worker_id = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE id = ?
+            ''', (worker_id, now + lease_seconds, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            self._rollback(conn)
+            raise
+        finally:
+            conn.close()
+
+        return Job(row[0], row[1], datetime.fromisoformat(row[2]), datetime.fromisoformat(row[3]), row[4] + 1)
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, job_id: int, worker_id: str, newest_received: Optional[datetime]) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', lease_expires = NULL "
+                "WHERE id = ? AND worker_id = ? AND status = 'leased'",
+                (job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                conn.execute('ROLLBACK')
+                return False
+
+            if newest_received is not None:
+                conn.execute('''
+                    INSERT INTO watermarks (client_id, newest_received, updated_at)
+                    SELECT client_id, ?, ? FROM jobs WHERE id = ?
+                    ON CONFLICT (client_id) DO UPDATE SET
+                        newest_received = MAX(newest_received, excluded.newest_received),
+                        updated_at = excluded.updated_at
+                ''', (newest_received.isoformat(), time.time(), job_id))
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            self._rollback(conn)
+            raise
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, worker_id: str, error: str):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE jobs SET
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    worker_id = NULL, lease_expires = NULL, last_error = ?
+                WHERE id = ? AND worker_id = ? AND status = 'leased'
+            ''', (self.max_attempts, error, job_id, worker_id))
+        finally:
+            conn.close()
+
+    def outstanding(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'leased')").fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_watermark(self, client_id: int) -> Optional[datetime]:
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT newest_received FROM watermarks WHERE client_id = ?', (client_id,)).fetchone()
+            return datetime.fromisoformat(row[0]) if row else None
+        finally:
+            conn.close()
+
+
+class PostgresWorkQueue(WorkQueue):
+    """WorkQueue on PostgreSQL for workers spread across hosts"""
+
+    def __init__(self, dsn: str, max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self.dsn = dsn
+        self.create_tables()
+
+    def _connect(self):
+        import psycopg2
+        return psycopg2.connect(self.dsn)
+
+    def _execute(self, sql: str, params=(), fetch: bool = False):
+        conn = self._connect()
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                if fetch:
+                    return cursor.fetchall()
+                return cursor.rowcount
+        finally:
+            conn.close()
+
+    def create_tables(self):
+        self._execute('''
+            CREATE TABLE IF NOT EXISTS etl_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                client_id INTEGER NOT NULL,
+                window_start TIMESTAMP NOT NULL,
+                window_end TIMESTAMP NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_expires TIMESTAMPTZ,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                UNIQUE (client_id, window_start, window_end)
+            );
+            CREATE INDEX IF NOT EXISTS ix_etl_jobs_status ON etl_jobs (status, lease_expires);
+            CREATE TABLE IF NOT EXISTS etl_watermarks (
+                client_id INTEGER PRIMARY KEY,
+                newest_received TIMESTAMP NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        ''')
+
+    def enqueue(self, client_id: int, window_start: datetime, window_end: datetime) -> bool:
+        return self._execute(
+            'INSERT INTO etl_jobs (client_id, window_start, window_end) VALUES (%s, %s, %s) '
+            'ON CONFLICT DO NOTHING',
+            (client_id, window_start, window_end)
+        ) == 1
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Job]:
+        conn = self._connect()
+        try:
+            with conn, conn.cursor() as cursor:
+                # A job that kept losing its lease (crashed or hung worker) is not handed out again
+                cursor.execute('''
+                    UPDATE etl_jobs SET status = 'failed', worker_id = NULL, lease_expires = NULL,
+                        last_error = 'lease expired after ' || attempts || ' attempts'
+                    WHERE status = 'leased' AND lease_expires < now() AND attempts >= %s
+                ''', (self.max_attempts,))
+                # SKIP LOCKED lets concurrent workers pass over rows another worker is claiming
+                cursor.execute('''
+                    UPDATE etl_jobs SET status = 'leased', worker_id = %s,
+                        lease_expires = now() + %s * interval '1 second', attempts = attempts + 1
+                    WHERE id = (
+                        SELECT id FROM etl_jobs
+                        WHERE status = 'pending'
+                            OR (status = 'leased' AND lease_expires < now() AND attempts < %s)
+                        ORDER BY window_start DESC, id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, client_id, window_start, window_end, attempts
+                ''', (worker_id, lease_seconds, self.max_attempts))
+                row = cursor.fetchone()
+        finally:
+            conn.close()
+        return Job(*row) if row else None
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+        return self._execute(
+            "UPDATE etl_jobs SET lease_expires = now() + %s * interval '1 second' "
+            "WHERE id = %s AND worker_id = %s AND status = 'leased'",
+            (lease_seconds, job_id, worker_id)
+        ) == 1
+
+    def complete(self, job_id: int, worker_id: str, newest_received: Optional[datetime]) -> bool:
+        conn = self._connect()
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE etl_jobs SET status = 'done', lease_expires = NULL "
+                    "WHERE id = %s AND worker_id = %s AND status = 'leased' RETURNING client_id",
+                    (job_id, worker_id)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+
+                if newest_received is not None:
+                    cursor.execute('''
+                        INSERT INTO etl_watermarks (client_id, newest_received) VALUES (%s, %s)
+                        ON CONFLICT (client_id) DO UPDATE SET
+                            newest_received = GREATEST(etl_watermarks.newest_received, excluded.newest_received),
+                            updated_at = now()
+                    ''', (row[0], newest_received))
+                return True
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, worker_id: str, error: str):
+        self._execute('''
+            UPDATE etl_jobs SET
+                status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'pending' END,
+                worker_id = NULL, lease_expires = NULL, last_error = %s
+            WHERE id = %s AND worker_id = %s AND status = 'leased'
+        ''', (self.max_attempts, error, job_id, worker_id))
+
+    def outstanding(self) -> int:
+        return self._execute(
+            "SELECT COUNT(*) FROM etl_jobs WHERE status IN ('pending', 'leased')", fetch=True
+        )[0][0]
+
+    def get_watermark(self, client_id: int) -> Optional[datetime]:
+        rows = self._execute(
+            'SELECT newest_received FROM etl_watermarks WHERE client_id = %s', (client_id,), fetch=True
+        )
+        return rows[0][0] if rows else None
+
+
+def open_work_queue(url: str) -> WorkQueue:
+    """Open a queue from a URL: sqlite:///path/to/queue.db or postgresql://..."""
+    if url.startswith('sqlite:///'):
+        return SQLiteWorkQueue(url[len('sqlite:///'):])
+    if url.startswith(('postgresql://', 'postgres://')):
+        return PostgresWorkQueue(url)
+    raise ValueError(f"Unsupported work queue URL: {url}")
+
+
+def default_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class Heartbeat:
+    """Context manager that renews a job lease from a background thread"""
+
+    def __init__(self, queue: WorkQueue, job: Job, worker_id: str, lease_seconds: int):
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.job.id, self.worker_id, self.lease_seconds):
+                    reg.warning(f'Lost lease on job {self.job.id}')
+                    self.lost = True
+                    return
+            except Exception as e:
+                reg.warning(f'Heartbeat failed for job {self.job.id}: {e}')
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+
+
+def enqueue_windows(queue: WorkQueue, clients: List[int], windows) -> int:
+    """Queue one job per (client, window); returns the number of new jobs"""
+    return sum(queue.enqueue(client_id, start, end) for client_id in clients for start, end in windows)
+
+
+def run_worker(queue: WorkQueue, config, hub_client, worker_id: str,
+               lease_seconds: int = 600, poll_seconds: int = 10) -> int:
+    """
+    Claim and process jobs until the queue is drained.
+    Returns the number of samples synced by this worker.
+    """
+    from .backfill import scrape_window
+    from .scraper import store_locally
+
+    total_synced = 0
+    while True:
+        job = queue.claim(worker_id, lease_seconds)
+        if job is None:
+            if queue.outstanding() == 0:
+                break
+            # Other workers hold the remaining leases; wait in case one expires
+            time.sleep(poll_seconds)
+            continue
+
+        reg.info(f'Worker {worker_id} claimed job {job.id}: client {job.client_id} '
+                 f'{job.window_end.date()}..{job.window_start.date()} (attempt {job.attempts})')
+        try:
+            with Heartbeat(queue, job, worker_id, lease_seconds):
+                samples = scrape_window(config, job.client_id, (job.window_start, job.window_end))
+                store_locally(config, [samples])
+                synced_count = hub_client.sync_samples(samples) if samples else 0
+
+            received = [s['ReceivedAt'] for s in samples if not pd.isna(s.get('ReceivedAt'))]
+            newest = max(received) if received else None
+            if queue.complete(job.id, worker_id, newest):
+                total_synced += synced_count
+            else:
+                reg.warning(f'Job {job.id} was reclaimed by another worker; watermark left unchanged')
+        except Exception as e:
+            reg.error(f'Job {job.id} failed: {e}')
+            queue.fail(job.id, worker_id, str(e))
+
+    reg.info(f'Worker {worker_id} finished. Synced {total_synced} samples.')
+    return total_synced
@@ -0,0 +1,73 @@
+"""
+Tests for incremental turnaround aggregates
+"""
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from lims_etl.aggregates import LogSketch, TurnaroundAggregates
+
+
+def make_sample(folio, received, processed=pd.NaT, validated=pd.NaT, location='Matriz'):
+    return {'Folio': folio, 'ClientId': 101, 'ReceivedAt': received, 'ProcessedAt': processed,
+            'ValidatedAt': validated, 'Location': location, 'Outsourcer': 0, 'ExamName': 'BH',
+            'Priority': 'Normal'}
+
+
+@pytest.fixture
+def aggregates(tmp_path):
+    return TurnaroundAggregates(str(tmp_path / 'aggregates.db'))
+
+
+def test_sketch_quantiles_within_relative_error():
+    values = [random.Random(7).uniform(5, 5000) for _ in range(2000)]
+    sketch = LogSketch(0.01)
+    for value in values:
+        sketch.add(value)
+
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.03)
+
+
+def test_sketches_merge_and_retract():
+    a, b = LogSketch(), LogSketch()
+    a.add(10)
+    b.add(100)
+    a.merge(b)
+    assert a.count == 2
+    a.add(100, -1)
+    assert a.count == 1 and a.quantile(0.5) == pytest.approx(10, rel=0.02)
+
+
+def test_late_validation_replaces_contribution(aggregates):
+    received = datetime(2024, 1, 5, 8)
+    aggregates.observe([make_sample(1, received, processed=received + timedelta(hours=1))])
+    aggregates.observe([make_sample(1, received, processed=received + timedelta(hours=1))])
+    table = aggregates.export(dimension='all')
+    assert table.set_index('metric')['count'].to_dict() == {'process': 1}
+
+    aggregates.observe([make_sample(1, received, processed=received + timedelta(hours=1),
+                                    validated=received + timedelta(hours=3))])
+    table = aggregates.export(dimension='all').set_index('metric')
+    assert table['count'].to_dict() == {'process': 1, 'total': 1, 'validate': 1}
+    assert table.loc['total', 'mean_minutes'] == 180
+    assert table.loc['validate', 'p50_minutes'] == pytest.approx(120, rel=0.02)
+
+
+def test_export_by_dimension_and_merged_days(aggregates):
+    for day in (5, 6):
+        received = datetime(2024, 1, day, 8)
+        aggregates.observe([
+            make_sample(day * 10, received, processed=received + timedelta(minutes=30), location='Matriz'),
+            make_sample(day * 10 + 1, received, processed=received + timedelta(minutes=90), location='Norte'),
+        ])
+
+    by_day = aggregates.export(dimension='Location')
+    assert len(by_day) == 4
+    merged = aggregates.export(since=datetime(2024, 1, 1), until=datetime(2024, 1, 6),
+                               dimension='Location', by_day=False)
+    assert merged[['value', 'count', 'mean_minutes']].values.tolist() == [['Matriz', 1, 30.0], ['Norte', 1, 90.0]]
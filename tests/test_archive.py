@@ -0,0 +1,58 @@
+"""
+Tests for bulk page extraction and the record/replay archive
+"""
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from lims_etl.archive import PageArchive, replay
+from lims_etl.scraper import LIMSConfig, extract_page_samples, cols
+
+ROW_BASE = 'ctl00_ContentMasterPage_grdConsultaOT_ctl'
+PAGE_HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+
+
+@pytest.fixture
+def config():
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.test_clients = [101]
+    return config
+
+
+def test_extract_page_samples_reads_every_row():
+    page = extract_page_samples(PAGE_HTML, ROW_BASE, datetime(2023, 4, 1), datetime(2023, 1, 1))
+
+    assert len(page.samples) == 10
+    first = page.samples[0]
+    assert list(first) == cols
+    assert first['Folio'] == '100002'
+    assert first['ReceivedAt'] == datetime(2023, 3, 20, 1, 18)
+    assert first['BirthDate'] == datetime(1979, 11, 21)
+    assert page.newest == datetime(2023, 3, 20, 1, 18)
+    assert page.oldest < page.newest
+
+
+def test_extract_page_samples_filters_date_range():
+    page = extract_page_samples(PAGE_HTML, ROW_BASE, datetime(2023, 3, 19), datetime(2023, 1, 1))
+    assert all(s['ReceivedAt'] < datetime(2023, 3, 19) for s in page.samples)
+    assert len(page.samples) < 10
+    # Bounds still describe the whole page
+    assert page.newest == datetime(2023, 3, 20, 1, 18)
+
+
+def test_record_and_replay(tmp_path, config):
+    archive = PageArchive(str(tmp_path / 'archive'))
+    archive.record(101, 1, PAGE_HTML)
+    archive.record(102, 1, '<html>other client</html>')
+    # Recording the same page again in a later run does not duplicate samples
+    archive.record(101, 1, PAGE_HTML)
+
+    pages = list(archive.iter_pages(client_id=101))
+    assert [(client, page) for client, page, _, _ in pages] == [(101, 1), (101, 1)]
+    assert pages[0][3] == PAGE_HTML
+
+    results = replay(archive, config)
+    assert len(results[101]) == 10
+    archive.close()
@@ -0,0 +1,60 @@
+"""
+Tests for parallel backfill
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from lims_etl.backfill import split_date_range, run_backfill
+from lims_etl.samples import dedup_samples, sample_key
+from lims_etl.scraper import LIMSConfig
+
+
+def test_split_date_range_covers_range():
+    """Windows run newest first and tile the whole range"""
+    start, end = datetime(2023, 3, 1), datetime(2023, 1, 1)
+    windows = split_date_range(start, end, 14)
+
+    assert windows[0][0] == start
+    assert windows[-1][1] == end
+    for (_, older), (newer, _) in zip(windows, windows[1:]):
+        # Boundary samples stay inside the next window's exclusive filter
+        assert newer > older
+        assert newer - older == timedelta(seconds=1)
+
+
+def test_split_date_range_rejects_bad_window():
+    with pytest.raises(ValueError):
+        split_date_range(datetime(2023, 3, 1), datetime(2023, 1, 1), 0)
+
+
+def test_dedup_samples_by_natural_key():
+    received = datetime(2023, 1, 5, 10, 0, 0)
+    samples = [
+        {'Folio': '100', 'ClientId': '101', 'ReceivedAt': received},
+        {'Folio': 100, 'ClientId': 101, 'ReceivedAt': received},
+        {'Folio': '101', 'ClientId': '101', 'ReceivedAt': received},
+    ]
+    unique = dedup_samples(samples)
+    assert len(unique) == 2
+    assert sample_key(unique[0]) == (100, 101, received.isoformat())
+
+
+def test_run_backfill_merges_windows():
+    """Overlapping windows are merged and deduplicated per client"""
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 1, 29), datetime(2023, 1, 1)
+    config.test_clients = [101, 102]
+    boundary = {'Folio': '1', 'ClientId': '101', 'ReceivedAt': datetime(2023, 1, 15)}
+
+    def fake_window(cfg, client_id, window):
+        if client_id == 102:
+            raise Exception("Login failed")
+        return [boundary, {'Folio': str(window[1].day), 'ClientId': '101', 'ReceivedAt': window[1]}]
+
+    with patch('lims_etl.backfill.scrape_window', side_effect=fake_window):
+        results = run_backfill(config, workers=2, window_days=14)
+
+    assert len(results[101]) == 3
+    assert results[102] == []
@@ -57,12 +57,23 @@ def test_get_sample_count(test_db):
     """Test getting sample count from database"""
     assert test_db.get_sample_count() == 0
     
-    sample_data = [{'_lblFolioGrd': 123, '_lblClienteGrd': 101}]
+    sample_data = [{'_lblFolioGrd': 123, '_lblClienteGrd': 101, '_lblFechaRecep': datetime(2023, 1, 1, 11, 0, 0)}]
     test_db.save_samples(sample_data)
     
     assert test_db.get_sample_count() == 1
 
 
+def test_samples_without_key_are_skipped(test_db):
+    """Test that rows missing folio, client or reception date are skipped, as on PostgreSQL"""
+    sample_data = [
+        {'_lblFolioGrd': 123, '_lblClienteGrd': 101, '_lblFechaRecep': datetime(2023, 1, 1, 11, 0, 0)},
+        {'_lblFolioGrd': 124, '_lblClienteGrd': 101},
+        {'_lblClienteGrd': 101, '_lblFechaRecep': datetime(2023, 1, 1, 11, 0, 0)},
+    ]
+    assert test_db.save_samples(sample_data) == 1
+    assert test_db.get_sample_count() == 1
+
+
 def test_duplicate_handling(test_db):
     """Test that duplicate samples are handled properly"""
     sample_data = [{
@@ -89,7 +100,7 @@ def test_duplicate_handling(test_db):
     try:
         from lims_etl.database import Sample
         sample = session.query(Sample).first()
-        assert sample.label1 == 'Updated Label'
+        assert sample.exam_name == 'Updated Label'
     finally:
         session.close()
 
@@ -124,4 +135,26 @@ def test_upsert_mixed_data(test_db):
     
     count = test_db.save_samples(mixed_data)
     assert count == 2  # Processed 2 records
-    assert test_db.get_sample_count() == 2  # Total 2 unique records
\ No newline at end of file
+    assert test_db.get_sample_count() == 2  # Total 2 unique records
+
+def test_partition_name():
+    from lims_etl.database import partition_name
+    assert partition_name(datetime(2024, 3, 31, 23, 59)) == 'samples_y2024m03'
+
+
+def test_save_prepared_records(test_db):
+    """Records in the scraper's column format are written and upserted on the sample key"""
+    record = {
+        'Folio': '100002', 'ClientId': '101', 'ReceivedAt': datetime(2023, 3, 20, 1, 18),
+        'ExamName': 'BH', 'ValidatedAt': float('nan'), 'BirthDate': datetime(1990, 5, 15),
+    }
+    assert test_db.save_samples([record]) == 1
+    assert test_db.save_samples([dict(record, ValidatedAt=datetime(2023, 3, 21))]) == 1
+
+    session = test_db.get_session()
+    try:
+        sample = session.query(Sample).one()
+        assert (sample.folio, sample.client_id) == (100002, 101)
+        assert sample.validated_at == datetime(2023, 3, 21)
+    finally:
+        session.close()
@@ -0,0 +1,81 @@
+"""
+Tests for the single all-clients grid scan
+"""
+import importlib.util
+import re
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lims_etl.demux import AllClientsScraper, UnfilteredScanRefused, demux_samples
+from lims_etl.fake_driver import FakeDriver
+from lims_etl.scraper import LIMSConfig, Scraper
+
+ROOT = Path(__file__).parent.parent
+HTML = (ROOT / 'consulta.html').read_text()
+
+spec = importlib.util.spec_from_file_location('generate_mock_pages', ROOT / 'generate_mock_pages.py')
+generate_mock_pages = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_mock_pages)
+
+
+@pytest.fixture
+def config():
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.parse_workers = 0
+    config.sleep_time = 0
+    return config
+
+
+def test_demux_samples_groups_by_client():
+    samples = [{'Folio': '1', 'ClientId': '101'}, {'Folio': '2', 'ClientId': '104'}, {'Folio': '3', 'ClientId': 101}]
+    routed = demux_samples(samples)
+    assert [s['Folio'] for s in routed[101]] == ['1', '3']
+    assert [s['Folio'] for s in routed[104]] == ['2']
+
+
+def test_scan_routes_rows_of_tracked_clients(config):
+    scraper = AllClientsScraper([101, 104, 999], config)
+    scraper.driver = MagicMock(page_source=HTML)
+
+    with patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'has_next_page', return_value=False):
+        scraper.scrape_client_data()
+
+    routed = scraper.routed_samples()
+    assert {client_id: len(samples) for client_id, samples in routed.items()} == {101: 1, 104: 4, 999: 0}
+    assert all(int(s['ClientId']) == 104 for s in routed[104])
+    assert scraper.untracked_rows == 5
+    # The search went out without a client ID
+    scraper.driver.find_element.return_value.send_keys.assert_not_called()
+
+
+def test_pages_of_untracked_clients_do_not_end_the_scan(config):
+    pages = generate_mock_pages.generate_pages(8, seed=3)
+    for name in pages:
+        pages[name] = re.sub(r'(_lblClienteGrd">)\d+', r'\g<1>500', pages[name])
+    # Only the last page holds a tracked client's row, well past max_empty_pages
+    pages['consulta_page_8.html'] = re.sub(r'(_lblClienteGrd">)\d+', r'\g<1>101', pages['consulta_page_8.html'], count=1)
+    config.use_local_fixtures = True
+    config.start_date, config.end_date = datetime(2024, 1, 1), datetime(2000, 1, 1)
+    config.max_empty_pages = 3
+
+    scraper = AllClientsScraper([101, 102], config)
+    scraper.driver = FakeDriver(pages)
+    with patch('lims_etl.scraper.sleep'), patch('lims_etl.demux.sleep'):
+        scraper.scrape_client_data()
+
+    assert scraper.current_page == 8
+    assert {client_id: len(samples) for client_id, samples in scraper.routed_samples().items()} == {101: 1, 102: 0}
+    assert scraper.untracked_rows == 79
+
+
+def test_scan_refused_without_grid(config):
+    scraper = AllClientsScraper([101, 102], config)
+    scraper.driver = MagicMock(page_source='<html><span id="lblError">Capture un cliente</span></html>')
+
+    with pytest.raises(UnfilteredScanRefused):
+        scraper.navigate_to_client()
@@ -0,0 +1,140 @@
+"""
+End-to-end scraper tests over generated mock pages served by the in-process fake driver
+"""
+import importlib.util
+import copy
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+from lims_etl.fake_driver import FakeDriver
+from lims_etl.scraper import LIMSConfig, Scraper, parse_lims_datetime
+
+ROOT = Path(__file__).parent.parent
+
+spec = importlib.util.spec_from_file_location('generate_mock_pages', ROOT / 'generate_mock_pages.py')
+generate_mock_pages = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(generate_mock_pages)
+
+
+@pytest.fixture(scope='module')
+def pages():
+    return generate_mock_pages.generate_pages(300, seed=7)
+
+
+@pytest.fixture
+def config():
+    config = LIMSConfig()
+    config.use_local_fixtures = True
+    config.sleep_time = 0
+    config.parse_workers = 0
+    return config
+
+
+def received_dates(pages, total):
+    """Reception dates straight from the generated HTML, page by page"""
+    return {
+        page: [parse_lims_datetime(text) for text in
+               re.findall(r'_lblFechaRecep">([^<]+)<', pages[f'consulta_page_{page}.html'])]
+        for page in range(1, total + 1)
+    }
+
+
+def open_scraper(config, pages):
+    scraper = Scraper(101, config)
+    scraper.driver = FakeDriver(pages)
+    return scraper
+
+
+def test_fake_driver_pager_and_links(pages):
+    driver = FakeDriver(pages)
+    driver.get('file:///anywhere/consulta_page_12.html')
+    pager = '//*[@id="ctl00_ContentMasterPage_grdConsultaOT"]/tbody/tr[12]/td/table/tbody/tr/td'
+
+    assert [cell.text for cell in driver.find_elements(By.XPATH, pager)] == \
+        ['...'] + [str(p) for p in range(11, 21)] + ['...']
+    # The current page is the only numbered cell without a link
+    with pytest.raises(NoSuchElementException):
+        driver.find_element(By.XPATH, f'{pager}[3]/a')
+    assert driver.find_element(By.ID, 'ctl00_ContentMasterPage_grdConsultaOT_ctl02_lblFolioGrd').text == '100112'
+
+    driver.find_element(By.XPATH, f'{pager}[12]/a').click()
+    assert driver.current_url.endswith('consulta_page_21.html')
+
+
+def test_revisited_page_resets_its_inputs(pages):
+    driver = FakeDriver(pages)
+    driver.get('file:///anywhere/consulta_page_1.html')
+    client_input = driver.find_element(By.ID, 'ctl00_ContentMasterPage_txtcliente')
+    client_input.clear()
+    client_input.send_keys('999')
+
+    driver.get('file:///anywhere/consulta_page_2.html')
+    driver.get('file:///anywhere/consulta_page_1.html')
+    assert driver.find_element(By.ID, 'ctl00_ContentMasterPage_txtcliente').get_attribute('value') == '101'
+
+
+def test_scraper_walks_generated_pages_end_to_end(config, pages):
+    config.start_date, config.end_date = datetime(2023, 1, 1), datetime(2022, 11, 1)
+    expected = sum(config.start_date > d > config.end_date for dates in received_dates(pages, 300).values()
+                   for d in dates)
+
+    with patch('lims_etl.scraper.sleep'):
+        # A plain walk reads from page 1 until it runs out of pages
+        config.max_empty_pages = 300
+        full = open_scraper(config, pages)
+        assert full.scrape_client_data() == expected
+        assert full.current_page == 300
+        config.max_empty_pages = 5
+        seeking = open_scraper(config, pages)
+        assert seeking.scrape_client_data(seek=True) == expected
+
+    assert sorted(full.data['Folio']) == sorted(seeking.data['Folio'])
+    # Seeking skips the pages newer than the range instead of reading them
+    assert seeking.driver.loads < full.driver.loads / 2
+
+
+def test_seek_lands_on_first_page_reaching_target(config, pages):
+    target = datetime(2022, 6, 15, 12)
+    expected = min(page for page, dates in received_dates(pages, 300).items() if min(dates) < target)
+
+    scraper = open_scraper(config, pages)
+    with patch('lims_etl.scraper.sleep'):
+        assert scraper.login() and scraper.navigate_to_client()
+        loads = scraper.driver.loads
+        assert scraper.seek_to_date(target)
+
+    assert scraper.current_page == expected
+    # Gallops over pager blocks, then bisects inside the last one
+    assert scraper.driver.loads - loads <= 2 * (expected // 10) + 5
+
+
+def test_resumed_walk_takes_fresh_head_then_backlog(config, pages):
+    """A resumed walk reads the newest pages, then seeks past what the interrupted run synced"""
+    by_page = received_dates(pages, 300)
+    dates = sorted((d for page in by_page.values() for d in page), reverse=True)
+    start, end = dates[0] + (dates[0] - dates[1]), dates[-1]
+    newest_synced, resume_before = dates[25], dates[120]
+    config.start_date, config.end_date = start, end
+    config.parse_workers = 1
+    head = copy.copy(config)
+    head.end_date = newest_synced
+    backlog = copy.copy(config)
+    backlog.start_date = resume_before + timedelta(seconds=1)
+
+    scraper = open_scraper(head, pages)
+    scraper.next_leg = backlog
+    with patch('lims_etl.scraper.sleep'):
+        scraper.scrape_client_data(seek=True)
+
+    collected = sorted(scraper.data['ReceivedAt'], reverse=True)
+    assert collected == [d for d in dates if start > d > newest_synced or resume_before >= d > end]
+    # The stretch between the two legs is sought over, not read (the page ending the head is read twice)
+    between = sum(newest_synced > max(page) and min(page) > resume_before for page in by_page.values())
+    assert between > 5
+    assert scraper.pages_read == 300 - between + 1
@@ -0,0 +1,117 @@
+"""
+Tests for unchanged-page fingerprints
+"""
+import re
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lims_etl.fingerprints import FingerprintStore, page_fingerprint
+from lims_etl.scraper import LIMSConfig, Scraper, extract_page_samples
+
+HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+ROW_BASE = 'ctl00_ContentMasterPage_grdConsultaOT_ctl'
+
+
+def test_fingerprint_ignores_viewstate_but_not_cells():
+    fingerprint = page_fingerprint(HTML, ROW_BASE)
+    assert len(fingerprint.rows) == 10
+    assert fingerprint.rows[0][0] == '100002/105'
+    assert (fingerprint.newest, fingerprint.oldest) == (datetime(2023, 3, 20, 1, 18), datetime(2023, 3, 18, 21, 47))
+
+    noisy = HTML.replace('</form>', '<input type="hidden" id="__VIEWSTATE" value="abc123" /></form>', 1)
+    assert page_fingerprint(noisy, ROW_BASE) == fingerprint
+
+    edited = HTML.replace('>100002<', '>100002 <', 1)
+    assert page_fingerprint(edited, ROW_BASE).rows == fingerprint.rows
+    edited = HTML.replace('_lblFechaRecep">20/03/2023 01:18:00 AM<', '_lblFechaRecep">20/03/2023 01:19:00 AM<', 1)
+    assert page_fingerprint(edited, ROW_BASE).rows[0][1] != fingerprint.rows[0][1]
+    assert page_fingerprint(edited, ROW_BASE).rows[1:] == fingerprint.rows[1:]
+
+
+def shift_rows(html: str, by: int) -> str:
+    """The page as seen after `by` new samples arrived: every row moves down the grid"""
+    return re.sub(r'(grdConsultaOT_ctl)(\d+)_', lambda m: f'{m.group(1)}{int(m.group(2)) + by:02d}_', html)
+
+
+def test_store_matches_rows_wherever_they_sit(tmp_path):
+    store = FingerprintStore(str(tmp_path / 'fingerprints.db'))
+    fingerprint = page_fingerprint(HTML, ROW_BASE)
+    assert not store.matches(101, fingerprint)
+
+    store.save(101, [(7, fingerprint)])
+    assert store.matches(101, fingerprint)
+    assert not store.matches(102, fingerprint)
+    changed = fingerprint._replace(rows=((fingerprint.rows[0][0], '0' * 32),) + fingerprint.rows[1:])
+    assert store.matches(101, changed) is False
+
+    # One new sample pushed the rows down by one: same rows, new positions
+    shifted = page_fingerprint(shift_rows(HTML, 1), ROW_BASE)
+    assert shifted.rows == fingerprint.rows
+    assert store.matches(101, shifted)
+    # The page that now holds the new sample does not match
+    new_row = (('100001/105', 'f' * 32),)
+    assert not store.matches(101, shifted._replace(rows=new_row + shifted.rows[:-1]))
+    store.close()
+
+
+@pytest.mark.parametrize('full_refresh', [False, True])
+def test_walk_skips_unchanged_pages(tmp_path, full_refresh):
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.parse_workers = 0
+    config.unchanged_pages_stop = 3
+    store = FingerprintStore(str(tmp_path / 'fingerprints.db'))
+    store.save(101, [(1, page_fingerprint(HTML, ROW_BASE))])
+
+    scraper = Scraper(101, config)
+    scraper.driver = MagicMock()
+    scraper.driver.page_source = HTML
+    scraper.fingerprints = store
+    scraper.skip_unchanged = not full_refresh
+    pages = iter(range(5))
+
+    with patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'navigate_to_client', return_value=True), \
+         patch.object(Scraper, 'has_next_page', side_effect=lambda: next(pages, None) is not None), \
+         patch.object(Scraper, 'go_to_next_page', return_value=True):
+        total = scraper.scrape_client_data()
+
+    if full_refresh:
+        assert total == 60 and scraper.skipped_pages == 0
+        assert len(scraper.page_fingerprints) == 6
+    else:
+        assert total == 0 and scraper.skipped_pages == 3
+    store.close()
+
+
+def test_pages_that_fail_to_parse_are_not_fingerprinted(tmp_path):
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.parse_workers = 1
+    store = FingerprintStore(str(tmp_path / 'fingerprints.db'))
+
+    scraper = Scraper(101, config)
+    scraper.driver = MagicMock()
+    scraper.driver.page_source = HTML
+    scraper.fingerprints = store
+    scraper.skip_unchanged = True
+    pages = iter(range(2))
+
+    def go_to_next_page():
+        scraper.current_page += 1
+        return True
+
+    extract = extract_page_samples(HTML, config.selectors["GRID_ROW_BASE"], config.start_date, config.end_date)
+    with patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'navigate_to_client', return_value=True), \
+         patch.object(Scraper, 'has_next_page', side_effect=lambda: next(pages, None) is not None), \
+         patch.object(Scraper, 'go_to_next_page', side_effect=go_to_next_page), \
+         patch('lims_etl.pipeline._parse_page', side_effect=[extract, ValueError('bad row'), extract]):
+        assert scraper.scrape_client_data() == 20
+
+    assert scraper.page_errors == {2: 'bad row'}
+    assert [page for page, _ in scraper.page_fingerprints] == [1, 3]
+    store.close()
@@ -0,0 +1,81 @@
+"""
+Tests for freshness lag histograms
+"""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from lims_etl.api_client import QuimiOSHubClient
+from lims_etl.freshness import FreshnessTracker, LagHistogram
+from lims_etl.pending import PendingIndex
+
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = LagHistogram()
+    for minutes in [1, 2, 3, 10, 20, 45, 90, 3000]:
+        histogram.add(minutes)
+    histogram.add(-5)  # clock skew counts as no lag
+
+    summary = histogram.to_dict()
+    assert summary['count'] == 9
+    assert summary['buckets'] == {'<=5m': 4, '<=15m': 1, '<=30m': 1, '<=60m': 1, '<=120m': 1, '<=10080m': 1}
+    assert summary['p50_minutes'] == 15
+    assert summary['max_minutes'] == 3000
+    assert histogram.quantile(1.0) == 3000
+
+
+def test_received_and_validated_lag_per_client():
+    tracker = FreshnessTracker(slo_minutes=60)
+    tracker.observe([
+        {'ClientId': '101', 'ReceivedAt': NOW - timedelta(minutes=10), 'ValidatedAt': float('nan')},
+        {'ClientId': '102', 'ReceivedAt': NOW - timedelta(hours=5), 'ValidatedAt': NOW - timedelta(minutes=3)},
+    ], synced_at=NOW)
+    tracker.observe_payloads([{'clientId': 101, 'receivedAt': (NOW - timedelta(days=1)).isoformat(),
+                               'validatedAt': (NOW - timedelta(minutes=20)).isoformat()}],
+                             status_update=True, synced_at=NOW)
+
+    summary = tracker.summary()
+    client_101 = summary['clients']['101']
+    assert client_101['received']['count'] == 1 and client_101['received']['max_minutes'] == 10
+    # The status update only counts toward the validated lag
+    assert client_101['validated']['count'] == 1 and client_101['validated']['max_minutes'] == 20
+    assert summary['clients']['102']['validated']['max_minutes'] == 3
+    assert summary['clients_behind'] == [102]
+
+
+def test_hub_client_records_created_samples_only():
+    tracker = FreshnessTracker()
+    client = QuimiOSHubClient('http://hub', freshness=tracker)
+    client.session = MagicMock()
+    client.session.post.side_effect = [MagicMock(status_code=201), MagicMock(status_code=409)]
+    received = datetime.now() - timedelta(hours=1)
+
+    client.sync_samples([{'Folio': 1, 'ClientId': 101, 'ReceivedAt': received},
+                         {'Folio': 2, 'ClientId': 101, 'ReceivedAt': received}])
+
+    histogram = tracker.histograms[101]['received']
+    assert histogram.count == 1
+    assert 59 < histogram.max < 61
+
+
+def test_resent_samples_count_toward_validated_lag_only_when_newly_validated(tmp_path):
+    tracker = FreshnessTracker()
+    client = QuimiOSHubClient('http://hub', freshness=tracker)
+    client.pending_index = PendingIndex(str(tmp_path / 'pending.db'))
+    client.session = MagicMock()
+    client.session.post.return_value = MagicMock(status_code=409)
+    client.session.put.return_value = MagicMock(status_code=200)
+    received = datetime(2023, 1, 2, 9, 0)
+    pending = {'Folio': 1, 'ClientId': 101, 'ReceivedAt': received}
+    client.pending_index.track([pending])
+
+    validated = datetime.now() - timedelta(minutes=30)
+    # Folio 1 was synced unvalidated; folio 2 was validated long ago and is only resent
+    client.sync_samples([{**pending, 'ValidatedAt': validated},
+                         {'Folio': 2, 'ClientId': 101, 'ReceivedAt': received, 'ValidatedAt': received}])
+
+    histogram = tracker.histograms[101]['validated']
+    assert histogram.count == 1
+    assert 29 < histogram.max < 31
+    client.pending_index.close()
@@ -16,7 +16,7 @@ def test_scraper_runs_end_to_end():
         try:
             config = LIMSConfig()
             assert config.test_clients == [101, 102]
-            assert config.max_fails == 30
+            assert config.max_empty_pages == int(os.getenv('LIMS_MAX_EMPTY_PAGES', '5'))
         except FileNotFoundError:
             # Expected if selectors.json missing
             pass
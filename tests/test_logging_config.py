@@ -0,0 +1,54 @@
+"""
+Tests for hot-path logging helpers
+"""
+import json
+import logging
+
+from lims_etl.logging_config import ErrorSampler, JsonFormatter, configure_logging, stop_logging
+
+
+def test_error_sampler_logs_only_first_occurrences(caplog):
+    logger = logging.getLogger('lims_etl.test_sampler')
+    sampler = ErrorSampler(logger, sample=2)
+
+    with caplog.at_level(logging.DEBUG, logger=logger.name):
+        for row in range(10):
+            sampler.record('missing cell', f'_lblFolioGrd row {row}', Exception('no such element'))
+        sampler.record('unparsable date', '_lblFecLibera', ValueError('bad'))
+        assert len(caplog.records) == 3
+
+        sampler.log_summary('Client 101 cell errors')
+    assert 'missing cell x10' in caplog.records[-1].getMessage()
+    assert not sampler.counts
+
+
+def test_error_sampler_skips_formatting_when_debug_off():
+    logger = logging.getLogger('lims_etl.test_sampler_quiet')
+    logger.setLevel(logging.INFO)
+
+    class Exploding(Exception):
+        def __str__(self):
+            raise AssertionError('formatted while DEBUG is off')
+
+    sampler = ErrorSampler(logger)
+    sampler.record('missing cell', '_Label1', Exploding())
+    assert sampler.counts['missing cell'] == 1
+
+
+def test_json_formatter():
+    record = logging.LogRecord('lims_etl.scraper', logging.INFO, __file__, 1, 'Found %d samples', (10,), None)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'Found 10 samples'
+    assert entry['level'] == 'INFO'
+
+
+def test_configure_logging_writes_through_listener(tmp_path):
+    log_file = tmp_path / 'etl.log'
+    configure_logging('INFO', str(log_file), json_format=True)
+    try:
+        logging.getLogger('lims_etl.test').info('Client %s done', 101)
+    finally:
+        stop_logging()
+        logging.getLogger().handlers.clear()
+
+    assert json.loads(log_file.read_text())['message'] == 'Client 101 done'
@@ -0,0 +1,102 @@
+"""
+Tests for memory tracking and browser recycling
+"""
+import os
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lims_etl.memory import MemoryTracker, process_tree_rss
+from lims_etl.scraper import LIMSConfig, Scraper
+
+HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+
+
+def make_config():
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    return config
+
+
+def fake_driver():
+    return SimpleNamespace(service=SimpleNamespace(process=SimpleNamespace(pid=os.getpid())))
+
+
+def test_process_tree_rss_of_this_process():
+    assert process_tree_rss(os.getpid()) > 0
+
+
+def test_check_page_samples_on_interval_and_asks_for_recycle():
+    tracker = MemoryTracker(page_interval=2, chrome_recycle_mb=1)
+    assert tracker.check_page(101, 1, fake_driver()) is None
+    assert tracker.check_page(101, 2, fake_driver()) == 'recycle'
+    assert len(tracker.samples) == 1 and tracker.summary()['browser_recycles'] == 1
+
+
+def test_client_boundary_records_top_allocators():
+    tracker = MemoryTracker(top=3)
+    tracker.start()
+    try:
+        tracker.client_started(101)
+        retained = [bytearray(1024) for _ in range(1000)]
+        tracker.client_finished(101)
+    finally:
+        tracker.stop()
+    stats = tracker.summary()['clients']['101']
+    assert stats['python_growth_mb'] >= 0.9
+    assert len(stats['top_allocators']) == 3 and retained
+
+
+def test_client_chrome_rss_is_taken_while_the_browser_is_up():
+    tracker = MemoryTracker()
+    scraper = Scraper(101, make_config())
+    scraper.driver = fake_driver()
+    scraper.memory = tracker
+    # Walk state as begin_walk leaves it
+    scraper.walk_started, scraper.total_samples, scraper.page_errors = 0, 0, {}
+    scraper.finish_walk()
+
+    # The run loop reports the client after the browser has quit
+    scraper.driver = None
+    tracker.client_finished(101, chrome_rss=scraper.end_chrome_rss)
+    assert tracker.summary()['clients']['101']['chrome_mb'] > 0
+
+
+def test_heap_growth_per_page_stays_bounded():
+    """Regression guard: what a stored page keeps alive on the Python heap"""
+    scraper = Scraper(101, make_config())
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(30):
+            scraper.scan_html(HTML)
+        per_page = (tracemalloc.get_traced_memory()[0] - before) / 30
+    finally:
+        tracemalloc.stop()
+    assert len(scraper.data['Folio']) == 300
+    assert per_page < 16 * 1024
+
+
+def test_recycle_browser_seeks_back_to_next_page():
+    scraper = Scraper(101, make_config())
+    scraper.driver = scraper.browser.driver = MagicMock()
+    scraper.page_oldest_date = datetime(2023, 3, 18, 21, 47)
+    scraper.current_page = 7
+
+    with patch.object(scraper.browser, 'quit_driver'), \
+         patch.object(scraper.browser, 'start_driver') as start, \
+         patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'navigate_to_client', return_value=True), \
+         patch.object(Scraper, 'seek_to_date', return_value=True) as seek:
+        start.side_effect = lambda: setattr(scraper.browser, 'driver', MagicMock())
+        assert scraper.recycle_browser()
+
+    assert scraper.driver is scraper.browser.driver
+    seek.assert_called_once_with(datetime(2023, 3, 18, 21, 47))
+
+    scraper.driver = MagicMock()
+    assert scraper.recycle_browser() is False
@@ -0,0 +1,99 @@
+"""
+Tests for multi-tab scraping in one browser
+"""
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from lims_etl.multitab import run_tabs
+from lims_etl.scraper import LIMSConfig, Scraper
+
+HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.switches += 1
+        self.driver.current_window_handle = handle
+
+    def new_window(self, kind):
+        self.driver.current_window_handle = f'tab{len(self.driver.handles)}'
+        self.driver.handles.append(self.driver.current_window_handle)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.handles = ['tab0']
+        self.current_window_handle = 'tab0'
+        self.switches = 0
+        self.switch_to = FakeSwitchTo(self)
+        self.page_source = HTML
+
+    def close(self):
+        self.handles.remove(self.current_window_handle)
+
+
+def fake_next_page(scraper):
+    scraper.current_page += 1
+    return True
+
+
+def test_clients_interleave_across_tabs():
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.parse_workers = 0
+    config.sleep_time = 0
+    driver = FakeDriver()
+    visits, done = [], {}
+
+    def fetch(scraper):
+        visits.append((driver.current_window_handle, scraper.client, scraper.current_page))
+        return driver.page_source
+
+    def make_scraper(client_id):
+        return Scraper(client_id, config)
+
+    def on_done(client_id, scraper, error):
+        done[client_id] = (scraper.total_samples, error)
+
+    with patch('lims_etl.multitab.Browser') as browser, \
+         patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'navigate_to_client', return_value=True), \
+         patch.object(Scraper, 'fetch_page', autospec=True, side_effect=fetch), \
+         patch.object(Scraper, 'has_next_page', autospec=True, side_effect=lambda s: s.current_page < 2), \
+         patch.object(Scraper, 'go_to_next_page', autospec=True, side_effect=fake_next_page):
+        browser.return_value.__enter__.return_value = driver
+        assert run_tabs(config, [101, 102, 103], 2, make_scraper, on_done) == 3
+
+    assert done == {101: (20, None), 102: (20, None), 103: (20, None)}
+    # Round-robin: each tab's page is read in its own window, alternating tabs
+    assert visits[:4] == [('tab0', 101, 1), ('tab1', 102, 1), ('tab0', 101, 2), ('tab1', 102, 2)]
+    assert visits[4:] == [('tab0', 103, 1), ('tab0', 103, 2)]
+
+
+def test_failed_tab_is_replaced():
+    config = LIMSConfig()
+    config.parse_workers = 0
+    config.sleep_time = 0
+    driver = FakeDriver()
+    done = {}
+
+    def walk_step(scraper):
+        if scraper.client == 101:
+            raise RuntimeError('tab crashed')
+        return False
+
+    with patch('lims_etl.multitab.Browser') as browser, \
+         patch.object(Scraper, 'begin_walk', return_value=True), \
+         patch.object(Scraper, 'finish_walk', return_value=0), \
+         patch.object(Scraper, 'walk_step', autospec=True, side_effect=walk_step):
+        browser.return_value.__enter__.return_value = driver
+        run_tabs(config, [101, 102], 1, lambda c: Scraper(c, config),
+                 lambda c, s, e: done.__setitem__(c, e))
+
+    assert isinstance(done[101], RuntimeError) and done[102] is None
+    # The failed window is closed rather than left open in the shared browser
+    assert driver.handles == ['tab1']
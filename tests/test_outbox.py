@@ -0,0 +1,108 @@
+"""
+Tests for the sync outbox and circuit breaker
+"""
+import time
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from lims_etl.api_client import QuimiOSHubClient
+from lims_etl.outbox import CircuitBreaker, SyncOutbox, flush_outbox
+from lims_etl.sync_cache import SyncCache
+
+
+def make_sample(folio):
+    return {'Folio': str(folio), 'ClientId': '101', 'ReceivedAt': datetime(2023, 1, 2, 9), 'ExamName': 'CBC'}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = SyncOutbox(str(tmp_path / 'outbox.db'), base_delay=10, max_delay=100, max_attempts=3)
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def hub_client(tmp_path, outbox):
+    client = QuimiOSHubClient('http://hub', cache=SyncCache(str(tmp_path / 'cache.db')), outbox=outbox,
+                              breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    client.session = MagicMock()
+    client.session.post.return_value.status_code = 201
+    return client
+
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    breaker.opened_at -= 61
+    assert breaker.state == 'half-open' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    breaker.opened_at -= 61
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    breaker.opened_at -= 61
+
+    assert not breaker.blocked
+    assert breaker.allow()
+    # Everyone else waits for the trial to report back
+    assert breaker.blocked and not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+    breaker.record_failure()
+    breaker.opened_at -= 61
+    assert breaker.allow() and not breaker.allow()
+    # A trial that never reports is replaced after another reset period
+    breaker.trial_started_at -= 61
+    assert breaker.allow()
+
+
+def test_failures_are_parked_and_circuit_stops_requests(hub_client, outbox):
+    hub_client.session.post.side_effect = requests.Timeout('read timed out')
+
+    assert hub_client.sync_samples([make_sample(n) for n in range(5)]) == 0
+    # Two timeouts open the circuit; the other three rows never hit the hub
+    assert hub_client.session.post.call_count == 2
+    assert outbox.count() == 5
+
+
+def test_flush_sends_parked_rows_and_caches_them(hub_client, outbox):
+    hub_client.breaker.trip()
+    hub_client.sync_samples([make_sample(1), make_sample(2)])
+    assert hub_client.session.post.call_count == 0
+
+    hub_client.breaker.record_success()
+    assert flush_outbox(hub_client, outbox, batch_size=1) == (2, 0)
+    assert hub_client.session.post.call_count == 2
+
+    # Now known to the cache: a re-sync costs nothing
+    assert hub_client.sync_samples([make_sample(1)]) == 1
+    assert hub_client.session.post.call_count == 2
+
+
+def test_retries_back_off_then_give_up(hub_client, outbox):
+    hub_client.breaker = CircuitBreaker(failure_threshold=100)
+    hub_client.session.post.return_value.status_code = 500
+    hub_client.sync_samples([make_sample(1)])
+
+    assert flush_outbox(hub_client, outbox) == (0, 1)
+    assert outbox.due(10) == []
+    [entry] = outbox.due(10, now=time.time() + 30)
+    assert entry.attempts == 1
+
+    for hours in (1, 2):
+        with patch('lims_etl.outbox.time.time', return_value=time.time() + hours * 3600):
+            flush_outbox(hub_client, outbox)
+    assert outbox.count() == 0 and outbox.dead_count() == 1
@@ -0,0 +1,86 @@
+"""
+Tests for the pending-sample index
+"""
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from lims_etl.pending import PendingIndex, changed_samples, refresh_pending
+from lims_etl.scraper import LIMSConfig
+
+
+def make_sample(folio, received, processed=pd.NaT, validated=pd.NaT, client='101'):
+    return {'Folio': str(folio), 'ClientId': client, 'ReceivedAt': received,
+            'ProcessedAt': processed, 'ValidatedAt': validated}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PendingIndex(str(tmp_path / 'pending.db'))
+    yield index
+    index.close()
+
+
+def test_track_indexes_only_unvalidated(index):
+    samples = [
+        make_sample(1, datetime(2023, 1, 2, 9)),
+        make_sample(2, datetime(2023, 1, 3, 9), validated=datetime(2023, 1, 4)),
+        make_sample(3, datetime(2023, 1, 4, 9), processed=datetime(2023, 1, 4, 12)),
+    ]
+    assert index.track(samples) == 2
+
+    pending = index.pending_for(101)
+    assert [folio for folio, _, _ in pending] == [3, 1]  # Newest first
+
+    # Validation later removes the sample from the index
+    index.track([make_sample(3, datetime(2023, 1, 4, 9), validated=datetime(2023, 1, 5))])
+    assert index.count() == 1
+
+
+def test_changed_samples_skips_unchanged(index):
+    received = datetime(2023, 1, 2, 9)
+    index.track([make_sample(1, received), make_sample(2, received)])
+    rescraped = [
+        make_sample(1, received),
+        make_sample(2, received, processed=datetime(2023, 1, 2, 12)),
+        make_sample(9, received, validated=datetime(2023, 1, 3)),  # Not pending
+    ]
+    changed = changed_samples(index.pending_for(101), rescraped)
+    assert [s['Folio'] for s in changed] == ['2']
+
+
+def test_refresh_pending_pushes_changes(index):
+    config = LIMSConfig()
+    config.test_clients = [101, 102]
+    received = datetime(2023, 1, 2, 9)
+    index.track([make_sample(1, received)])
+    hub_client = MagicMock()
+    hub_client.send_updates.side_effect = lambda samples: samples
+
+    validated = make_sample(1, received, validated=datetime(2023, 1, 3))
+    with patch('lims_etl.pending.recheck_client', return_value=[validated]) as recheck:
+        assert refresh_pending(config, hub_client, index) == 1
+
+    # Client 102 has nothing pending, so its pages are never visited
+    recheck.assert_called_once()
+    hub_client.send_updates.assert_called_once_with([validated])
+    assert index.count() == 0
+
+
+def test_refresh_pending_keeps_rejected_updates(index):
+    config = LIMSConfig()
+    config.test_clients = [101]
+    received = datetime(2023, 1, 2, 9)
+    index.track([make_sample(1, received), make_sample(2, received)])
+    hub_client = MagicMock()
+    # The hub takes only folio 1's update
+    hub_client.send_updates.side_effect = lambda samples: [s for s in samples if s['Folio'] == '1']
+
+    rescraped = [make_sample(n, received, validated=datetime(2023, 1, 3)) for n in (1, 2)]
+    with patch('lims_etl.pending.recheck_client', return_value=rescraped):
+        assert refresh_pending(config, hub_client, index) == 1
+
+    # Folio 2 is still pending, so its validation is retried next time
+    assert [folio for folio, _, _ in index.pending_for(101)] == [2]
@@ -0,0 +1,59 @@
+"""
+Tests for the background page parsing pipeline
+"""
+import time
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from lims_etl.pipeline import PagePipeline
+
+ROW_BASE = 'ctl00_ContentMasterPage_grdConsultaOT_ctl'
+PAGE_HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+RANGE = (datetime(2023, 4, 1), datetime(2023, 1, 1))
+
+
+def test_results_keep_page_order():
+    def slow_first(html, row_base, start, end):
+        time.sleep(0.05 if html == 'page 1' else 0)
+        return html
+
+    with patch('lims_etl.pipeline._parse_page', side_effect=slow_first):
+        with PagePipeline(ROW_BASE, *RANGE, workers=3, max_pending=8) as pipeline:
+            results = []
+            for page in range(1, 6):
+                results += pipeline.submit(page, f'page {page}')
+            results += pipeline.drain()
+
+    assert [r.page_number for r in results] == [1, 2, 3, 4, 5]
+    assert [r.extract for r in results] == [f'page {n}' for n in range(1, 6)]
+
+
+def test_queue_is_bounded():
+    with patch('lims_etl.pipeline._parse_page', side_effect=lambda *a: time.sleep(0.01)):
+        with PagePipeline(ROW_BASE, *RANGE, max_pending=2) as pipeline:
+            results = []
+            for page in range(1, 6):
+                results += pipeline.submit(page, '')
+                assert len(pipeline.pending) <= 2
+            results += pipeline.drain()
+    assert len(results) == 5
+
+
+def test_parse_errors_are_reported_per_page():
+    with PagePipeline(ROW_BASE, *RANGE) as pipeline:
+        results = pipeline.submit(1, PAGE_HTML)
+        results += pipeline.submit(2, None)  # Not HTML: the parser raises
+        results += pipeline.submit(3, PAGE_HTML)
+        results += pipeline.drain()
+
+    assert [r.error is None for r in results] == [True, False, True]
+    assert len(results[0].extract.samples) == 10
+    assert results[1].page_number == 2
+
+
+def test_process_pool_parses_pages():
+    with PagePipeline(ROW_BASE, *RANGE, workers=2, use_processes=True) as pipeline:
+        pipeline.submit(1, PAGE_HTML)
+        results = pipeline.drain()
+    assert len(results[0].extract.samples) == 10
@@ -0,0 +1,56 @@
+"""
+Tests for the run planner
+"""
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from lims_etl.planner import lpt_assign, probe_client, recommend_workers
+from lims_etl.scheduler import ClientScheduler, ClientStateStore
+from lims_etl.scraper import LIMSConfig, Scraper
+
+HTML = (Path(__file__).parent.parent / 'consulta.html').read_text()
+
+
+def test_lpt_assign_balances_longest_first():
+    assignment = lpt_assign({101: 70, 102: 50, 103: 40, 104: 30, 105: 10}, 2)
+    assert assignment == [(100.0, [101, 104]), (100.0, [102, 103, 105])]
+
+
+def test_recommend_workers_fits_target():
+    durations = {101: 60, 102: 60, 103: 60, 104: 0}
+    assert recommend_workers(durations, 200, 8) == 1
+    assert recommend_workers(durations, 130, 8) == 2
+    assert recommend_workers(durations, 60, 8) == 3
+    # The longest client bounds the makespan: no worker count beyond the busy clients helps
+    assert recommend_workers(durations, 30, 8) == 3
+
+
+def test_probe_counts_pages_and_edge_rows():
+    config = LIMSConfig()
+    scraper = Scraper(101, config)
+    scraper.driver = MagicMock(page_source=HTML)
+
+    def seek(target):
+        scraper.current_page = 12 if target == datetime(2023, 3, 20) else 40
+        return True
+
+    with patch.object(scraper, 'seek_to_date', side_effect=seek):
+        # 4 of the fixture page's rows fall in the range; the 27 pages between the edges count as full
+        assert probe_client(scraper, datetime(2023, 3, 20), datetime(2023, 3, 19, 12)) == (12, 40, 4 + 27 * 10 + 4)
+
+
+def test_walk_timings_are_averaged(tmp_path):
+    store = ClientStateStore(str(tmp_path / 'clients.db'))
+    scheduler = ClientScheduler(store)
+    scheduler.record(101, SimpleNamespace(client=101, hit_deadline=False, page_oldest_date=None,
+                                          pages_read=10, walk_seconds=30), [])
+    assert store.get_timing(101) == 3.0
+    scheduler.record(101, SimpleNamespace(client=101, hit_deadline=False, page_oldest_date=None,
+                                          pages_read=10, walk_seconds=40), [])
+    assert store.get_timing(101) == 3.3
+    # A shared all-clients scan is not this client's timing
+    scheduler.record(101, SimpleNamespace(client=0, hit_deadline=False, page_oldest_date=None,
+                                          pages_read=10, walk_seconds=500), [])
+    assert store.get_timing(101) == 3.3
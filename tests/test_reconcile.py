@@ -0,0 +1,95 @@
+"""
+Tests for per-day digest reconciliation
+"""
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lims_etl.reconcile import (day_digest, diff_days, group_by_day, hub_day_digests, local_day_digests,
+                                reconcile, FileSummarySource)
+from lims_etl.scraper import LIMSConfig
+from lims_etl.sync_cache import SyncCache, payload_digest
+
+
+def make_payload(folio, received_at, client_id=101):
+    return {'folio': folio, 'clientId': client_id, 'receivedAt': received_at, 'examName': 'CBC'}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SyncCache(str(tmp_path / 'cache.db'))
+    yield cache
+    cache.close()
+
+
+def test_day_digest_is_order_independent():
+    digests = [payload_digest(make_payload(n, '2023-01-02T09:00:00')) for n in range(5)]
+    assert day_digest(digests) == day_digest(list(reversed(digests)))
+    assert day_digest(digests) != day_digest(digests[:4])
+
+
+def test_diff_days_reports_missing_and_changed():
+    local = group_by_day([('2023-01-02T09:00:00', 'aa'), ('2023-01-03T09:00:00', 'bb')])
+    remote = group_by_day([('2023-01-02T09:00:00', 'aa'), ('2023-01-03T09:00:00', 'bc'),
+                           ('2023-01-04T09:00:00', 'cc')])
+    assert diff_days(local, remote) == ['2023-01-04', '2023-01-03']
+
+
+def test_reconcile_resyncs_only_differing_days(tmp_path, cache):
+    payloads = [make_payload(1, '2023-01-02T09:00:00'), make_payload(2, '2023-01-03T09:00:00')]
+    cache.mark_synced([((p['folio'], 101, p['receivedAt']), payload_digest(p)) for p in payloads])
+
+    # The hub export is missing the second sample
+    export = tmp_path / 'hub.json'
+    export.write_text(json.dumps(payloads[:1]))
+
+    config = LIMSConfig()
+    config.test_clients = [101]
+    config.start_date, config.end_date = datetime(2023, 2, 1), datetime(2023, 1, 1)
+    hub_client = MagicMock()
+
+    with patch('lims_etl.reconcile.scrape_window', return_value=[{'Folio': '2'}]) as scrape:
+        mismatches = reconcile(config, hub_client, cache, FileSummarySource(str(export)))
+
+    assert mismatches == {101: ['2023-01-03']}
+    window = scrape.call_args[0][2]
+    assert window[0] == datetime(2023, 1, 4)
+    hub_client.sync_samples.assert_called_once_with([{'Folio': '2'}])
+    hub_client.update_samples.assert_not_called()
+    # The day was dropped from the cache so the re-sync is not skipped
+    assert cache.get_digest((2, 101, '2023-01-03T09:00:00')) is None
+
+
+def test_local_and_hub_digests_share_bounds(tmp_path, cache):
+    # One sample exactly on each bound of the (end, start] range
+    payloads = [make_payload(1, '2023-02-01T00:00:00'), make_payload(2, '2023-01-01T00:00:00')]
+    cache.mark_synced([((p['folio'], 101, p['receivedAt']), payload_digest(p)) for p in payloads])
+    export = tmp_path / 'hub.json'
+    export.write_text(json.dumps(payloads))
+    start, end = datetime(2023, 2, 1), datetime(2023, 1, 1)
+
+    local = local_day_digests(cache, 101, start, end)
+    assert set(local) == {'2023-02-01'}
+    assert local == hub_day_digests(FileSummarySource(str(export)), 101, start, end)
+
+
+def test_reconcile_skips_days_the_cache_evicted(tmp_path, cache):
+    old, recent = make_payload(1, '2023-01-02T09:00:00'), make_payload(2, '2023-01-20T09:00:00')
+    cache.mark_synced([((old['folio'], 101, old['receivedAt']), payload_digest(old))])
+    cache.max_age_days = -1
+    cache.evict()
+    cache.max_age_days = 400
+    cache.mark_synced([((recent['folio'], 101, recent['receivedAt']), payload_digest(recent))])
+
+    # The hub still holds the evicted sample: its day must not look mismatched
+    export = tmp_path / 'hub.json'
+    export.write_text(json.dumps([old, recent]))
+    config = LIMSConfig()
+    config.test_clients = [101]
+    config.start_date, config.end_date = datetime(2023, 2, 1), datetime(2023, 1, 1)
+
+    with patch('lims_etl.reconcile.scrape_window') as scrape:
+        assert reconcile(config, MagicMock(), cache, FileSummarySource(str(export))) == {101: []}
+    scrape.assert_not_called()
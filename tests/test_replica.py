@@ -0,0 +1,81 @@
+"""
+Tests for the local sample replica
+"""
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from lims_etl.replica import SampleReplica
+from lims_etl.scraper import LIMSConfig, Scraper, extract_page_samples
+
+FIXTURE = Path(__file__).parent.parent / 'consulta.html'
+
+
+def make_sample(folio, client_id, received, validated=pd.NaT):
+    return {
+        'Folio': folio, 'ClientId': client_id, 'ReceivedAt': received, 'CreatedAt': received,
+        'PatientId': 7, 'ExamId': 12, 'ExamName': 'BH', 'ProcessedAt': pd.NaT,
+        'ValidatedAt': validated, 'Location': 'Matriz', 'Outsourcer': 0, 'Priority': 'Normal',
+        'BirthDate': pd.NaT,
+    }
+
+
+@pytest.fixture
+def replica(tmp_path):
+    replica = SampleReplica(str(tmp_path / 'replica.db'))
+    yield replica
+    replica.close()
+
+
+def test_lookups_and_range_filters(replica):
+    replica.upsert([
+        make_sample(1, 101, datetime(2024, 1, 5)),
+        make_sample(2, 101, datetime(2024, 1, 20), validated=datetime(2024, 1, 21)),
+        make_sample(3, 102, datetime(2024, 1, 10)),
+    ])
+
+    [row] = replica.query(folio=2)
+    assert row['ClientId'] == 101 and row['ValidatedAt'] == '2024-01-21T00:00:00'
+
+    rows = replica.query(client_ids=[101], since=datetime(2024, 1, 1), until=datetime(2024, 2, 1))
+    assert [r['Folio'] for r in rows] == [2, 1]
+    assert [r['Folio'] for r in replica.query(pending_only=True)] == [3, 1]
+    assert len(replica.query(limit=1)) == 1
+
+
+def test_upsert_replaces_on_sample_key(replica):
+    replica.upsert([make_sample(1, 101, datetime(2024, 1, 5))])
+    replica.upsert([make_sample(1, 101, datetime(2024, 1, 5), validated=datetime(2024, 1, 6))])
+
+    assert replica.count() == 1
+    assert replica.query(pending_only=True) == []
+
+
+def test_queries_use_indexes(replica):
+    plan = ' '.join(str(row) for row in replica.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM samples WHERE Folio = ?', (1,)))
+    assert 'ix_samples_folio' in plan
+    plan = ' '.join(str(row) for row in replica.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM samples WHERE ValidatedAt IS NULL ORDER BY ReceivedAt DESC'))
+    assert 'ix_samples_unvalidated' in plan
+    plan = ' '.join(str(row) for row in replica.conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM samples WHERE ClientId = ? AND ReceivedAt >= ?', (101, '2024')))
+    assert 'PRIMARY KEY' in plan
+
+
+def test_scraper_writes_each_page(tmp_path):
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    html = FIXTURE.read_text()
+
+    scraper = Scraper(101, config)
+    scraper.replica = replica = SampleReplica(str(tmp_path / 'replica.db'))
+    scraper.store_page(extract_page_samples(html, config.selectors['GRID_ROW_BASE'],
+                                            config.start_date, config.end_date))
+    scraper.close()
+
+    assert replica.count() == 10
+    assert replica.query(folio=100002)[0]['ReceivedAt'].startswith('2023-03-20T01:18')
+    replica.close()
@@ -0,0 +1,111 @@
+"""
+Tests for deadline-aware client scheduling
+"""
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from lims_etl.scheduler import ClientScheduler, ClientStateStore
+from lims_etl.scraper import Scraper, LIMSConfig
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ClientStateStore(str(tmp_path / 'clients.db'))
+    yield store
+    store.close()
+
+
+def test_order_prefers_stale_busy_and_weighted_clients(store):
+    now = time.time()
+    store.update(101, last_success=now - 3600, last_volume=10)
+    store.update(102, last_success=now - 6 * 3600, last_volume=10)
+    store.update(103, last_success=now - 3600, last_volume=1000)
+    store.update(104, last_success=now - 3600, last_volume=10)
+
+    scheduler = ClientScheduler(store, {104: 5.0})
+    assert scheduler.order([101, 102, 103, 104, 105]) == [105, 102, 104, 103, 101]
+
+
+def test_client_deadline_is_proportional_to_score(store):
+    now = time.time()
+    store.update(101, last_success=now - 3600)
+    store.update(102, last_success=now - 3 * 3600)
+    scheduler = ClientScheduler(store)
+
+    assert scheduler.client_deadline(101, [101, 102], None) is None
+    deadline = scheduler.client_deadline(101, [101, 102], now + 400)
+    assert deadline - now == pytest.approx(100, abs=2)
+
+
+def test_interrupted_walk_resumes(store):
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    scheduler = ClientScheduler(store)
+    cut = SimpleNamespace(hit_deadline=True, page_oldest_date=datetime(2023, 3, 10, 8))
+    samples = [{'ReceivedAt': datetime(2023, 3, 31)}, {'ReceivedAt': datetime(2023, 3, 10, 8)}]
+
+    scheduler.record(101, cut, samples)
+    assert store.get(101)['last_success'] is None
+    # Samples received since the cut come first, then the walk resumes below it
+    head, seek, backlog = scheduler.prepare(101, config)
+    assert seek is True
+    assert (head.start_date, head.end_date) == (datetime(2023, 4, 1), datetime(2023, 3, 31))
+    assert (backlog.start_date, backlog.end_date) == (datetime(2023, 3, 10, 8, 0, 1), datetime(2023, 1, 1))
+    assert config.start_date == datetime(2023, 4, 1)
+
+    # Cut again inside the head: the backlog's resume point stands
+    scheduler.record(101, SimpleNamespace(hit_deadline=True, page_oldest_date=datetime(2023, 3, 31, 12),
+                                          next_leg=backlog), [{'ReceivedAt': datetime(2023, 3, 31, 20)}])
+    assert store.get(101)['resume_before'] == datetime(2023, 3, 10, 8)
+    assert store.get(101)['newest_received'] == datetime(2023, 3, 31)
+
+    done = SimpleNamespace(hit_deadline=False, page_oldest_date=pd.NaT)
+    scheduler.record(101, done, [])
+    assert store.get(101)['resume_before'] is None
+    assert store.get(101)['newest_received'] == datetime(2023, 3, 31)
+    assert scheduler.prepare(101, config) == (config, False, None)
+
+
+def test_walk_with_page_errors_is_not_a_success(store):
+    scheduler = ClientScheduler(store)
+    failed = SimpleNamespace(hit_deadline=False, page_oldest_date=pd.NaT, page_errors={3: 'bad row'})
+    scheduler.record(101, failed, [{'ReceivedAt': datetime(2023, 3, 31)}])
+    assert store.get(101)['last_success'] is None
+    assert store.get(101)['newest_received'] == datetime(2023, 3, 31)
+
+
+def test_outcome_is_saved_only_when_applied(store):
+    scheduler = ClientScheduler(store)
+    store.update(101, newest_received=datetime(2023, 4, 2))
+    done = SimpleNamespace(hit_deadline=False, page_oldest_date=pd.NaT)
+    outcome = scheduler.outcome(101, done, [{'ReceivedAt': datetime(2023, 3, 31)}])
+    assert store.get(101)['last_success'] is None
+
+    scheduler.apply(101, outcome)
+    assert store.get(101)['last_success'] is not None
+    # An older batch never moves newest_received back
+    assert store.get(101)['newest_received'] == datetime(2023, 4, 2)
+
+
+def test_scraper_stops_at_page_boundary_after_deadline():
+    config = LIMSConfig()
+    config.start_date, config.end_date = datetime(2023, 4, 1), datetime(2023, 1, 1)
+    config.parse_workers = 0
+    scraper = Scraper(101, config)
+    scraper.driver = MagicMock()
+    scraper.driver.page_source = (Path(__file__).parent.parent / 'consulta.html').read_text()
+    scraper.deadline = time.time() - 1
+
+    with patch.object(Scraper, 'login', return_value=True), \
+         patch.object(Scraper, 'navigate_to_client', return_value=True), \
+         patch.object(Scraper, 'go_to_next_page') as go_next:
+        assert scraper.scrape_client_data() == 10
+
+    assert scraper.hit_deadline is True
+    go_next.assert_not_called()
@@ -27,133 +27,132 @@ def scraper() -> Scraper:
         s.current_page = 1
         return s
 
+def pager(current: int, last: int, links=None):
+    """find_element stand-in for a pager block: every td up to last holds a link except the current page's"""
+    links = {} if links is None else links
+
+    def find_element(by, xpath):
+        position = int(xpath.rsplit('[', 1)[1].split(']')[0])
+        if position == current or position > last:
+            raise NoSuchElementException(f'No link at {position}')
+        return links.setdefault(position, MagicMock())
+    return find_element
+
+
+def pager_xpath(scraper: Scraper, position: int) -> str:
+    return f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[{position}]/a'
+
+
 def test_has_next_page_success(scraper: Scraper):
-    """Test that has_next_page returns True when the next page element exists."""
-    mock_element = MagicMock()
-    scraper.driver.find_element.return_value = mock_element
-    scraper.current_page = 1
-    
+    """Test that has_next_page returns True when the td after the current page holds a link."""
+    scraper.driver.find_element.side_effect = pager(current=1, last=10)
+
     assert scraper.has_next_page() is True
-    expected_xpath = f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[{scraper.current_page + 1}]/a'
-    scraper.driver.find_element.assert_called_once_with(By.XPATH, expected_xpath)
+    scraper.driver.find_element.assert_called_with(By.XPATH, pager_xpath(scraper, 2))
 
 def test_has_next_page_failure(scraper: Scraper):
-    """Test that has_next_page returns False when the element is not found."""
-    scraper.current_page = 2
-    scraper.driver.find_element.side_effect = NoSuchElementException("Element not found")
+    """Test that has_next_page returns False on the last page of the pager."""
+    scraper.driver.find_element.side_effect = pager(current=3, last=3)
+    assert scraper.has_next_page() is False
+    scraper.driver.find_element.assert_called_with(By.XPATH, pager_xpath(scraper, 4))
+
+def test_has_next_page_without_pager(scraper: Scraper):
+    """Test that has_next_page returns False when every td holds a link (no current page found)."""
+    scraper.driver.find_element.return_value = MagicMock()
     assert scraper.has_next_page() is False
-    expected_xpath = f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[{scraper.current_page + 1}]/a'
-    scraper.driver.find_element.assert_called_once_with(By.XPATH, expected_xpath)
 
 @patch('lims_etl.scraper.sleep')
 def test_go_to_next_page_success(mock_sleep: MagicMock, scraper: Scraper):
-    """Test that go_to_next_page succeeds, increments page, and calls sleep."""
-    scraper.current_page = 1
-    mock_element = MagicMock()
-    scraper.driver.find_element.return_value = mock_element
-    
+    """Test that go_to_next_page clicks the link after the current page, increments page, and sleeps."""
+    links = {}
+    scraper.driver.find_element.side_effect = pager(current=1, last=10, links=links)
+
     assert scraper.go_to_next_page() is True
     assert scraper.current_page == 2
     mock_sleep.assert_called_once_with(scraper.config.sleep_time)
-    mock_element.click.assert_called_once()
+    links[2].click.assert_called_once()
+    scraper.driver.find_element.assert_called_with(By.XPATH, pager_xpath(scraper, 2))
+
+@patch('lims_etl.scraper.sleep')
+def test_go_to_next_page_no_wait_after_click(mock_sleep: MagicMock, scraper: Scraper):
+    """Test that go_to_next_page leaves the wait to the caller when wait_after_click is off (tabs)."""
+    scraper.driver.find_element.side_effect = pager(current=1, last=10)
+    scraper.wait_after_click = False
 
-    # Verify find_element was called correctly (only once)
-    expected_xpath = f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[2]/a'
-    scraper.driver.find_element.assert_called_once_with(By.XPATH, expected_xpath)
+    assert scraper.go_to_next_page() is True
+    assert scraper.clicked_at > 0
+    mock_sleep.assert_not_called()
 
 @patch('lims_etl.scraper.sleep')
 def test_go_to_next_page_failure_no_link(mock_sleep: MagicMock, scraper: Scraper):
     """Test go_to_next_page fails gracefully if no next-page link exists."""
-    scraper.current_page = 1
-    scraper.driver.find_element.side_effect = NoSuchElementException("Element not found")
-    
+    scraper.driver.find_element.side_effect = pager(current=1, last=1)
+
     assert scraper.go_to_next_page() is False
     assert scraper.current_page == 1
-    
-    # Critical: verify no click attempt and no sleep when element not found
-    scraper.driver.find_element.assert_called_once()
     mock_sleep.assert_not_called()
 
 @patch('lims_etl.scraper.sleep')
 def test_go_to_next_page_click_fails(mock_sleep: MagicMock, scraper: Scraper):
     """Test go_to_next_page fails gracefully if the click action fails."""
-    scraper.current_page = 1
-    mock_element = MagicMock()
-    mock_element.click.side_effect = Exception("Element is not clickable")
-    scraper.driver.find_element.return_value = mock_element
-    
+    links = {2: MagicMock()}
+    links[2].click.side_effect = Exception("Element is not clickable")
+    scraper.driver.find_element.side_effect = pager(current=1, last=10, links=links)
+
     assert scraper.go_to_next_page() is False
     # The page should not increment if the click fails and an exception is caught.
     assert scraper.current_page == 1
-    mock_element.click.assert_called_once()
+    links[2].click.assert_called_once()
     mock_sleep.assert_not_called()
 
 @patch('lims_etl.scraper.sleep')
 def test_navigate_multiple_pages(mock_sleep: MagicMock, scraper: Scraper):
     """Test that the scraper can navigate multiple pages sequentially."""
-    scraper.current_page = 1
-    page2_element = MagicMock()
-    page3_element = MagicMock()
-    
-    def mock_find_element(by, xpath):
-        if xpath.endswith('[2]/a'):
-            return page2_element
-        elif xpath.endswith('[3]/a'):
-            return page3_element
-        else:
-            raise NoSuchElementException()
-    
-    scraper.driver.find_element.side_effect = mock_find_element
+    links = {}
+    state = {'current': 1}
+
+    def find_element(by, xpath):
+        return pager(state['current'], 3, links)(by, xpath)
+
+    scraper.driver.find_element.side_effect = find_element
+    # Clicking a link makes its page the current one
+    links.setdefault(2, MagicMock()).click.side_effect = lambda: state.update(current=2)
+    links.setdefault(3, MagicMock()).click.side_effect = lambda: state.update(current=3)
 
     # Navigate page 1 -> 2
     assert scraper.go_to_next_page() is True
     assert scraper.current_page == 2
-    
+
     # Navigate page 2 -> 3
     assert scraper.go_to_next_page() is True
     assert scraper.current_page == 3
 
     # Verify each element clicked once
-    page2_element.click.assert_called_once()
-    page3_element.click.assert_called_once()
+    links[2].click.assert_called_once()
+    links[3].click.assert_called_once()
     assert mock_sleep.call_count == 2
-    
-    # Check call count for find_element (1 call per navigation)
-    assert scraper.driver.find_element.call_count == 2
-    
-    # Check that it was called with the correct XPaths in sequence
-    expected_xpath_page2 = f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[2]/a'
-    expected_xpath_page3 = f'{scraper.config.selectors["GRID_PAGINATION_BASE"]}[3]/a'
-    scraper.driver.find_element.assert_has_calls([
-        call(By.XPATH, expected_xpath_page2),
-        call(By.XPATH, expected_xpath_page3)
-    ], any_order=False)
-
-
-def test_pagination_reaches_last_page(scraper: Scraper):
+
+
+@patch('lims_etl.scraper.sleep')
+def test_pagination_reaches_last_page(mock_sleep: MagicMock, scraper: Scraper):
     """Test pagination stops correctly at the last page."""
-    def mock_find_element(by, xpath):
-        if xpath.endswith('[2]/a') or xpath.endswith('[3]/a'):
-            return MagicMock()
-        else:
-            raise NoSuchElementException("No more pages")
-    
-    scraper.driver.find_element.side_effect = mock_find_element
-    scraper.current_page = 1
-    
-    # Navigate to page 2
+    state = {'current': 1}
+    links = {}
+
+    def find_element(by, xpath):
+        return pager(state['current'], 3, links)(by, xpath)
+
+    scraper.driver.find_element.side_effect = find_element
+    links.setdefault(2, MagicMock()).click.side_effect = lambda: state.update(current=2)
+    links.setdefault(3, MagicMock()).click.side_effect = lambda: state.update(current=3)
+
     assert scraper.go_to_next_page() is True
-    assert scraper.current_page == 2
-    
-    # Navigate to page 3 
     assert scraper.go_to_next_page() is True
     assert scraper.current_page == 3
-    
+
     # Attempt page 4 should fail
     assert scraper.go_to_next_page() is False
     assert scraper.current_page == 3  # Should stay on page 3
-    
-    # has_next_page should return False
     assert scraper.has_next_page() is False
 
 
@@ -162,14 +161,13 @@ def test_stale_element_exception_handling(scraper: Scraper):
     # Test has_next_page with stale element
     scraper.driver.find_element.side_effect = StaleElementReferenceException()
     assert scraper.has_next_page() is False
-    
+
     # Test go_to_next_page with stale element during click
-    mock_element = MagicMock()
-    mock_element.click.side_effect = StaleElementReferenceException()
-    scraper.driver.find_element.side_effect = None
-    scraper.driver.find_element.return_value = mock_element
+    links = {2: MagicMock()}
+    links[2].click.side_effect = StaleElementReferenceException()
+    scraper.driver.find_element.side_effect = pager(current=1, last=10, links=links)
     scraper.current_page = 1
-    
+
     assert scraper.go_to_next_page() is False
     assert scraper.current_page == 1
 
@@ -177,27 +175,24 @@ def test_stale_element_exception_handling(scraper: Scraper):
 @patch('lims_etl.scraper.sleep')
 def test_element_click_intercepted(mock_sleep: MagicMock, scraper: Scraper):
     """Test handling of click interception."""
-    mock_element = MagicMock()
-    mock_element.click.side_effect = ElementClickInterceptedException()
-    scraper.driver.find_element.return_value = mock_element
-    scraper.current_page = 1
-    
+    links = {2: MagicMock()}
+    links[2].click.side_effect = ElementClickInterceptedException()
+    scraper.driver.find_element.side_effect = pager(current=1, last=10, links=links)
+
     assert scraper.go_to_next_page() is False
     assert scraper.current_page == 1
-    mock_element.click.assert_called_once()
+    links[2].click.assert_called_once()
     mock_sleep.assert_not_called()
 
 
-def test_double_find_element_call_detection(scraper: Scraper):
-    """Test that scraper only calls find_element once per operation."""
-    mock_element = MagicMock()
-    scraper.driver.find_element.return_value = mock_element
-    
-    # Test has_next_page calls find_element exactly once
+def test_find_element_calls_per_operation(scraper: Scraper):
+    """Test that locating the next page costs one probe per td up to the current one, plus one."""
+    scraper.driver.find_element.side_effect = pager(current=4, last=10)
+
     scraper.has_next_page()
-    assert scraper.driver.find_element.call_count == 1
-    
-    # Reset and test go_to_next_page
+    assert scraper.driver.find_element.call_count == 5
+
     scraper.driver.reset_mock()
-    scraper.go_to_next_page()
-    assert scraper.driver.find_element.call_count == 1
+    with patch('lims_etl.scraper.sleep'):
+        scraper.go_to_next_page()
+    assert scraper.driver.find_element.call_count == 5
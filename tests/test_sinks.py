@@ -0,0 +1,128 @@
+"""
+Tests for the concurrent sample sinks
+"""
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+from lims_etl.outbox import CircuitBreaker
+from lims_etl.sinks import FileSink, HubSink, Sink, SinkFanout, describe_sinks
+
+
+class RecordingSink(Sink):
+    def __init__(self, name, delay=0.0, fail_times=0, block=None):
+        self.name = name
+        self.delay = delay
+        self.fail_times = fail_times
+        self.block = block
+        self.batches = []
+        self.shed_batches = []
+
+    def write(self, client_id, samples):
+        if self.block is not None:
+            self.block.wait()
+        time.sleep(self.delay)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError('sink unavailable')
+        self.batches.append((client_id, len(samples)))
+        return len(samples)
+
+
+class ParkingSink(RecordingSink):
+    def shed(self, client_id, samples):
+        self.shed_batches.append((client_id, len(samples)))
+        return True
+
+
+def samples(n, client_id=101):
+    return [{'Folio': i, 'ClientId': client_id} for i in range(n)]
+
+
+def test_batches_reach_every_sink_concurrently():
+    slow, fast = RecordingSink('slow', delay=0.2), RecordingSink('fast', delay=0.2)
+    fanout = SinkFanout([slow, fast], batch_size=2)
+
+    started = time.perf_counter()
+    fanout.submit(101, samples(3))
+    fanout.close()
+
+    assert slow.batches == fast.batches == [(101, 2), (101, 1)]
+    # Two batches per sink at 0.2s each, sinks in parallel
+    assert time.perf_counter() - started < 0.7
+    assert fanout.client_counts(101) == {'slow': 3, 'fast': 3}
+    assert fanout.delivered(101)
+
+
+def test_failed_batches_are_retried_then_counted():
+    flaky, broken = RecordingSink('flaky', fail_times=1), RecordingSink('broken', fail_times=5)
+    fanout = SinkFanout([flaky, broken], retries=2, retry_seconds=0)
+    fanout.submit(101, samples(4))
+    fanout.close()
+
+    summary = fanout.summary()
+    assert summary['flaky']['written'] == 4
+    assert summary['broken']['failed'] == 4
+    assert not fanout.delivered(101)
+    assert describe_sinks(summary) == 'Written per sink: flaky 4/4, broken 0/4 (4 lost).'
+
+
+def test_burst_larger_than_the_queue_waits_for_a_slow_sink():
+    slow = RecordingSink('slow', delay=0.01)
+    fanout = SinkFanout([slow], batch_size=500, queue_size=2)
+    fanout.submit(101, samples(10000))
+    fanout.close()
+
+    summary = fanout.summary()['slow']
+    assert summary['written'] == 10000
+    assert summary['shed'] == summary['dropped'] == 0
+    assert fanout.delivered(101)
+
+
+def test_stalled_sink_sheds_without_holding_back_the_others():
+    gate = threading.Event()
+    stalled, healthy = ParkingSink('stalled', block=gate), RecordingSink('healthy')
+    fanout = SinkFanout([stalled, healthy], batch_size=1, queue_size=1, put_timeout=0.05)
+
+    started = time.perf_counter()
+    fanout.submit(101, samples(5))
+    # Only the first full queue is waited on; later batches are shed at once
+    assert time.perf_counter() - started < 0.5
+    gate.set()
+    fanout.close()
+
+    assert len(healthy.batches) == 5
+    assert stalled.shed_batches and len(stalled.batches) + len(stalled.shed_batches) == 5
+    assert fanout.summary()['stalled']['shed'] == len(stalled.shed_batches)
+    assert fanout.delivered(101)
+
+
+def test_hub_sink_tracks_only_samples_the_hub_kept():
+    batch = samples(3)
+    hub_client = MagicMock()
+    hub_client.send_samples.return_value = ([batch[0]], [batch[1]])
+    pending_index = MagicMock()
+
+    assert HubSink(hub_client, pending_index).write(101, batch) == 1
+    # The rejected, unparked sample is not tracked as if it reached the hub
+    pending_index.track.assert_called_once_with([batch[0], batch[1]])
+
+
+def test_hub_sink_is_failing_while_the_breaker_is_open():
+    hub_client = MagicMock()
+    hub_client.breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    sink = HubSink(hub_client)
+    assert not sink.failing()
+    hub_client.breaker.trip()
+    assert sink.failing()
+
+
+def test_file_sink_appends_per_client(tmp_path):
+    sink = FileSink(str(tmp_path))
+    sink.write(101, samples(2))
+    sink.write(101, samples(1))
+
+    frame = pd.read_csv(sink.directory / 'client_101.csv')
+    assert list(frame['Folio']) == [0, 1, 0]
@@ -0,0 +1,98 @@
+"""
+Tests for the change-detection sync cache
+"""
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from lims_etl.api_client import QuimiOSHubClient
+from lims_etl.sync_cache import SyncCache, payload_digest
+
+
+def make_sample(folio, exam='CBC'):
+    return {'Folio': str(folio), 'ClientId': '101', 'ReceivedAt': datetime(2023, 1, 2, 9), 'ExamName': exam}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SyncCache(str(tmp_path / 'cache.db'))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def hub_client(cache):
+    client = QuimiOSHubClient('http://hub', cache=cache)
+    client.session = MagicMock()
+    client.session.post.return_value.status_code = 201
+    client.session.put.return_value.status_code = 200
+    return client
+
+
+def test_payload_digest_is_order_independent():
+    assert payload_digest({'a': 1, 'b': 2}) == payload_digest({'b': 2, 'a': 1})
+    assert payload_digest({'a': 1}) != payload_digest({'a': 2})
+
+
+def test_unchanged_samples_are_skipped(hub_client):
+    samples = [make_sample(1), make_sample(2)]
+    assert hub_client.sync_samples(samples) == 2
+    assert hub_client.session.post.call_count == 2
+
+    # Second pass over an overlapping window costs no requests
+    assert hub_client.sync_samples(samples) == 2
+    assert hub_client.session.post.call_count == 2
+    assert hub_client.stats['unchanged'] == 2
+
+
+def test_changed_samples_are_updated(hub_client):
+    hub_client.sync_samples([make_sample(1)])
+    hub_client.sync_samples([make_sample(1, exam='Glucose'), make_sample(2)])
+
+    assert hub_client.session.put.call_count == 1
+    assert hub_client.session.post.call_count == 2
+    assert hub_client.stats == {'created': 2, 'duplicate': 0, 'updated': 1, 'unchanged': 0, 'failed': 0}
+
+
+def test_failed_samples_are_not_cached(hub_client):
+    hub_client.session.post.return_value.status_code = 500
+    assert hub_client.sync_samples([make_sample(1)]) == 0
+
+    hub_client.session.post.return_value.status_code = 201
+    assert hub_client.sync_samples([make_sample(1)]) == 1
+    assert hub_client.session.post.call_count == 2
+
+
+def test_duplicate_is_overwritten_before_caching(hub_client):
+    # The hub already holds folio 1 from before the cache existed, possibly stale
+    hub_client.session.post.return_value.status_code = 409
+    assert hub_client.sync_samples([make_sample(1)]) == 1
+    assert hub_client.session.put.call_count == 1
+    assert hub_client.stats['duplicate'] == 1
+
+    # The hub now holds this payload, so the next run can skip it
+    assert hub_client.sync_samples([make_sample(1)]) == 1
+    assert hub_client.stats['unchanged'] == 1
+
+
+def test_duplicate_not_cached_when_update_fails(hub_client):
+    hub_client.session.post.return_value.status_code = 409
+    hub_client.session.put.return_value.status_code = 500
+    assert hub_client.sync_samples([make_sample(1)]) == 0
+
+    hub_client.session.put.return_value.status_code = 200
+    assert hub_client.sync_samples([make_sample(1)]) == 1
+    assert hub_client.stats['unchanged'] == 0
+
+
+def test_evict_by_size_and_age(cache):
+    entries = [((folio, 101, '2023-01-02T09:00:00'), 'digest') for folio in range(10)]
+    cache.mark_synced(entries)
+    cache.max_entries = 4
+    assert cache.evict() == 6
+    assert cache.evicted_through() == '2023-01-02T09:00:00'
+
+    cache.max_age_days = -1
+    assert cache.evict() == 4
+    assert cache.get_digest(entries[9][0]) is None
@@ -0,0 +1,106 @@
+"""
+Tests for the shared work queue
+"""
+import multiprocessing
+import time
+from datetime import datetime
+
+import pytest
+
+from lims_etl.work_queue import SQLiteWorkQueue, open_work_queue, enqueue_windows
+
+WINDOWS = [(datetime(2023, 1, d + 7), datetime(2023, 1, d)) for d in (1, 8, 15)]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+
+
+def test_enqueue_is_idempotent(queue):
+    assert enqueue_windows(queue, [101, 102], WINDOWS) == 6
+    assert enqueue_windows(queue, [101, 102], WINDOWS) == 0
+    assert queue.outstanding() == 6
+
+
+def test_claim_complete_advances_watermark(queue):
+    enqueue_windows(queue, [101], WINDOWS)
+    job = queue.claim('worker-a', lease_seconds=60)
+    # Newest window first
+    assert job.window_start == datetime(2023, 1, 22)
+
+    assert queue.complete(job.id, 'worker-a', datetime(2023, 1, 21, 10, 0))
+    assert queue.get_watermark(101) == datetime(2023, 1, 21, 10, 0)
+
+    # An older window never moves the watermark back
+    job = queue.claim('worker-a', lease_seconds=60)
+    assert queue.complete(job.id, 'worker-a', datetime(2023, 1, 14, 10, 0))
+    assert queue.get_watermark(101) == datetime(2023, 1, 21, 10, 0)
+
+
+def test_expired_lease_is_reclaimed(queue):
+    queue.enqueue(101, *WINDOWS[0])
+    job = queue.claim('worker-a', lease_seconds=0)
+    time.sleep(0.01)
+
+    reclaimed = queue.claim('worker-b', lease_seconds=60)
+    assert reclaimed.id == job.id
+    assert reclaimed.attempts == 2
+
+    # The original worker lost its lease: no completion, no watermark update
+    assert queue.heartbeat(job.id, 'worker-a', 60) is False
+    assert queue.complete(job.id, 'worker-a', datetime(2023, 1, 7)) is False
+    assert queue.get_watermark(101) is None
+    assert queue.complete(job.id, 'worker-b', datetime(2023, 1, 7)) is True
+    assert queue.complete(job.id, 'worker-b', datetime(2023, 1, 7)) is False
+
+
+def test_fail_retries_then_parks(queue):
+    queue.max_attempts = 2
+    queue.enqueue(101, *WINDOWS[0])
+    for _ in range(2):
+        job = queue.claim('worker-a', lease_seconds=60)
+        queue.fail(job.id, 'worker-a', 'Login failed')
+    assert queue.claim('worker-a', lease_seconds=60) is None
+    assert queue.outstanding() == 0
+
+
+def test_expired_lease_fails_after_max_attempts(queue):
+    """A job that keeps crashing its worker is failed, not handed out forever"""
+    queue.max_attempts = 2
+    queue.enqueue(101, *WINDOWS[0])
+    for _ in range(2):
+        assert queue.claim('worker-a', lease_seconds=0) is not None
+        time.sleep(0.01)
+
+    assert queue.claim('worker-b', lease_seconds=60) is None
+    assert queue.outstanding() == 0
+
+
+def _drain(path, worker_id, results):
+    queue = SQLiteWorkQueue(path)
+    claimed = []
+    while True:
+        job = queue.claim(worker_id, lease_seconds=60)
+        if job is None:
+            break
+        claimed.append(job.id)
+        queue.complete(job.id, worker_id, job.window_start)
+    results.put(claimed)
+
+
+def test_concurrent_workers_claim_each_job_once(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    queue = open_work_queue(f'sqlite:///{path}')
+    enqueue_windows(queue, list(range(101, 121)), WINDOWS)
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_drain, args=(path, f'w{i}', results)) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    claimed = [job_id for _ in workers for job_id in results.get(timeout=30)]
+    for worker in workers:
+        worker.join()
+
+    assert sorted(claimed) == list(range(1, 61))
+    assert queue.outstanding() == 0